@@ -0,0 +1,101 @@
+from app.core.metrics import record_cache
+from collections import OrderedDict
+import asyncio
+import time
+
+
+class LRUCache:
+    """
+    프로세스 내 LRU 캐시 (선택적으로 TTL 적용)
+    - maxsize: 최대 항목 수, 넘으면 가장 오래 안 쓴 항목부터 제거
+    - ttl: 항목 유효 시간(초), None이면 만료 없음
+    - hits / misses 카운터 제공 (name을 주면 /metrics에도 기록)
+    """
+
+    def __init__(self, maxsize: int = 128, ttl: float = None, name: str = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()  # key -> (value, 만료 시각)
+
+    def get(self, key, default=None):
+        item = self._data.get(key)
+        if item is None:
+            self._count(False)
+            return default
+
+        value, expires_at = item
+        if expires_at is not None and expires_at < time.monotonic():
+            del self._data[key]
+            self._count(False)
+            return default
+
+        self._data.move_to_end(key)
+        self._count(True)
+        return value
+
+    def _count(self, hit: bool):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        if self.name:
+            record_cache(self.name, hit)
+
+    def set(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        item = self._data.pop(key, None)
+        return default if item is None else item[0]
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+class SingleFlight:
+    """
+    같은 키로 동시에 들어온 작업은 한 번만 실행하고 결과를 공유
+    (먼저 온 요청이 끊겨도 작업은 끝까지 실행되어 기다리는 다른 요청에 전달됨)
+    """
+
+    def __init__(self):
+        self._inflight = {}  # key -> asyncio.Task
+        self.shared = 0  # 진행 중인 작업에 합류한 횟수
+
+    async def run(self, key, factory, spawn=asyncio.ensure_future):
+        task = self._inflight.get(key)
+        if task is None:
+            task = spawn(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._discard(key, t))
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    def _discard(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # 기다리던 요청이 모두 끊긴 경우에도 예외가 처리된 것으로 표시
+        if not task.cancelled():
+            task.exception()
+
+    def __len__(self):
+        return len(self._inflight)
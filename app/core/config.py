@@ -0,0 +1,8 @@
+"""
+.env 환경 변수 로드 (프로세스당 한 번)
+- 모듈 상수로 os.getenv를 읽는 모듈은 이 모듈을 먼저 import (app.main, 진입점 역할을 하는 모듈)
+- 이미 설정된 환경 변수는 덮어쓰지 않음
+"""
+from dotenv import load_dotenv
+
+load_dotenv()
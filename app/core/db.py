@@ -1,7 +1,233 @@
-from sqlalchemy import create_engine
+from contextlib import asynccontextmanager
+from contextvars import ContextVar, copy_context
+from pgvector import HalfVector, Vector
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine
 import os
-from dotenv import load_dotenv
+import time
+import asyncio
+import logging
+from app.core import config  # noqa: F401  (.env 로드)
+
+logger = logging.getLogger(__name__)
 
-load_dotenv()
 DATABASE_URL = os.getenv("DATABASE_URL")
-engine = create_engine(DATABASE_URL)
\ No newline at end of file
+
+# 커넥션 풀 설정 (환경변수로 조정)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))  # 커넥션 대기 최대 시간(초)
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # 커넥션 재생성 주기(초)
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))
+
+_engine = None
+
+# pgvector 바이너리 프로토콜 (텍스트 "[0.1,...]" 직렬화/파싱 없이 float32 배열 그대로 송수신)
+# - 쓰기: list / numpy 배열을 그대로 파라미터로 전달 (SQL에서는 (:param)::vector)
+# - 읽기: vector 컬럼은 numpy float32 배열로 반환
+_vector_codec_missing = False
+
+
+def _encode_vector(value):
+    return (value if isinstance(value, Vector) else Vector(value)).to_binary()
+
+
+def _decode_vector(data):
+    return Vector.from_binary(data).to_numpy()
+
+
+def _encode_halfvec(value):
+    return (value if isinstance(value, HalfVector) else HalfVector(value)).to_binary()
+
+
+def _decode_halfvec(data):
+    return HalfVector.from_binary(data).to_numpy()
+
+
+async def _register_vector_codec(conn):
+    await conn.set_type_codec(
+        "vector", schema="public",
+        encoder=_encode_vector, decoder=_decode_vector, format="binary"
+    )
+    try:
+        # halfvec은 pgvector 0.7+ (EMBEDDING_PROFILE=halfvec), 없는 버전이면 건너뜀
+        await conn.set_type_codec(
+            "halfvec", schema="public",
+            encoder=_encode_halfvec, decoder=_decode_halfvec, format="binary"
+        )
+    except ValueError:
+        pass
+
+
+def _on_connect(dbapi_connection, connection_record):
+    global _vector_codec_missing
+    try:
+        dbapi_connection.run_async(_register_vector_codec)
+    except ValueError as e:
+        # vector 확장 설치 전에 열린 커넥션 (ensure_schema가 설치 후 풀을 비워 다시 연결)
+        _vector_codec_missing = True
+        logger.warning(f"[DB] vector 타입 codec 등록 실패: {e}")
+
+
+def get_engine():
+    """
+    SQLAlchemy 비동기 엔진 (처음 호출할 때 생성, 서버는 lifespan의 ensure_schema에서 생성)
+    - 기존 postgresql:// URL을 그대로 써도 비동기 드라이버(asyncpg)로 접속하도록 변환
+    - DATABASE_URL이 없으면 ValueError
+    """
+    global _engine
+    if _engine is None:
+        if not DATABASE_URL:
+            raise ValueError("DATABASE_URL이 설정되어 있지 않습니다.")
+        url = make_url(DATABASE_URL)
+        if url.drivername in ("postgresql", "postgres", "postgresql+psycopg2"):
+            url = url.set(drivername="postgresql+asyncpg")
+
+        _engine = create_async_engine(
+            url,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_pre_ping=DB_POOL_PRE_PING,
+            connect_args={"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}},
+        )
+        event.listen(_engine.sync_engine, "connect", _on_connect)
+    return _engine
+
+
+async def dispose_engine():
+    """커넥션 풀 정리 (lifespan 종료 / CLI 작업 종료 시)"""
+    global _engine
+    if _engine is not None:
+        engine, _engine = _engine, None
+        await engine.dispose()
+
+
+async def refresh_vector_codec():
+    """vector 확장 설치 전에 열린 커넥션이 있으면 풀을 비워 codec이 등록된 커넥션으로 교체"""
+    global _vector_codec_missing
+    if _vector_codec_missing:
+        _vector_codec_missing = False
+        await get_engine().dispose()
+
+
+# 커넥션 획득 대기 시간 통계
+_wait_stats = {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "timeouts": 0}
+
+
+async def _timed_connect():
+    """풀에서 커넥션을 꺼내면서 대기 시간을 기록"""
+    started = time.perf_counter()
+    try:
+        conn = await get_engine().connect()
+    except PoolTimeoutError:
+        _wait_stats["timeouts"] += 1
+        raise
+    waited_ms = (time.perf_counter() - started) * 1000
+    _wait_stats["count"] += 1
+    _wait_stats["total_ms"] += waited_ms
+    _wait_stats["max_ms"] = max(_wait_stats["max_ms"], waited_ms)
+    return conn
+
+
+class ConnectionScope:
+    """요청 하나가 공유하는 커넥션 (처음 필요할 때 꺼내고 요청이 끝나면 반납)"""
+
+    def __init__(self):
+        self.conn = None
+        # 같은 요청 안에서 동시에 쿼리를 보내지 않도록 직렬화 (asyncpg 커넥션은 동시 사용 불가)
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.conn is None:
+            self.conn = await _timed_connect()
+        return self.conn
+
+    async def release(self):
+        if self.conn is not None:
+            conn, self.conn = self.conn, None
+            await conn.close()
+
+
+_request_scope: ContextVar = ContextVar("request_connection_scope", default=None)
+
+
+async def request_connection():
+    """
+    라우터용 요청 단위 커넥션 의존성
+    - 요청 안의 db_connect() 호출들이 같은 커넥션을 재사용
+    - 요청이 끝나면 풀에 반납
+    """
+    scope = ConnectionScope()
+    token = _request_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        await scope.release()
+        _request_scope.reset(token)
+
+
+async def release_request_connection():
+    """
+    오래 걸리는 OpenAI 호출 전에 요청 커넥션을 풀에 미리 반납
+    (이후 db_connect()가 다시 필요하면 새로 꺼냄)
+    """
+    scope = _request_scope.get()
+    if scope is not None:
+        async with scope.lock:
+            await scope.release()
+
+
+def spawn_detached(coro):
+    """
+    요청 커넥션과 분리된 task로 실행
+    (요청이 끝나거나 끊겨도 계속 실행되는 공유/백그라운드 작업용, 커넥션은 작업 단위로 따로 꺼냄)
+    """
+    ctx = copy_context()
+    ctx.run(_request_scope.set, None)
+    return asyncio.create_task(coro, context=ctx)
+
+
+@asynccontextmanager
+async def db_connect():
+    """
+    DB 작업 단위 커넥션 (블록이 정상 종료되면 commit, 예외 시 rollback)
+    - 요청 안이면 요청 커넥션 재사용, 아니면 풀에서 새로 꺼내고 반납
+    """
+    scope = _request_scope.get()
+    if scope is not None:
+        async with scope.lock:
+            conn = await scope.acquire()
+            async with conn.begin():
+                yield conn
+        return
+
+    conn = await _timed_connect()
+    try:
+        async with conn.begin():
+            yield conn
+    finally:
+        await conn.close()
+
+
+def pool_status() -> dict:
+    """커넥션 풀 상태 및 대기 시간 통계"""
+    pool = get_engine().pool
+    count = _wait_stats["count"]
+    return {
+        "pool_size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": pool.overflow(),
+        "max_overflow": DB_MAX_OVERFLOW,
+        "wait": {
+            "count": count,
+            "avg_ms": round(_wait_stats["total_ms"] / count, 3) if count else 0.0,
+            "max_ms": round(_wait_stats["max_ms"], 3),
+            "timeouts": _wait_stats["timeouts"],
+        },
+    }
@@ -0,0 +1,144 @@
+"""
+Prometheus 지표 + 요청 trace ID
+- stage_timer(service, stage): 서비스 단계별 소요 시간 히스토그램
+- OpenAI 토큰 사용량 / 오류 종류별 카운터, 캐시 hit/miss 카운터
+- GET /metrics 로 노출 (Prometheus text format)
+- 요청마다 trace ID를 ContextVar에 두고 로그 포맷의 %(trace_id)s로 출력 (LOG_TRACE_ID=true)
+- 워커 시작 시간(import / lifespan)과 RSS (GET /system/startup)
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+import os
+import sys
+import time
+import uuid
+import logging
+
+LOG_TRACE_ID = os.getenv("LOG_TRACE_ID", "false").lower() == "true"
+TRACE_ID_HEADER = "X-Request-ID"
+
+# 초 단위 버킷 (DB 조회 수 ms ~ DALL-E 수십 초까지)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80)
+
+REQUEST_LATENCY = Histogram(
+    "altong_http_request_seconds", "HTTP 요청 처리 시간",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS,
+)
+STAGE_LATENCY = Histogram(
+    "altong_stage_seconds", "서비스 단계별 처리 시간",
+    ["service", "stage", "outcome"], buckets=LATENCY_BUCKETS,
+)
+OPENAI_TOKENS = Counter(
+    "altong_openai_tokens_total", "OpenAI 토큰 사용량",
+    ["model", "kind"],
+)
+OPENAI_ERRORS = Counter(
+    "altong_openai_errors_total", "OpenAI 호출 오류 (재시도 포함)",
+    ["model", "error"],
+)
+CACHE_REQUESTS = Counter(
+    "altong_cache_requests_total", "캐시 조회 결과",
+    ["cache", "result"],
+)
+STARTUP_SECONDS = Gauge(
+    "altong_startup_seconds", "워커 시작 단계별 소요 시간",
+    ["phase"],
+)
+
+_trace_id: ContextVar = ContextVar("trace_id", default="-")
+
+
+@contextmanager
+def stage_timer(service: str, stage: str):
+    """블록 실행 시간을 service/stage 히스토그램에 기록 (예외로 끝나면 outcome=error)"""
+    started = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        STAGE_LATENCY.labels(service, stage, outcome).observe(time.perf_counter() - started)
+
+
+def record_cache(cache: str, hit: bool):
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def record_openai_usage(model: str, usage):
+    """응답 usage의 prompt/completion 토큰 수 기록"""
+    if usage is None:
+        return
+    OPENAI_TOKENS.labels(model, "prompt").inc(getattr(usage, "prompt_tokens", 0) or 0)
+    OPENAI_TOKENS.labels(model, "completion").inc(getattr(usage, "completion_tokens", 0) or 0)
+
+
+def record_openai_error(model: str, error: BaseException):
+    OPENAI_ERRORS.labels(model, type(error).__name__).inc()
+
+
+_startup = {}
+
+
+def process_rss_bytes() -> int:
+    """현재 프로세스 RSS (/proc이 없는 환경은 최대 RSS로 대신, 둘 다 안 되면 0)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # macOS는 바이트, Linux는 KB
+
+
+def record_startup(phase: str, seconds: float, **details):
+    """시작 단계 소요 시간 기록 (details는 보고서에 그대로 포함)"""
+    STARTUP_SECONDS.labels(phase).set(seconds)
+    _startup[f"{phase}_s"] = round(seconds, 3)
+    _startup.update(details)
+
+
+def startup_report() -> dict:
+    return {**_startup, "rss_mb": round(process_rss_bytes() / (1024 * 1024), 1)}
+
+
+def render_metrics():
+    """(본문, content-type)"""
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+def new_trace_id(incoming: str = None) -> str:
+    """요청 trace ID 설정 (클라이언트가 보낸 X-Request-ID가 있으면 그대로 사용)"""
+    trace_id = (incoming or uuid.uuid4().hex[:16])[:64]
+    _trace_id.set(trace_id)
+    return trace_id
+
+
+def current_trace_id() -> str:
+    return _trace_id.get()
+
+
+class TraceIdFilter(logging.Filter):
+    """로그 레코드에 trace_id 속성 추가"""
+
+    def filter(self, record):
+        record.trace_id = _trace_id.get()
+        return True
+
+
+def log_format() -> str:
+    if LOG_TRACE_ID:
+        return "%(asctime)s [%(levelname)s] [%(trace_id)s] %(name)s - %(message)s"
+    return "%(asctime)s [%(levelname)s] %(name)s - %(message)s"
+
+
+def install_trace_id_filter():
+    """루트 로거 핸들러에 TraceIdFilter 부착 (basicConfig 이후 호출)"""
+    for handler in logging.getLogger().handlers:
+        handler.addFilter(TraceIdFilter())
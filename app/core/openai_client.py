@@ -1,14 +1,29 @@
-from openai import OpenAI
-from dotenv import load_dotenv
+from openai import AsyncOpenAI
+from app.core import config  # noqa: F401  (.env 로드)
 import os
 
-# .env 파일에서 환경변수 로드
-load_dotenv()
+_client = None
 
-api_key = os.getenv("OPENAI_API_KEY")
 
-if not api_key:
-    raise ValueError("OPENAI_API_KEY가 .env에 설정되어 있지 않습니다.")
+def get_client() -> AsyncOpenAI:
+    """
+    공통으로 사용할 OpenAI 클라이언트 (비동기, 처음 호출할 때 생성)
+    - OPENAI_BASE_URL을 지정하면 로컬 stub 서버로 부하 테스트 가능
+    - 재시도/레이트 리밋은 openai_scheduler가 담당하므로 SDK 자체 재시도는 끔
+    - OPENAI_API_KEY가 없으면 ValueError (서버는 lifespan에서 미리 호출해 시작 시점에 실패)
+    """
+    global _client
+    if _client is None:
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            raise ValueError("OPENAI_API_KEY가 .env에 설정되어 있지 않습니다.")
+        _client = AsyncOpenAI(api_key=api_key, base_url=os.getenv("OPENAI_BASE_URL") or None, max_retries=0)
+    return _client
 
-# 공통으로 사용할 OpenAI 클라이언트
-client = OpenAI(api_key=api_key)
\ No newline at end of file
+
+async def close_client():
+    """HTTP 커넥션 풀 정리 (lifespan 종료 시)"""
+    global _client
+    if _client is not None:
+        client, _client = _client, None
+        await client.close()
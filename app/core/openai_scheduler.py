@@ -0,0 +1,341 @@
+"""
+OpenAI 호출 스케줄러 (모든 서비스의 OpenAI 호출이 이곳을 거침)
+- 모델별 동시 실행 수 제한, 빈 자리는 우선순위(INTERACTIVE > NORMAL > BULK) 순서로 배정
+- 모델별 RPM/TPM 토큰 버킷 (TPM은 프롬프트 크기로 추정해 차감, 응답의 usage로 정산)
+- 429/5xx/연결 오류는 지터를 준 지수 백오프로 재시도, Retry-After 헤더가 있으면 그만큼 모델 전체를 멈춤
+- 모델별 대기열 길이/재시도 횟수 통계 (GET /system/openai)
+"""
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from app.core.metrics import record_openai_error, record_openai_usage
+import openai
+import os
+import time
+import heapq
+import random
+import asyncio
+import itertools
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 우선순위 (작을수록 먼저)
+INTERACTIVE = 0  # 사용자가 화면에서 기다리는 생성 (매뉴얼, 퀴즈, 검색 쿼리 임베딩)
+NORMAL = 1  # 카드뉴스 등 상대적으로 느려도 되는 생성
+BULK = 2  # 매뉴얼 임베딩, 재인코딩 등 대량 작업
+PRIORITY_NAMES = {INTERACTIVE: "interactive", NORMAL: "normal", BULK: "bulk"}
+
+
+def _parse_limits(value: str) -> dict:
+    """"gpt-4o-mini=8,dall-e-3=2" 형식의 모델별 설정"""
+    limits = {}
+    for item in (value or "").split(","):
+        if "=" in item:
+            model, limit = item.split("=", 1)
+            limits[model.strip()] = int(limit)
+    return limits
+
+
+# 모델별 제한 (계정 quota에 맞게 조정, 없는 모델은 기본 동시 실행 수만 적용)
+OPENAI_DEFAULT_CONCURRENCY = int(os.getenv("OPENAI_DEFAULT_CONCURRENCY", "4"))
+OPENAI_CONCURRENCY = _parse_limits(os.getenv(
+    "OPENAI_CONCURRENCY", "gpt-4o-mini=8,text-embedding-3-small=4,dall-e-3=2"
+))
+OPENAI_RPM_LIMITS = _parse_limits(os.getenv(
+    "OPENAI_RPM_LIMITS", "gpt-4o-mini=500,text-embedding-3-small=3000,dall-e-3=5"
+))
+OPENAI_TPM_LIMITS = _parse_limits(os.getenv(
+    "OPENAI_TPM_LIMITS", "gpt-4o-mini=200000,text-embedding-3-small=1000000"
+))
+OPENAI_COMPLETION_TOKEN_ESTIMATE = int(os.getenv("OPENAI_COMPLETION_TOKEN_ESTIMATE", "1000"))
+
+# 재시도 설정
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "4"))
+OPENAI_RETRY_BASE_DELAY = float(os.getenv("OPENAI_RETRY_BASE_DELAY", "1.0"))  # 초
+OPENAI_RETRY_MAX_DELAY = float(os.getenv("OPENAI_RETRY_MAX_DELAY", "30"))  # 초
+
+_sequence = itertools.count()
+
+
+class TokenBucket:
+    """분당 한도(per_minute)만큼 차는 토큰 버킷"""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float):
+        """amount만큼 쌓일 때까지 기다렸다가 차감 (한도보다 큰 요청은 한도만큼만 차감)"""
+        amount = min(amount, self.capacity)
+        async with self.lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def refund(self, amount: float):
+        """추정치와 실제 사용량의 차이 정산 (음수면 추가 차감)"""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class ModelGate:
+    """모델 하나의 동시 실행 자리 + RPM/TPM 버킷 + 통계"""
+
+    def __init__(self, model: str):
+        self.model = model
+        self.concurrency = OPENAI_CONCURRENCY.get(model, OPENAI_DEFAULT_CONCURRENCY)
+        self.rpm = TokenBucket(OPENAI_RPM_LIMITS[model]) if model in OPENAI_RPM_LIMITS else None
+        self.tpm = TokenBucket(OPENAI_TPM_LIMITS[model]) if model in OPENAI_TPM_LIMITS else None
+        self.active = 0
+        self.waiters = []  # (priority, 순번, future) 힙
+        self.paused_until = 0.0
+        self.stats = {"requests": 0, "retries": 0, "rate_limited": 0, "errors": 0, "wait_ms_total": 0.0}
+
+    async def _acquire_slot(self, priority: int):
+        if self.active < self.concurrency and not self.waiters:
+            self.active += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.waiters, (priority, next(_sequence), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            # 자리를 배정받은 직후 취소된 경우 자리를 다음 대기자에게 넘김 (대기 중 취소는 _release_slot이 건너뜀)
+            if future.done() and not future.cancelled():
+                self._release_slot()
+            raise
+
+    def _release_slot(self):
+        self.active -= 1
+        while self.waiters:
+            _, _, future = heapq.heappop(self.waiters)
+            if not future.done():
+                self.active += 1
+                future.set_result(None)
+                break
+
+    @asynccontextmanager
+    async def slot(self, priority: int, tokens: int):
+        """동시 실행 자리 + 레이트 리밋을 확보한 동안 실행"""
+        started = time.perf_counter()
+        await self._acquire_slot(priority)
+        try:
+            pause = self.paused_until - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+            if self.rpm is not None:
+                await self.rpm.acquire(1)
+            if self.tpm is not None and tokens:
+                await self.tpm.acquire(tokens)
+            self.stats["wait_ms_total"] += (time.perf_counter() - started) * 1000
+            self.stats["requests"] += 1
+            yield
+        finally:
+            self._release_slot()
+
+    def pause(self, seconds: float):
+        """Retry-After 동안 이 모델의 새 요청을 멈춤"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def settle(self, estimated: int, usage):
+        """응답 usage로 TPM 버킷 정산 (토큰 사용량 지표도 기록, usage가 없으면 추정치 그대로)"""
+        record_openai_usage(self.model, usage)
+        total = getattr(usage, "total_tokens", None)
+        if self.tpm is not None and total is not None:
+            self.tpm.refund(estimated - total)
+
+    def refund(self, estimated: int):
+        """실패한 호출에 차감했던 추정 토큰을 TPM 버킷에 되돌림"""
+        if self.tpm is not None and estimated:
+            self.tpm.refund(estimated)
+
+    def snapshot(self) -> dict:
+        waiting = {name: 0 for name in PRIORITY_NAMES.values()}
+        for priority, _, future in self.waiters:
+            if not future.done():
+                waiting[PRIORITY_NAMES.get(priority, str(priority))] += 1
+        requests = self.stats["requests"]
+        return {
+            "concurrency": self.concurrency,
+            "active": self.active,
+            "waiting": waiting,
+            "rpm_limit": OPENAI_RPM_LIMITS.get(self.model),
+            "tpm_limit": OPENAI_TPM_LIMITS.get(self.model),
+            "tpm_available": round(self.tpm.tokens) if self.tpm is not None else None,
+            "paused_seconds": round(max(0.0, self.paused_until - time.monotonic()), 3),
+            "avg_wait_ms": round(self.stats["wait_ms_total"] / requests, 3) if requests else 0.0,
+            **{k: v for k, v in self.stats.items() if k != "wait_ms_total"},
+        }
+
+
+_gates = {}
+
+
+def _gate(model: str) -> ModelGate:
+    gate = _gates.get(model)
+    if gate is None:
+        gate = _gates[model] = ModelGate(model)
+    return gate
+
+
+def estimate_tokens(kwargs: dict) -> int:
+    """요청 인자로 토큰 사용량 추정 (프롬프트 UTF-8 4바이트당 1토큰 + 예상 출력 토큰)"""
+    size = 0
+    for message in kwargs.get("messages") or []:
+        content = message.get("content")
+        size += len(content.encode("utf-8")) if isinstance(content, str) else 0
+    inputs = kwargs.get("input")
+    if isinstance(inputs, str):
+        inputs = [inputs]
+    for item in inputs or []:
+        size += len(item.encode("utf-8")) if isinstance(item, str) else 0
+    prompt_tokens = (size + 3) // 4
+    if "messages" in kwargs:
+        return prompt_tokens + int(kwargs.get("max_tokens") or OPENAI_COMPLETION_TOKEN_ESTIMATE)
+    return prompt_tokens
+
+
+def _retry_after(error):
+    """응답 헤더의 Retry-After(초), 없으면 None"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _retry_delay(error, attempt: int):
+    """재시도할 오류면 대기 시간(초), 아니면 None"""
+    status = getattr(error, "status_code", None)
+    retryable = (
+        isinstance(error, openai.APIConnectionError)
+        or status in (408, 409, 429)
+        or (status is not None and status >= 500)
+    )
+    if not retryable or attempt >= OPENAI_MAX_RETRIES:
+        return None
+    retry_after = _retry_after(error)
+    if retry_after is not None:
+        return retry_after + random.uniform(0, OPENAI_RETRY_BASE_DELAY)
+    # full jitter: 동시에 실패한 요청들이 같은 시각에 다시 몰리지 않도록
+    return random.uniform(0, min(OPENAI_RETRY_MAX_DELAY, OPENAI_RETRY_BASE_DELAY * 2 ** attempt))
+
+
+def _on_error(gate: ModelGate, error, attempt: int):
+    """오류를 기록하고 재시도 대기 시간 반환 (재시도하지 않으면 None)"""
+    delay = _retry_delay(error, attempt)
+    record_openai_error(gate.model, error)
+    if getattr(error, "status_code", None) == 429:
+        gate.stats["rate_limited"] += 1
+        if delay is not None and _retry_after(error) is not None:
+            gate.pause(delay)
+    if delay is None:
+        gate.stats["errors"] += 1
+        return None
+    gate.stats["retries"] += 1
+    logger.warning(
+        f"[OPENAI] 호출 실패, 재시도 | model={gate.model}, attempt={attempt + 1}, "
+        f"delay={delay:.2f}s, error={type(error).__name__}: {error}"
+    )
+    return delay
+
+
+async def openai_call(method, *, model: str, priority: int = NORMAL, **kwargs):
+    """
+    OpenAI API 호출 (예: openai_call(client.chat.completions.create, model="gpt-4o-mini", messages=...))
+    자리/레이트 리밋을 확보한 뒤 호출하고, 재시도 가능한 오류는 백오프 후 다시 시도
+    """
+    gate = _gate(model)
+    tokens = estimate_tokens(kwargs)
+    attempt = 0
+    while True:
+        async with gate.slot(priority, tokens):
+            try:
+                response = await method(model=model, **kwargs)
+            except Exception as e:
+                gate.refund(tokens)
+                delay = _on_error(gate, e, attempt)
+                if delay is None:
+                    raise
+            else:
+                gate.settle(tokens, getattr(response, "usage", None))
+                return response
+        await asyncio.sleep(delay)
+        attempt += 1
+
+
+class _UsageStream:
+    """스트림 chunk를 그대로 넘기면서 usage가 담긴 chunk를 기억 (그 밖의 속성은 원래 스트림으로 위임)"""
+
+    def __init__(self, stream):
+        self._stream = stream
+        self.usage = None
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        async for chunk in self._stream:
+            if getattr(chunk, "usage", None) is not None:
+                self.usage = chunk.usage
+            yield chunk
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+@asynccontextmanager
+async def openai_stream(method, *, model: str, priority: int = NORMAL, **kwargs):
+    """
+    스트리밍 호출용 (stream=True) — 스트림을 다 읽을 때까지 자리를 유지
+        async with openai_stream(client.chat.completions.create, model=..., messages=...) as stream:
+            async for chunk in stream: ...
+    재시도는 스트림 생성 단계까지만
+    TPM 정산/토큰 지표는 마지막 usage chunk로 (stream_options={"include_usage": True}일 때)
+    """
+    gate = _gate(model)
+    tokens = estimate_tokens(kwargs)
+    attempt = 0
+    while True:
+        async with gate.slot(priority, tokens):
+            try:
+                stream = await method(model=model, stream=True, **kwargs)
+            except Exception as e:
+                gate.refund(tokens)
+                delay = _on_error(gate, e, attempt)
+                if delay is None:
+                    raise
+            else:
+                tapped = _UsageStream(stream)
+                try:
+                    yield tapped
+                finally:
+                    gate.settle(tokens, tapped.usage)
+                return
+        await asyncio.sleep(delay)
+        attempt += 1
+
+
+def scheduler_stats() -> dict:
+    """모델별 동시 실행/대기열/재시도 통계"""
+    return {model: gate.snapshot() for model, gate in _gates.items()}
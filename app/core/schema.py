@@ -0,0 +1,551 @@
+"""
+서비스가 직접 관리하는 테이블/인덱스 생성 (CREATE ... IF NOT EXISTS로 여러 번 실행해도 안전)
+
+임베딩 인덱스 관리 (CLI)
+    python -m app.core.schema ensure                   # 테이블/인덱스 생성
+    python -m app.core.schema reindex --concurrently   # 벡터 인덱스만 (재)생성, 서비스 중단 없이
+
+저장 방식(EMBEDDING_PROFILE) 변경은 app.services.embedding_profile_service의 reencode 사용
+"""
+from app.core.db import dispose_engine, get_engine, refresh_vector_codec
+from sqlalchemy import text
+import numpy as np
+import os
+import json
+import asyncio
+import argparse
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 여러 워커가 동시에 DDL을 실행하지 않도록 잡는 advisory lock 키
+SCHEMA_LOCK_KEY = 7413001
+
+# 벡터 검색 설정
+# - VECTOR_DISTANCE: cosine / l2 / ip (text-embedding-3-small은 cosine 권장)
+# - VECTOR_INDEX_TYPE: hnsw / ivfflat / none
+# - HNSW_EF_SEARCH / IVFFLAT_PROBES: 쿼리별로 조정 가능한 기본 탐색 폭
+# ANN 인덱스는 chunk_embeddings 전체(매뉴얼 구분 없음) 검색용
+# 매뉴얼별 검색(retrieve_similar)은 manual_id 인덱스로 그 매뉴얼 chunk만 꺼내 정확히 거리 정렬
+# (전체 ANN 인덱스를 타면 ef_search 후보 중 다른 매뉴얼 chunk가 걸러져 limit보다 적게 나올 수 있음)
+VECTOR_DISTANCE = os.getenv("VECTOR_DISTANCE", "cosine")
+VECTOR_INDEX_TYPE = os.getenv("VECTOR_INDEX_TYPE", "hnsw")
+VECTOR_INDEX_ON_STARTUP = os.getenv("VECTOR_INDEX_ON_STARTUP", "true").lower() == "true"
+HNSW_M = int(os.getenv("HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "64"))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "40"))
+IVFFLAT_LISTS = int(os.getenv("IVFFLAT_LISTS", "100"))
+IVFFLAT_PROBES = int(os.getenv("IVFFLAT_PROBES", "10"))
+
+# 임베딩 저장 방식 (EMBEDDING_PROFILE)
+# - full: vector(1536) 그대로 저장
+# - 512: dimensions=512로 임베딩해 vector(512) 저장 (벡터/인덱스 1/3)
+# - halfvec: float16 halfvec(1536) 저장 (1/2, pgvector 0.7+)
+# - binary: vector(1536) 저장 + binary_quantize 비트 인덱스(1/32)로 후보를 추린 뒤 원본 벡터로 rerank (pgvector 0.7+)
+# 프로필별 recall/지연 비교는 embedding_profile_service report로 확인
+EMBEDDING_PROFILES = {
+    "full": {"type": "vector", "dimensions": 1536},
+    "512": {"type": "vector", "dimensions": 512},
+    "halfvec": {"type": "halfvec", "dimensions": 1536},
+    "binary": {"type": "vector", "dimensions": 1536},
+}
+EMBEDDING_PROFILE = os.getenv("EMBEDDING_PROFILE", "full")
+BINARY_RERANK_CANDIDATES = int(os.getenv("BINARY_RERANK_CANDIDATES", "40"))  # binary 프로필 rerank 후보 수 (profile report)
+
+if EMBEDDING_PROFILE not in EMBEDDING_PROFILES:
+    raise ValueError(f"지원하지 않는 EMBEDDING_PROFILE: {EMBEDDING_PROFILE}")
+
+VECTOR_TYPE = EMBEDDING_PROFILES[EMBEDDING_PROFILE]["type"]
+EMBEDDING_DIMENSIONS = EMBEDDING_PROFILES[EMBEDDING_PROFILE]["dimensions"]
+VECTOR_COLUMN = f"{VECTOR_TYPE}({EMBEDDING_DIMENSIONS})"
+
+# 거리 함수별 연산자 / 인덱스 operator class (둘이 맞아야 인덱스를 탐)
+DISTANCE_OPERATORS = {"cosine": "<=>", "l2": "<->", "ip": "<#>"}
+DISTANCE_OPCLASSES = {"cosine": "cosine_ops", "l2": "l2_ops", "ip": "ip_ops"}
+
+if VECTOR_DISTANCE not in DISTANCE_OPERATORS:
+    raise ValueError(f"지원하지 않는 VECTOR_DISTANCE: {VECTOR_DISTANCE}")
+if VECTOR_INDEX_TYPE not in ("hnsw", "ivfflat", "none"):
+    raise ValueError(f"지원하지 않는 VECTOR_INDEX_TYPE: {VECTOR_INDEX_TYPE}")
+
+DISTANCE_OPERATOR = DISTANCE_OPERATORS[VECTOR_DISTANCE]
+if EMBEDDING_PROFILE == "binary":
+    VECTOR_INDEX_NAME = f"chunk_embeddings_embedding_{VECTOR_INDEX_TYPE}_hamming_idx"
+elif VECTOR_TYPE == "halfvec":
+    VECTOR_INDEX_NAME = f"chunk_embeddings_embedding_{VECTOR_INDEX_TYPE}_{VECTOR_DISTANCE}_half_idx"
+else:
+    VECTOR_INDEX_NAME = f"chunk_embeddings_embedding_{VECTOR_INDEX_TYPE}_{VECTOR_DISTANCE}_idx"
+
+# 검색 방식 (RAG_RETRIEVAL_MODE)
+# - vector: 임베딩 거리만 사용
+# - hybrid: 벡터 후보 + 키워드(정규식) 후보를 한 쿼리에서 뽑아 reciprocal rank fusion으로 합침
+#   (수치/단위/도구명처럼 임베딩이 놓치기 쉬운 chunk 보완, pg_trgm이 있으면 trigram 인덱스 사용)
+RAG_RETRIEVAL_MODE = os.getenv("RAG_RETRIEVAL_MODE", "vector")
+RAG_HYBRID_CANDIDATES = int(os.getenv("RAG_HYBRID_CANDIDATES", "20"))  # 방식별 후보 수
+RAG_RRF_K = int(os.getenv("RAG_RRF_K", "60"))  # RRF 점수 = Σ 1 / (k + 순위)
+
+if RAG_RETRIEVAL_MODE not in ("vector", "hybrid"):
+    raise ValueError(f"지원하지 않는 RAG_RETRIEVAL_MODE: {RAG_RETRIEVAL_MODE}")
+
+# content hash 기반 임베딩 저장소
+# - chunk_embeddings: 직렬화된 chunk의 sha256 → 벡터 (매뉴얼 간 공유)
+# - manual_embeddings: 매뉴얼별 chunk 목록, content_hash로 벡터를 참조
+# - 기존(hash 없는) row는 SQL로 hash를 계산해 저장소로 옮기고 row의 벡터는 비움
+CHUNK_EMBEDDINGS_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS vector",
+    """
+    CREATE TABLE IF NOT EXISTS manual_embeddings (
+        id BIGSERIAL PRIMARY KEY,
+        manual_id BIGINT NOT NULL,
+        content TEXT NOT NULL,
+        content_hash TEXT,
+        embedding vector(1536)
+    )
+    """,
+    f"""
+    CREATE TABLE IF NOT EXISTS chunk_embeddings (
+        content_hash TEXT PRIMARY KEY,
+        model TEXT NOT NULL,
+        content TEXT NOT NULL,
+        embedding {VECTOR_COLUMN} NOT NULL,
+        created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    )
+    """,
+    "ALTER TABLE manual_embeddings ADD COLUMN IF NOT EXISTS content_hash TEXT",
+    "ALTER TABLE manual_embeddings ALTER COLUMN embedding DROP NOT NULL",
+]
+# 기존 row의 벡터는 1536차원이라 같은 차원 프로필에서만 옮김 (512는 full로 옮긴 뒤 reencode)
+LEGACY_EMBEDDINGS_DDL = [
+    """
+    INSERT INTO chunk_embeddings (content_hash, model, content, embedding)
+    SELECT DISTINCT ON (content_hash) content_hash, 'text-embedding-3-small', content, embedding
+    FROM (
+        SELECT encode(sha256(convert_to(content, 'UTF8')), 'hex') AS content_hash, content, embedding
+        FROM manual_embeddings
+        WHERE content_hash IS NULL AND embedding IS NOT NULL
+    ) legacy
+    ON CONFLICT (content_hash) DO NOTHING
+    """,
+    """
+    UPDATE manual_embeddings
+    SET content_hash = encode(sha256(convert_to(content, 'UTF8')), 'hex'),
+        embedding = NULL
+    WHERE content_hash IS NULL
+    """,
+]
+CHUNK_EMBEDDINGS_INDEX_DDL = [
+    # 매뉴얼별 검색은 manual_id로 후보를 좁힌 뒤 거리 정렬
+    "CREATE INDEX IF NOT EXISTS manual_embeddings_manual_id_idx ON manual_embeddings (manual_id)",
+    "CREATE INDEX IF NOT EXISTS manual_embeddings_content_hash_idx ON manual_embeddings (content_hash)",
+]
+# hybrid 검색의 키워드 매칭(~*)용 trigram 인덱스 (pg_trgm 확장을 설치할 수 없으면 건너뜀)
+LEXICAL_INDEX_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS manual_embeddings_content_trgm_idx ON manual_embeddings USING gin (content gin_trgm_ops)",
+]
+
+# 카드뉴스 비동기 작업 상태 (state: 단계별 중간 결과, result: 최종 CardNewsResponse)
+CARDNEWS_JOBS_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS cardnews_jobs (
+        id UUID PRIMARY KEY,
+        manual_id BIGINT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'queued',
+        stage TEXT NOT NULL DEFAULT 'extract',
+        state JSONB,
+        result JSONB,
+        error TEXT,
+        attempts INT NOT NULL DEFAULT 0,
+        max_attempts INT NOT NULL DEFAULT 3,
+        webhook_url TEXT,
+        next_run_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+        locked_until TIMESTAMPTZ,
+        created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+        updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS cardnews_jobs_pending_idx
+    ON cardnews_jobs (created_at)
+    WHERE status IN ('queued', 'running')
+    """,
+]
+
+# 매뉴얼별 최근 임베딩 작업 상태 (/manual/generate 백그라운드 임베딩, /rag/embed 공용)
+# job_id가 다른 작업(이후 요청)이 시작되면 이전 작업의 상태 갱신은 무시
+EMBEDDING_JOBS_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS embedding_jobs (
+        manual_id BIGINT PRIMARY KEY,
+        job_id UUID NOT NULL,
+        status TEXT NOT NULL,
+        source TEXT NOT NULL,
+        summary JSONB,
+        error TEXT,
+        created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+        updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    )
+    """,
+]
+
+# 미리 생성해 둔 퀴즈 문항 (QUIZ_BANK_ENABLED=true일 때만 사용)
+# - (manual_id, tone, focus)별 문항 풀, manual_version이 바뀌면 이전 문항은 사용하지 않음
+# - served_count / last_served_at으로 최근에 낸 문항을 뒤로 미룸
+QUIZ_BANK_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS quiz_bank (
+        id BIGSERIAL PRIMARY KEY,
+        manual_id BIGINT NOT NULL,
+        tone TEXT NOT NULL,
+        focus TEXT NOT NULL,
+        manual_version TEXT NOT NULL,
+        type TEXT NOT NULL,
+        item JSONB NOT NULL,
+        item_hash TEXT NOT NULL,
+        served_count INT NOT NULL DEFAULT 0,
+        last_served_at TIMESTAMPTZ,
+        created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+        UNIQUE (manual_id, tone, focus, item_hash)
+    )
+    """,
+]
+
+# 쿼리 임베딩 캐시 영속화용 테이블 (QUERY_EMBED_CACHE_PERSIST=true일 때만 사용)
+QUERY_EMBEDDING_CACHE_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS query_embedding_cache (
+        model TEXT NOT NULL,
+        text_hash TEXT NOT NULL,
+        embedding vector NOT NULL,
+        created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+        PRIMARY KEY (model, text_hash)
+    )
+    """,
+]
+
+
+def vector_index_sql(concurrently: bool = False):
+    """설정된 거리 함수/인덱스 종류에 맞는 chunk_embeddings 벡터 인덱스 DDL (none이면 None)"""
+    if VECTOR_INDEX_TYPE == "none":
+        return None
+
+    if EMBEDDING_PROFILE == "binary":
+        column = f"(binary_quantize(embedding)::bit({EMBEDDING_DIMENSIONS})) bit_hamming_ops"
+    else:
+        column = f"embedding {VECTOR_TYPE}_{DISTANCE_OPCLASSES[VECTOR_DISTANCE]}"
+    if VECTOR_INDEX_TYPE == "hnsw":
+        params = f"m = {HNSW_M}, ef_construction = {HNSW_EF_CONSTRUCTION}"
+    else:
+        params = f"lists = {IVFFLAT_LISTS}"
+
+    return (
+        f"CREATE INDEX {'CONCURRENTLY ' if concurrently else ''}IF NOT EXISTS {VECTOR_INDEX_NAME} "
+        f"ON chunk_embeddings USING {VECTOR_INDEX_TYPE} ({column}) WITH ({params})"
+    )
+
+
+def search_settings_sql(ef_search: int = None, probes: int = None):
+    """
+    쿼리 단위(SET LOCAL) 탐색 폭 설정 문장 목록 (트랜잭션 안에서 실행)
+    ANN 인덱스를 타는 전체 검색에만 의미가 있음 (매뉴얼별 검색은 정확 검색이라 영향 없음)
+    """
+    if VECTOR_INDEX_TYPE == "hnsw":
+        return [f"SET LOCAL hnsw.ef_search = {int(ef_search or HNSW_EF_SEARCH)}"]
+    if VECTOR_INDEX_TYPE == "ivfflat":
+        return [f"SET LOCAL ivfflat.probes = {int(probes or IVFFLAT_PROBES)}"]
+    return []
+
+
+def vector_order_sql(column: str = "embedding", param: str = ":q_emb") -> str:
+    """검색 벡터와의 거리 정렬식 (벡터 인덱스와 같은 연산자)"""
+    if EMBEDDING_PROFILE == "binary":
+        return (
+            f"binary_quantize({column})::bit({EMBEDDING_DIMENSIONS}) "
+            f"<~> binary_quantize(({param})::vector)"
+        )
+    return f"{column} {DISTANCE_OPERATOR} ({param})::{VECTOR_TYPE}"
+
+
+def _manual_chunks_sql(manual_ref: str) -> str:
+    """
+    매뉴얼 하나의 (id, content, distance) 전체 (정확 검색용 후보)
+    - manual_id 인덱스로 매뉴얼 chunk만 꺼내고, 벡터는 chunk마다 content_hash(PK)로 조회
+    - OFFSET 0: 서브쿼리가 바깥 쿼리로 합쳐져 거리 정렬이 전체 ANN 인덱스를 타거나
+      chunk_embeddings 전체와 hash join 하지 않도록 막음 (비용이 매뉴얼 chunk 수에만 비례)
+    binary 프로필도 매뉴얼 안 후보는 적으므로 원본 벡터 거리로 바로 계산
+    """
+    return f"""
+        SELECT m.id, m.content, (
+            SELECT c.embedding {DISTANCE_OPERATOR} (:q_emb)::{VECTOR_TYPE}
+            FROM chunk_embeddings c
+            WHERE c.content_hash = m.content_hash
+        ) AS distance
+        FROM manual_embeddings m
+        WHERE m.manual_id = {manual_ref}
+        OFFSET 0
+    """
+
+
+def manual_search_sql(manual_ref: str = ":manual_id") -> str:
+    """
+    매뉴얼 하나 안에서 검색 벡터와 가까운 chunk 원문 조회 (:manual_id, :q_emb, :limit)
+    - (content, distance)를 거리 순으로 반환, ANN 인덱스 없이 정확한 top-k
+    - manual_ref: 매뉴얼 ID 식 (여러 매뉴얼 LATERAL 검색에서는 바깥 컬럼 참조)
+    """
+    return f"""
+        SELECT content, distance
+        FROM ({_manual_chunks_sql(manual_ref)}) manual_chunks
+        WHERE distance IS NOT NULL
+        ORDER BY distance
+        LIMIT :limit
+    """
+
+
+def hybrid_search_sql(manual_ref: str = ":manual_id") -> str:
+    """
+    매뉴얼 하나 안에서 벡터 + 키워드 하이브리드 검색 (:manual_id, :q_emb, :patterns, :limit)
+    - vector_ranked: 검색 벡터와의 거리 순위 상위 RAG_HYBRID_CANDIDATES개
+    - lexical_ranked: patterns(대소문자 무시 정규식) 중 맞는 개수 순위 상위 RAG_HYBRID_CANDIDATES개
+    - 두 순위를 RRF(1 / (RAG_RRF_K + 순위))로 합산해 정렬, 한 번의 왕복으로 처리
+    - (content, lexical_hits, score)를 점수 순으로 반환, manual_ref는 manual_search_sql과 같음
+    벡터 순위도 manual_search_sql과 같은 정확 검색
+    """
+    return f"""
+        WITH vector_ranked AS (
+            SELECT id, row_number() OVER (ORDER BY distance, id) AS rank
+            FROM ({_manual_chunks_sql(manual_ref)}) manual_chunks
+            WHERE distance IS NOT NULL
+            ORDER BY rank
+            LIMIT {RAG_HYBRID_CANDIDATES}
+        ),
+        lexical_ranked AS (
+            SELECT id, hits, row_number() OVER (ORDER BY hits DESC, id) AS rank
+            FROM (
+                SELECT m.id, (
+                    SELECT count(*) FROM unnest(CAST(:patterns AS text[])) AS p(pattern)
+                    WHERE m.content ~* p.pattern
+                ) AS hits
+                FROM manual_embeddings m
+                WHERE m.manual_id = {manual_ref}
+                  AND m.content ~* ANY(CAST(:patterns AS text[]))
+            ) matched
+            ORDER BY rank
+            LIMIT {RAG_HYBRID_CANDIDATES}
+        )
+        SELECT m.content,
+               coalesce(l.hits, 0) AS lexical_hits,
+               coalesce(1.0 / ({RAG_RRF_K} + v.rank), 0) + coalesce(1.0 / ({RAG_RRF_K} + l.rank), 0) AS score
+        FROM vector_ranked v
+        FULL JOIN lexical_ranked l ON l.id = v.id
+        JOIN manual_embeddings m ON m.id = coalesce(v.id, l.id)
+        ORDER BY score DESC, m.id
+        LIMIT :limit
+    """
+
+
+def batch_search_sql(hybrid: bool = False) -> str:
+    """
+    여러 매뉴얼의 top-k를 한 쿼리로 조회 (:manual_ids, :q_emb, :limit, hybrid면 :patterns)
+    매뉴얼 ID 배열을 unnest해 매뉴얼마다 단건 검색 쿼리를 LATERAL로 실행, (manual_id, content) 순위 순 반환
+    """
+    if hybrid:
+        inner, order = hybrid_search_sql("ids.manual_id"), "hit.score DESC"
+    else:
+        inner, order = manual_search_sql("ids.manual_id"), "hit.distance"
+    return f"""
+        SELECT ids.manual_id, hit.content
+        FROM unnest(CAST(:manual_ids AS bigint[])) AS ids(manual_id)
+        CROSS JOIN LATERAL ({inner}) hit
+        ORDER BY ids.manual_id, {order}
+    """
+
+
+async def embedding_column_type(conn):
+    """chunk_embeddings.embedding의 실제 컬럼 타입 (예: vector(1536)), 테이블이 없으면 None"""
+    return (await conn.execute(text("""
+        SELECT format_type(atttypid, atttypmod)
+        FROM pg_attribute
+        WHERE attrelid = to_regclass('chunk_embeddings') AND attname = 'embedding'
+    """))).scalar()
+
+
+async def _stale_vector_indexes(conn, keep: str = VECTOR_INDEX_NAME):
+    """설정과 다른(거리 함수/종류/프로필이 바뀐) chunk_embeddings 벡터 인덱스 이름 목록"""
+    rows = (await conn.execute(text("""
+        SELECT indexname
+        FROM pg_indexes
+        WHERE tablename = 'chunk_embeddings'
+          AND indexname LIKE 'chunk_embeddings_embedding_%_idx'
+    """))).fetchall()
+    return [r[0] for r in rows if r[0] != keep]
+
+
+async def drop_vector_indexes(conn, concurrently: bool = False, keep: str = None):
+    """chunk_embeddings 벡터 인덱스 제거 (keep 이름은 남김)"""
+    for name in await _stale_vector_indexes(conn, keep):
+        logger.info(f"[SCHEMA] 벡터 인덱스 제거 | {name}")
+        await conn.execute(text(f"DROP INDEX {'CONCURRENTLY ' if concurrently else ''}IF EXISTS {name}"))
+
+
+async def ensure_schema():
+    """앱 시작 시 필요한 테이블/인덱스 생성"""
+    statements = [*CHUNK_EMBEDDINGS_DDL]  # 모듈 상수를 직접 늘리지 않도록 복사
+    if EMBEDDING_DIMENSIONS == 1536:
+        statements += LEGACY_EMBEDDINGS_DDL
+    statements += CHUNK_EMBEDDINGS_INDEX_DDL + CARDNEWS_JOBS_DDL + EMBEDDING_JOBS_DDL
+    if os.getenv("QUERY_EMBED_CACHE_PERSIST", "false").lower() == "true":
+        statements += QUERY_EMBEDDING_CACHE_DDL
+    if os.getenv("QUIZ_BANK_ENABLED", "false").lower() == "true":
+        statements += QUIZ_BANK_DDL
+
+    async with get_engine().begin() as conn:
+        await conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": SCHEMA_LOCK_KEY})
+        for sql in statements:
+            await conn.execute(text(sql))
+
+        column_type = await embedding_column_type(conn)
+        if column_type != VECTOR_COLUMN:
+            # 프로필만 바꾸고 기존 벡터를 변환하지 않은 상태 (인덱스 opclass도 맞지 않으므로 생성 생략)
+            logger.warning(
+                f"[SCHEMA] chunk_embeddings.embedding 타입({column_type})이 "
+                f"EMBEDDING_PROFILE={EMBEDDING_PROFILE}({VECTOR_COLUMN})와 다릅니다 | "
+                f"python -m app.services.embedding_profile_service reencode 필요"
+            )
+        else:
+            # 큰 테이블은 시작 시 인덱스 생성이 오래 걸리므로 reindex --concurrently 사용 권장
+            index_sql = vector_index_sql()
+            if VECTOR_INDEX_ON_STARTUP and index_sql:
+                await conn.execute(text(index_sql))
+
+        if RAG_RETRIEVAL_MODE == "hybrid":
+            try:
+                # 확장 설치 권한이 없거나 패키지가 없어도 나머지 스키마 작업은 유지 (키워드 매칭은 인덱스 없이 동작)
+                async with conn.begin_nested():
+                    for sql in LEXICAL_INDEX_DDL:
+                        await conn.execute(text(sql))
+            except Exception as e:
+                logger.warning(f"[SCHEMA] pg_trgm 인덱스 생성 실패 (hybrid 검색은 인덱스 없이 동작): {e}")
+    await refresh_vector_codec()
+    logger.info(f"[SCHEMA] 테이블 확인 완료 | statements={len(statements)}")
+
+
+async def reindex(concurrently: bool = True):
+    """
+    벡터 인덱스를 설정에 맞게 (재)생성하고 이전 설정의 인덱스 제거
+    CONCURRENTLY는 트랜잭션 밖에서만 가능하므로 autocommit 커넥션 사용
+    """
+    async with get_engine().connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        index_sql = vector_index_sql(concurrently)
+        if index_sql:
+            logger.info(f"[SCHEMA] 벡터 인덱스 생성 | {index_sql}")
+            await conn.execute(text(index_sql))
+        await drop_vector_indexes(conn, concurrently, keep=VECTOR_INDEX_NAME)
+
+
+def _collect_plan_nodes(plan, nodes):
+    nodes.append(plan)
+    for child in plan.get("Plans", []):
+        _collect_plan_nodes(child, nodes)
+    return nodes
+
+
+async def check_vector_index(manual_id: int = None) -> dict:
+    """
+    EXPLAIN으로 검색 쿼리가 어떤 인덱스를 타는지 확인
+    - manual_id를 주면 매뉴얼별 검색(retrieve_similar) 계획: manual_id 인덱스로 정확 검색해야 정상
+    - 없으면 전체 ANN 검색 계획: 벡터 인덱스를 실제로 타야 정상 (인덱스가 있어도 안 타면 경고)
+    """
+    zero_vector = np.zeros(EMBEDDING_DIMENSIONS, dtype=np.float32)
+    if manual_id is None:
+        query = f"""
+            SELECT content_hash FROM chunk_embeddings
+            ORDER BY {vector_order_sql()}
+            LIMIT 5
+        """
+        params = {"q_emb": zero_vector}
+    else:
+        query = manual_search_sql()
+        params = {"q_emb": zero_vector, "manual_id": manual_id, "limit": 5}
+
+    async with get_engine().begin() as conn:
+        for sql in search_settings_sql():
+            await conn.execute(text(sql))
+        plan_json = (await conn.execute(text("EXPLAIN (FORMAT JSON) " + query), params)).scalar()
+        indexes = (await conn.execute(text("""
+            SELECT tablename, indexname, indexdef
+            FROM pg_indexes
+            WHERE tablename IN ('chunk_embeddings', 'manual_embeddings')
+        """))).fetchall()
+        column_type = await embedding_column_type(conn)
+
+    if isinstance(plan_json, str):
+        plan_json = json.loads(plan_json)
+    plan = plan_json[0]["Plan"]
+    nodes = _collect_plan_nodes(plan, [])
+    used_indexes = sorted({n["Index Name"] for n in nodes if "Index Name" in n})
+    seq_scans = sorted({n["Relation Name"] for n in nodes if n["Node Type"] == "Seq Scan"})
+    index_names = {r.indexname for r in indexes}
+
+    warnings = []
+    if column_type != VECTOR_COLUMN:
+        warnings.append(f"embedding 컬럼 타입 {column_type}이 프로필 {EMBEDDING_PROFILE}({VECTOR_COLUMN})과 다릅니다 (reencode 필요)")
+    if VECTOR_INDEX_TYPE != "none" and VECTOR_INDEX_NAME not in index_names:
+        warnings.append(f"벡터 인덱스 {VECTOR_INDEX_NAME}가 없습니다 (reindex 필요)")
+    if "manual_embeddings_manual_id_idx" not in index_names:
+        warnings.append("manual_embeddings.manual_id 인덱스가 없습니다")
+    if manual_id is None:
+        if VECTOR_INDEX_NAME in index_names and VECTOR_INDEX_NAME not in used_indexes:
+            warnings.append(f"벡터 인덱스 {VECTOR_INDEX_NAME}가 있지만 전체 검색 계획에서 사용되지 않습니다")
+    else:
+        if VECTOR_INDEX_NAME in used_indexes:
+            warnings.append(f"매뉴얼별 검색이 전체 벡터 인덱스 {VECTOR_INDEX_NAME}를 탑니다 (limit보다 적게 반환될 수 있음)")
+        if "manual_embeddings_manual_id_idx" not in used_indexes:
+            warnings.append("매뉴얼별 검색이 manual_embeddings.manual_id 인덱스를 사용하지 않습니다")
+    if seq_scans:
+        warnings.append(f"Seq Scan 발생: {', '.join(seq_scans)} (테이블이 작으면 정상)")
+
+    return {
+        "profile": EMBEDDING_PROFILE,
+        "column_type": column_type,
+        "distance": VECTOR_DISTANCE,
+        "operator": DISTANCE_OPERATOR,
+        "index_type": VECTOR_INDEX_TYPE,
+        "search": "ann" if manual_id is None else "exact",
+        "expected_index": (
+            "manual_embeddings_manual_id_idx" if manual_id is not None
+            else VECTOR_INDEX_NAME if VECTOR_INDEX_TYPE != "none" else None
+        ),
+        "used_indexes": used_indexes,
+        "seq_scans": seq_scans,
+        "total_cost": plan.get("Total Cost"),
+        "indexes": [{"table": r.tablename, "name": r.indexname, "definition": r.indexdef} for r in indexes],
+        "warnings": warnings,
+        "ok": not warnings,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="임베딩 테이블/인덱스 관리")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("ensure", help="테이블/인덱스 생성")
+    reindex_parser = sub.add_parser("reindex", help="벡터 인덱스 (재)생성")
+    reindex_parser.add_argument("--concurrently", action="store_true", help="쓰기를 막지 않고 생성")
+    check_parser = sub.add_parser("check", help="EXPLAIN으로 인덱스 사용 여부 확인")
+    check_parser.add_argument("--manual-id", type=int)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s - %(message)s")
+
+    async def main():
+        try:
+            if args.command == "ensure":
+                await ensure_schema()
+            elif args.command == "reindex":
+                await reindex(args.concurrently)
+            else:
+                print(json.dumps(await check_vector_index(args.manual_id), ensure_ascii=False, indent=2))
+        finally:
+            await dispose_engine()
+
+    asyncio.run(main())
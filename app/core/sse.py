@@ -0,0 +1,9 @@
+"""
+Server-Sent Events 응답 포맷 (StreamingResponse용)
+"""
+import json
+
+
+def sse_event(event: str, data) -> str:
+    """event/data 한 건을 SSE 메시지로 (data는 JSON, 한글 그대로)"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
@@ -1,25 +1,109 @@
-from fastapi import FastAPI
-from app.routers import manual_router, quiz_router, rag_router, cardnews_router
+import time
+_import_started = time.perf_counter()  # 앱 모듈 import 시간 측정 (다른 import보다 먼저)
+
+from app.core import config  # noqa: E402,F401  (.env 로드)
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, Response
+from app.routers import manual_router, quiz_router, rag_router, cardnews_router, system_router
+from app.core.schema import ensure_schema
+from app.core.db import dispose_engine
+from app.core.openai_client import close_client, get_client
+from app.core.metrics import (
+    REQUEST_LATENCY, TRACE_ID_HEADER, install_trace_id_filter, log_format, new_trace_id, record_startup,
+    render_metrics, startup_report,
+)
+from app.services.s3_service import init_s3
+from app.services.rag_service import warm_query_cache
+from app.services.quiz_service import QUIZ_QUERY_TEXTS
+from app.services.cardnews_job_service import start_cardnews_workers, stop_cardnews_workers
+from app.services.quiz_bank_service import stop_quiz_bank_fills
+import os
 import logging
 
 logging.basicConfig(
     level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(name)s - %(message)s",
+    format=log_format(),
 )
+install_trace_id_filter()
+
+logger = logging.getLogger(__name__)
+
+IMPORT_SECONDS = time.perf_counter() - _import_started
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    lifespan_started = time.perf_counter()
+
+    # 클라이언트는 import 시점이 아니라 여기서 생성 (OPENAI_API_KEY가 없으면 시작 실패)
+    get_client()
+    s3_loaded = init_s3()  # USE_S3=true일 때만 boto3 로드
+
+    try:
+        await ensure_schema()
+    except Exception as e:
+        logger.error(f"[STARTUP] 스키마 확인 실패: {e}")
+
+    # 퀴즈용 고정 쿼리 임베딩 미리 계산 (QUERY_EMBED_WARMUP=true일 때)
+    if os.getenv("QUERY_EMBED_WARMUP", "false").lower() == "true":
+        await warm_query_cache(QUIZ_QUERY_TEXTS.values())
+
+    # 카드뉴스 비동기 작업 워커 실행
+    start_cardnews_workers()
+
+    record_startup("import", IMPORT_SECONDS)
+    record_startup("lifespan", time.perf_counter() - lifespan_started, s3_loaded=s3_loaded)
+    report = startup_report()
+    logger.info(
+        f"[STARTUP] 준비 완료 | import={report['import_s']}s, lifespan={report['lifespan_s']}s, "
+        f"rss={report['rss_mb']}MB, s3={s3_loaded}"
+    )
+
+    yield
+
+    await stop_cardnews_workers()
+    await stop_quiz_bank_fills()
+    await close_client()
+    await dispose_engine()
+
 
 # FastAPI 앱 생성
 app = FastAPI(
     title="Altong AI API",
     version="0.3.0",
-    description="RAG 기반 매뉴얼 및 퀴즈/카드뉴스 생성 API"
+    description="RAG 기반 매뉴얼 및 퀴즈/카드뉴스 생성 API",
+    lifespan=lifespan
 )
 
+@app.middleware("http")
+async def trace_and_time_requests(request: Request, call_next):
+    """요청마다 trace ID 부여(X-Request-ID) + 라우트별 처리 시간 기록 (스트리밍은 첫 응답까지)"""
+    trace_id = new_trace_id(request.headers.get(TRACE_ID_HEADER))
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        response.headers[TRACE_ID_HEADER] = trace_id
+        return response
+    finally:
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        REQUEST_LATENCY.labels(request.method, route, str(status)).observe(time.perf_counter() - started)
+
+
 # 라우터 등록
 app.include_router(manual_router.router)
 app.include_router(quiz_router.router)
 app.include_router(rag_router.router)
 app.include_router(cardnews_router.router)
+app.include_router(system_router.router)
 
 @app.get("/")
 def root():
-    return {"message": "Altong AI FastAPI server is running 🚀"}
\ No newline at end of file
+    return {"message": "Altong AI FastAPI server is running 🚀"}
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus 지표 (단계별 지연, 토큰 사용량, 캐시 hit/miss, OpenAI 오류)"""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
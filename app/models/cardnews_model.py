@@ -1,12 +1,29 @@
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 
 class CardSlide(BaseModel):
     slide_id: int
     title: str
     content: str
+    image_url: Optional[str] = None  # 컷별 WebP 이미지
+    thumbnail_url: Optional[str] = None  # 컷별 WebP 썸네일
+    avif_url: Optional[str] = None  # 컷별 AVIF 이미지 (서버 Pillow가 AVIF를 지원할 때만)
 
 class CardNewsResponse(BaseModel):
     title: str
     slides: List[str]  # 각 컷에 대한 한 줄 설명 (4개)
-    image_url: str  # 4컷 이미지 URL 1개
\ No newline at end of file
+    image_url: str  # 4컷 이미지 URL 1개
+    cards: List[CardSlide] = []  # 4컷을 잘라낸 컷별 이미지 (S3 사용 시)
+
+class CardNewsJobRequest(BaseModel):
+    manual_id: int
+    webhook_url: Optional[str] = None  # 작업 완료/실패 시 결과를 POST로 받을 URL
+
+class CardNewsJobResponse(BaseModel):
+    job_id: str
+    manual_id: int
+    status: str  # queued / running / succeeded / failed
+    stage: str  # extract / image / upload / panels / done
+    attempts: int
+    result: Optional[CardNewsResponse] = None
+    error: Optional[str] = None
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 
 class ProcedureItem(BaseModel):
     step: str
@@ -12,6 +12,7 @@ class ManualRequest(BaseModel):
     procedure: List[str]
     precaution: List[str]
     tone: str
+    manual_id: Optional[int] = None  # 전달하면 생성 후 백그라운드로 임베딩 (+ 기존 매뉴얼 캐시 무효화)
 
 class ManualResponse(BaseModel):
     title: str
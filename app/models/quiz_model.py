@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 
 class QuizItem(BaseModel):
@@ -13,5 +13,10 @@ class QuizRequest(BaseModel):
     tone: str
     focus: Optional[str] = "procedure"
 
+class QuizBatchRequest(BaseModel):
+    manual_ids: List[int] = Field(..., min_length=1, max_length=100)
+    tone: str
+    focus: Optional[str] = "procedure"
+
 class QuizResponse(BaseModel):
     quizzes: List[QuizItem]
\ No newline at end of file
@@ -1,6 +1,17 @@
 from pydantic import BaseModel
-from typing import Any, Dict
+from typing import Any, Dict, Optional
+from datetime import datetime
 
 class RagEmbedRequest(BaseModel):
     manual_id: int
-    manual_json: Dict[str, Any]
\ No newline at end of file
+    manual_json: Dict[str, Any]
+
+class EmbeddingStatusResponse(BaseModel):
+    manual_id: int
+    job_id: str
+    status: str  # queued / running / succeeded / failed
+    source: str  # manual_generate / rag_embed
+    summary: Optional[Dict[str, Any]] = None  # embed_manual 결과 (kept / added / removed / failed ...)
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
@@ -0,0 +1,80 @@
+"""
+manual 테이블 조회 + 파싱된 매뉴얼 캐시 (TTL + LRU)
+퀴즈/카드뉴스 서비스가 같은 매뉴얼을 반복해서 조회할 때 DB 조회와 JSON 파싱을 생략
+"""
+from app.core.db import db_connect
+from app.core.cache import LRUCache
+from sqlalchemy import text
+from typing import NamedTuple, Optional
+import os
+import json
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+MANUAL_CACHE_SIZE = int(os.getenv("MANUAL_CACHE_SIZE", "512"))
+MANUAL_CACHE_TTL = float(os.getenv("MANUAL_CACHE_TTL", "600"))  # 초
+
+_manual_cache = LRUCache(maxsize=MANUAL_CACHE_SIZE, ttl=MANUAL_CACHE_TTL, name="manual")
+
+
+class ManualRecord(NamedTuple):
+    """파싱된 매뉴얼 (data는 캐시와 공유되므로 수정하지 말 것)"""
+    manual_id: int
+    data: dict
+    version: str  # ai_raw_response 원문의 hash
+
+
+async def get_manual(manual_id: int) -> Optional[ManualRecord]:
+    """
+    manual_id로 매뉴얼 조회 (캐시 우선)
+    - 없으면 None
+    - ai_raw_response가 JSON이 아니면 ValueError
+    """
+    record = _manual_cache.get(manual_id)
+    if record is not None:
+        return record
+
+    async with db_connect() as conn:
+        # manual 테이블의 ai_raw_response 필드를 가져옴(JSON 원문)
+        row = (await conn.execute(
+            text("SELECT ai_raw_response FROM manual WHERE id = :id"),
+            {"id": manual_id}
+        )).fetchone()
+
+    if not row:
+        return None
+
+    raw = row._mapping["ai_raw_response"]
+    try:
+        data = json.loads(raw)
+    except (TypeError, json.JSONDecodeError) as e:
+        raise ValueError(f"매뉴얼 JSON 파싱 실패: {e}")
+
+    record = ManualRecord(
+        manual_id=manual_id,
+        data=data,
+        version=hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16],
+    )
+    _manual_cache.set(manual_id, record)
+    return record
+
+
+async def get_manual_version(manual_id: int) -> Optional[str]:
+    """매뉴얼 버전 (캐시 키용, 매뉴얼이 없거나 JSON이 아니면 None)"""
+    try:
+        record = await get_manual(manual_id)
+    except ValueError:
+        return None
+    return record.version if record else None
+
+
+def invalidate_manual(manual_id: int):
+    """매뉴얼이 새로 생성/수정됐을 때 캐시에서 제거"""
+    if _manual_cache.pop(manual_id) is not None:
+        logger.info(f"[MANUAL] 매뉴얼 캐시 무효화 | manual_id={manual_id}")
+
+
+def manual_cache_stats() -> dict:
+    return _manual_cache.stats()
@@ -1,17 +1,50 @@
-from fastapi import APIRouter, HTTPException
-from app.models.cardnews_model import CardNewsResponse
+from fastapi import APIRouter, Depends, Header, HTTPException
+from typing import Optional
+from app.core.db import request_connection
+from app.models.cardnews_model import CardNewsResponse, CardNewsJobRequest, CardNewsJobResponse
 from app.services.cardnews_service import generate_cardnews
+from app.services.cardnews_job_service import submit_cardnews_job, get_cardnews_job
+from app.services.result_cache_service import cached_generation, should_force_regenerate
 
-router = APIRouter(prefix="/cardnews", tags=["CardNews"])
+router = APIRouter(prefix="/cardnews", tags=["CardNews"], dependencies=[Depends(request_connection)])
 
 @router.post("/generate", response_model=CardNewsResponse)
-def create_cardnews(manual_id: int):
+async def create_cardnews(manual_id: int, cache_control: Optional[str] = Header(None)):
     """
     매뉴얼 기반 카드뉴스 생성 (4컷 고정)
     - manual_id: 참조할 매뉴얼 ID
     - tone은 DB에서 자동으로 가져옵니다
+    - 같은 매뉴얼 버전의 결과는 캐시에서 반환 (재시도 시 중복 생성 방지)
+    - Cache-Control: no-cache 헤더를 보내면 새로 생성
     """
     try:
-        return generate_cardnews(manual_id)
+        return await cached_generation(
+            "cardnews",
+            manual_id,
+            (),
+            lambda: generate_cardnews(manual_id),
+            force=should_force_regenerate(cache_control),
+            cacheable=lambda result: bool(result.image_url)  # 이미지 생성 실패 결과는 캐시하지 않음
+        )
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/jobs", response_model=CardNewsJobResponse, status_code=202)
+async def create_cardnews_job(request: CardNewsJobRequest):
+    """
+    카드뉴스 생성 작업 등록 (바로 job id 반환)
+    - GET /cardnews/jobs/{job_id}로 상태/결과 조회
+    - webhook_url을 주면 완료/실패 시 결과를 POST로 전달
+    """
+    try:
+        return await submit_cardnews_job(request.manual_id, request.webhook_url)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/jobs/{job_id}", response_model=CardNewsJobResponse)
+async def read_cardnews_job(job_id: str):
+    """카드뉴스 생성 작업 상태 조회"""
+    job = await get_cardnews_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"작업 {job_id}를 찾을 수 없습니다.")
+    return job
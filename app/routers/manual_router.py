@@ -1,18 +1,26 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from app.core.db import request_connection
+from app.core.sse import sse_event
 from app.models.manual_model import ManualRequest, ManualResponse
-from app.services.manual_service import generate_manual
-from app.services.rag_service import embed_manual
+from app.services.manual_service import generate_manual, stream_manual
+from app.services.embedding_job_service import queue_embedding, run_embedding_job
+from app.repositories.manual_repository import invalidate_manual
+import logging
 
-router = APIRouter(prefix="/manual", tags=["Manual"])
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/manual", tags=["Manual"], dependencies=[Depends(request_connection)])
 
 @router.post("/generate", response_model=ManualResponse)
-def create_manual(request: ManualRequest):
+async def create_manual(request: ManualRequest, background_tasks: BackgroundTasks):
     """
     사장님 입력 기반으로 구조화된 AI 메뉴얼 생성
+    - manual_id를 주면 응답을 보낸 뒤 백그라운드로 임베딩 (GET /rag/embed/{manual_id}/status로 확인)
     """
     try:
         # 메뉴얼 생성
-        return generate_manual(
+        manual = await generate_manual(
             business_type=request.businessType,
             title=request.title,
             goal=request.goal,
@@ -20,18 +28,57 @@ def create_manual(request: ManualRequest):
             precaution=request.precaution,
             tone=request.tone
         )
-    
-        # 메뉴얼 생성 후 자동 임베딩
-        try:
-            embed_manual(
-                manual_id=getattr(request, "manual_id", 0),  # Spring에서는 별도 전달 안 해도 됨
-                manual_json=manual.model_dump()
-            )
-            print("RAG 임베딩 자동 저장 완료")
-        except Exception as e:
-            print(f"임베딩 저장 실패 (무시하고 계속 진행): {e}")
+
+        # 기존 매뉴얼을 다시 생성한 경우 캐시된 이전 버전 제거
+        if request.manual_id is not None:
+            invalidate_manual(request.manual_id)
+            await _schedule_embedding(background_tasks, request.manual_id, manual.model_dump())
 
         return manual
-    
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+async def _schedule_embedding(background_tasks: BackgroundTasks, manual_id: int, manual_json: dict):
+    """생성된 매뉴얼 임베딩을 응답 이후로 예약 (상태 기록에 실패해도 임베딩과 매뉴얼 응답은 진행)"""
+    try:
+        job_id = await queue_embedding(manual_id)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        logger.warning(f"[EMBED-JOB] 임베딩 상태 기록 실패 (임베딩은 계속 진행): {e}")
+        job_id = None
+    background_tasks.add_task(run_embedding_job, manual_id, manual_json, job_id)
+
+
+@router.post("/generate/stream")
+async def create_manual_stream(request: ManualRequest, background_tasks: BackgroundTasks):
+    """
+    메뉴얼 생성 스트리밍 (Server-Sent Events)
+    - title / goal / procedure(절차 항목 하나) / precaution(주의사항 하나): 완성되는 대로 전송
+    - manual: 검증이 끝난 전체 ManualResponse (마지막 이벤트)
+    - error: 생성/파싱 실패 시
+    - manual_id를 주면 스트림이 끝난 뒤 백그라운드로 임베딩
+    """
+    async def events():
+        try:
+            async for event, data in stream_manual(
+                business_type=request.businessType,
+                title=request.title,
+                goal=request.goal,
+                procedure=request.procedure,
+                precaution=request.precaution,
+                tone=request.tone
+            ):
+                if event == "manual" and request.manual_id is not None:
+                    invalidate_manual(request.manual_id)
+                    await _schedule_embedding(background_tasks, request.manual_id, data)
+                yield sse_event(event, data)
+        except Exception as e:
+            yield sse_event("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=background_tasks
+    )
@@ -1,12 +1,64 @@
-from fastapi import APIRouter, HTTPException
-from app.models.quiz_model import QuizRequest, QuizResponse
-from app.services.quiz_service import generate_quiz
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from app.core.db import request_connection
+from app.core.sse import sse_event
+from app.models.quiz_model import QuizBatchRequest, QuizRequest, QuizResponse
+from app.services.quiz_service import generate_quiz, generate_quiz_batch
+from app.services.quiz_bank_service import QUIZ_BANK_ENABLED, sample_quiz
+from app.services.result_cache_service import cached_generation, should_force_regenerate
 
-router = APIRouter(prefix="/quiz", tags=["Quiz"])
+router = APIRouter(prefix="/quiz", tags=["Quiz"], dependencies=[Depends(request_connection)])
 
 @router.post("/generate", response_model=QuizResponse)
-def create_quiz(request: QuizRequest):
+async def create_quiz(request: QuizRequest, cache_control: Optional[str] = Header(None)):
+    """
+    매뉴얼 기반 퀴즈 생성
+    - QUIZ_BANK_ENABLED면 미리 생성해 둔 문항 풀에서 뽑아 바로 반환 (풀이 비어 있으면 생성 후 백그라운드로 채움)
+    - 같은 매뉴얼 버전/tone/focus 결과는 캐시에서 반환
+    - Cache-Control: no-cache 헤더를 보내면 새로 생성
+    """
     try:
-        return generate_quiz(request.manual_id, request.tone, request.focus)
+        force = should_force_regenerate(cache_control)
+        if QUIZ_BANK_ENABLED and not force:
+            sampled = await sample_quiz(request.manual_id, request.tone, request.focus)
+            if sampled is not None:
+                return sampled
+        return await cached_generation(
+            "quiz",
+            request.manual_id,
+            (request.tone, request.focus),
+            lambda: generate_quiz(request.manual_id, request.tone, request.focus),
+            force=force
+        )
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/generate/batch")
+async def create_quiz_batch(request: QuizBatchRequest, cache_control: Optional[str] = Header(None)):
+    """
+    여러 매뉴얼 퀴즈 일괄 생성 (Server-Sent Events)
+    - 검색 쿼리 임베딩 / 매뉴얼별 검색은 한 번에, GPT 호출은 동시 실행 수 제한
+    - quiz: {manual_id, quizzes} 매뉴얼 하나가 끝나는 대로 전송
+    - error: {manual_id, detail} 해당 매뉴얼 생성 실패 (나머지는 계속 진행)
+    - done: {total, succeeded, failed} 마지막 이벤트
+    - 결과 캐시는 단건 생성과 공유, Cache-Control: no-cache 헤더를 보내면 새로 생성
+    """
+    async def events():
+        try:
+            async for event, data in generate_quiz_batch(
+                request.manual_ids,
+                request.tone,
+                request.focus,
+                force=should_force_regenerate(cache_control)
+            ):
+                yield sse_event(event, data)
+        except Exception as e:
+            yield sse_event("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
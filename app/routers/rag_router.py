@@ -1,13 +1,61 @@
-from fastapi import APIRouter, HTTPException
-from app.services.rag_service import embed_manual
-from app.models.rag_model import RagEmbedRequest
+from fastapi import APIRouter, Depends, HTTPException
+from app.core.db import request_connection
+from app.services.rag_service import compare_retrieval, query_cache_stats, retrieval_stats
+from app.services.embedding_job_service import embed_now, get_embedding_status
+from app.services.quiz_service import QUIZ_LEXICAL_TERMS, QUIZ_QUERY_TEXTS
+from app.models.rag_model import EmbeddingStatusResponse, RagEmbedRequest
+from app.core.schema import check_vector_index
+from typing import Optional
 
-router = APIRouter(prefix="/rag", tags=["RAG"])
+router = APIRouter(prefix="/rag", tags=["RAG"], dependencies=[Depends(request_connection)])
 
 @router.post("/embed")
-def create_embeddings(request: RagEmbedRequest):
+async def create_embeddings(request: RagEmbedRequest):
     try:
-        embed_manual(request.manual_id, request.manual_json)
-        return {"message": f"Manual {request.manual_id} 임베딩 저장 완료"}
+        # 캐시 무효화 / 상태 기록 / 퀴즈 문항 풀 예약까지 /manual/generate 백그라운드 임베딩과 같은 단계
+        summary = await embed_now(request.manual_id, request.manual_json)
+        return {"message": f"Manual {request.manual_id} 임베딩 저장 완료", **summary}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/embed/{manual_id}/status", response_model=EmbeddingStatusResponse)
+async def read_embedding_status(manual_id: int):
+    """매뉴얼의 최근 임베딩 작업 상태 (queued / running / succeeded / failed)"""
+    status = await get_embedding_status(manual_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail=f"Manual {manual_id} 임베딩 기록이 없습니다.")
+    return status
+
+@router.get("/cache/stats")
+def get_query_cache_stats():
+    """쿼리 임베딩 캐시 hit/miss 통계"""
+    return query_cache_stats()
+
+@router.get("/retrieval/stats")
+def get_retrieval_stats():
+    """검색 방식별(vector / memory / hybrid) 호출 수와 지연 통계"""
+    return retrieval_stats()
+
+@router.get("/retrieval/compare")
+async def compare_retrieval_modes(manual_id: int, focus: str = "procedure", k: int = 5):
+    """
+    퀴즈 검색 쿼리로 vector / hybrid 결과 비교 (지연, 키워드 chunk recall, 겹치는 결과 수)
+    - focus: procedure / summary (퀴즈와 같은 쿼리 사용)
+    """
+    try:
+        query = QUIZ_QUERY_TEXTS.get(focus, QUIZ_QUERY_TEXTS["summary"])
+        return await compare_retrieval(manual_id, query, QUIZ_LEXICAL_TERMS, k)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/index/check")
+async def check_embedding_index(manual_id: Optional[int] = None):
+    """
+    임베딩 검색 인덱스 자가 점검 (EXPLAIN 기반)
+    - manual_id를 주면 매뉴얼별 검색 계획 (manual_id 인덱스 + 정확 검색이어야 정상)
+    - 없으면 전체 ANN 검색 계획 (벡터 인덱스가 있는데 타지 않으면 경고)
+    """
+    try:
+        return await check_vector_index(manual_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,46 @@
+from fastapi import APIRouter
+from app.core.db import pool_status
+from app.core.metrics import startup_report
+from app.core.openai_scheduler import scheduler_stats
+from app.repositories.manual_repository import manual_cache_stats
+from app.services.result_cache_service import result_cache_stats
+from app.services.quiz_bank_service import quiz_bank_stats
+from app.services.vector_index_service import memory_index_stats
+
+router = APIRouter(prefix="/system", tags=["System"])
+
+@router.get("/db/pool")
+def get_db_pool_status():
+    """DB 커넥션 풀 상태 (사용 중/오버플로우 커넥션 수, 대기 시간)"""
+    return pool_status()
+
+@router.get("/cache/manual")
+def get_manual_cache_stats():
+    """파싱된 매뉴얼 캐시 hit/miss 통계"""
+    return manual_cache_stats()
+
+@router.get("/cache/results")
+def get_result_cache_stats():
+    """퀴즈/카드뉴스 생성 결과 캐시 통계"""
+    return result_cache_stats()
+
+@router.get("/cache/memory-index")
+def get_memory_index_stats():
+    """매뉴얼별 인메모리 벡터 인덱스 통계 (RAG_MEMORY_INDEX=true일 때)"""
+    return memory_index_stats()
+
+@router.get("/cache/quiz-bank")
+def get_quiz_bank_stats():
+    """퀴즈 문항 풀 통계 (풀에서 바로 반환 / 문항 부족, 채운 횟수와 추가·제외된 문항 수)"""
+    return quiz_bank_stats()
+
+@router.get("/openai")
+def get_openai_scheduler_stats():
+    """OpenAI 모델별 동시 실행/대기열/재시도 통계"""
+    return scheduler_stats()
+
+
+@router.get("/startup")
+def get_startup_report():
+    """워커 시작 소요 시간(import / lifespan)과 현재 RSS"""
+    return startup_report()
@@ -0,0 +1,318 @@
+"""
+카드뉴스 비동기 작업 큐
+- POST /cardnews/jobs 로 작업을 등록하면 바로 job id 반환
+- 워커가 단계별(extract → image → upload → panels)로 실행하고 단계 결과를 cardnews_jobs 테이블에 저장
+- 실패한 단계는 backoff 후 그 단계부터 다시 실행, 최대 시도 횟수를 넘으면 failed
+- 단계마다 lock을 연장하고, 상태 저장은 lock을 가진 워커만 (lock이 만료돼 다시 가져간 작업도 시도 횟수에 포함)
+- 작업 상태는 Postgres에 저장되므로 재시작/여러 인스턴스에서도 유지 (FOR UPDATE SKIP LOCKED로 작업 분배)
+"""
+from app.core.db import db_connect
+from app.models.cardnews_model import CardNewsResponse, CardNewsJobResponse
+from app.services.cardnews_service import extract_cardnews_points, create_four_panel_prompt_from_contents
+from app.services.image_service import create_cardnews_image, store_cardnews_image
+from app.services.panel_service import build_card_slides, panels_enabled
+from app.services.s3_service import read_image_from_s3
+from sqlalchemy import text
+import os
+import json
+import uuid
+import asyncio
+import logging
+import httpx
+
+logger = logging.getLogger(__name__)
+
+CARDNEWS_JOB_WORKERS = int(os.getenv("CARDNEWS_JOB_WORKERS", "2"))  # 0이면 이 인스턴스에서는 작업 실행 안 함
+CARDNEWS_JOB_MAX_ATTEMPTS = int(os.getenv("CARDNEWS_JOB_MAX_ATTEMPTS", "3"))
+CARDNEWS_JOB_POLL_INTERVAL = float(os.getenv("CARDNEWS_JOB_POLL_INTERVAL", "2"))  # 초
+CARDNEWS_JOB_LOCK_SECONDS = int(os.getenv("CARDNEWS_JOB_LOCK_SECONDS", "600"))  # 워커가 죽었을 때 작업을 다시 가져갈 시간
+CARDNEWS_JOB_RETRY_DELAY = float(os.getenv("CARDNEWS_JOB_RETRY_DELAY", "10"))  # 재시도 기본 대기(초), 시도마다 2배
+
+STAGES = ["extract", "image", "upload", "panels", "done"]
+
+_wakeup = asyncio.Event()
+_workers = []
+
+
+async def submit_cardnews_job(manual_id: int, webhook_url: str = None) -> CardNewsJobResponse:
+    """카드뉴스 생성 작업 등록"""
+    job_id = str(uuid.uuid4())
+    async with db_connect() as conn:
+        await conn.execute(
+            text("""
+                INSERT INTO cardnews_jobs (id, manual_id, webhook_url, max_attempts)
+                VALUES (:id, :manual_id, :webhook_url, :max_attempts)
+            """),
+            {
+                "id": job_id,
+                "manual_id": manual_id,
+                "webhook_url": webhook_url,
+                "max_attempts": CARDNEWS_JOB_MAX_ATTEMPTS
+            }
+        )
+    _wakeup.set()
+    logger.info(f"[CARDNEWS-JOB] 작업 등록 | job_id={job_id}, manual_id={manual_id}")
+    return CardNewsJobResponse(job_id=job_id, manual_id=manual_id, status="queued", stage="extract", attempts=0)
+
+
+async def get_cardnews_job(job_id: str):
+    """작업 상태 조회 (없으면 None)"""
+    try:
+        uuid.UUID(job_id)
+    except ValueError:
+        return None
+
+    async with db_connect() as conn:
+        row = (await conn.execute(
+            text("""
+                SELECT id, manual_id, status, stage, attempts, result, error
+                FROM cardnews_jobs
+                WHERE id = :id
+            """),
+            {"id": job_id}
+        )).fetchone()
+
+    return _to_response(row._mapping) if row else None
+
+
+def _to_response(job) -> CardNewsJobResponse:
+    result = job["result"]
+    if isinstance(result, str):
+        result = json.loads(result)
+    return CardNewsJobResponse(
+        job_id=str(job["id"]),
+        manual_id=job["manual_id"],
+        status=job["status"],
+        stage=job["stage"],
+        attempts=job["attempts"],
+        result=CardNewsResponse(**result) if result else None,
+        error=job["error"]
+    )
+
+
+# 이 워커가 아직 작업을 잡고 있는지 확인하는 조건
+# (claim마다 attempts가 늘어나므로, lock이 만료돼 다른 워커가 가져간 작업은 attempts가 달라짐)
+_OWNED_JOB = "id = :id AND status = 'running' AND attempts = :attempts AND locked_until > now()"
+
+
+class JobLockLost(Exception):
+    """lock이 만료돼 다른 워커가 작업을 가져간 경우 (이 워커는 결과를 저장하지 않고 중단)"""
+
+
+async def _claim_job():
+    """
+    실행할 작업 하나를 가져와 running으로 표시 (없으면 None)
+    - 가져갈 때마다 attempts 증가 (워커가 죽어 lock이 만료된 작업도 시도 횟수에 포함)
+    - 이미 max_attempts만큼 시도한 작업은 실행하지 않고 failed로 표시해 반환
+    """
+    async with db_connect() as conn:
+        row = (await conn.execute(
+            text("""
+                UPDATE cardnews_jobs
+                SET status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'running' END,
+                    attempts = CASE WHEN attempts >= max_attempts THEN attempts ELSE attempts + 1 END,
+                    error = CASE WHEN attempts >= max_attempts
+                                 THEN coalesce(error, '작업 시간 초과 (워커 중단 또는 lock 만료)')
+                                 ELSE error END,
+                    locked_until = CASE WHEN attempts >= max_attempts THEN NULL
+                                        ELSE now() + make_interval(secs => :lock_seconds) END,
+                    updated_at = now()
+                WHERE id = (
+                    SELECT id
+                    FROM cardnews_jobs
+                    WHERE (status = 'queued' AND next_run_at <= now())
+                       OR (status = 'running' AND locked_until < now())
+                    ORDER BY created_at
+                    FOR UPDATE SKIP LOCKED
+                    LIMIT 1
+                )
+                RETURNING id, manual_id, status, stage, state, attempts, max_attempts, webhook_url, error
+            """),
+            {"lock_seconds": CARDNEWS_JOB_LOCK_SECONDS}
+        )).fetchone()
+    return dict(row._mapping) if row else None
+
+
+async def _save_stage(job, stage: str, state: dict):
+    """
+    단계 완료 시 다음 단계와 중간 결과 저장 (재시도 시 여기서부터 이어서 실행)
+    - 다음 단계를 위해 lock 연장, lock을 잃었으면 JobLockLost
+    """
+    async with db_connect() as conn:
+        result = await conn.execute(
+            text(f"""
+                UPDATE cardnews_jobs
+                SET stage = :stage, state = CAST(:state AS jsonb),
+                    locked_until = now() + make_interval(secs => :lock_seconds),
+                    updated_at = now()
+                WHERE {_OWNED_JOB}
+            """),
+            {
+                "id": job["id"],
+                "attempts": job["attempts"],
+                "stage": stage,
+                "state": json.dumps(state, ensure_ascii=False),
+                "lock_seconds": CARDNEWS_JOB_LOCK_SECONDS
+            }
+        )
+    if result.rowcount == 0:
+        raise JobLockLost(f"작업 lock 만료 | job_id={job['id']}, stage={stage}")
+
+
+async def _run_stage(stage: str, job, state: dict) -> dict:
+    """한 단계 실행 후 갱신된 중간 결과 반환"""
+    if stage == "extract":
+        title, slides = await extract_cardnews_points(job["manual_id"])
+        return {**state, "title": title, "slides": slides}
+
+    if stage == "image":
+        prompt = create_four_panel_prompt_from_contents(state["slides"])
+        return {**state, "source_url": await create_cardnews_image(prompt)}
+
+    if stage == "upload":
+        return {**state, "image_url": await store_cardnews_image(state["source_url"], fallback=False)}
+
+    if stage == "panels":
+        if not panels_enabled():
+            return {**state, "cards": []}
+        # 재시도 시점엔 DALL-E 임시 URL이 만료됐을 수 있으므로 upload 단계에서 저장한 S3 원본 사용
+        data = await asyncio.to_thread(read_image_from_s3, state["image_url"])
+        cards = await build_card_slides(data, state["title"], state["slides"])
+        return {**state, "cards": [card.model_dump() for card in cards]}
+
+    raise ValueError(f"알 수 없는 단계: {stage}")
+
+
+async def _process_job(job):
+    job_id = job["id"]
+    state = job["state"] or {}
+    if isinstance(state, str):
+        state = json.loads(state)
+    stage = job["stage"]
+
+    try:
+        while stage != "done":
+            logger.info(f"[CARDNEWS-JOB] 단계 시작 | job_id={job_id}, stage={stage}")
+            state = await _run_stage(stage, job, state)
+            stage = STAGES[STAGES.index(stage) + 1]
+            await _save_stage(job, stage, state)
+
+    except JobLockLost as e:
+        logger.warning(f"[CARDNEWS-JOB] {e} - 다른 워커가 이어서 실행")
+        return
+
+    except Exception as e:
+        attempts = job["attempts"]  # claim할 때 이미 증가
+        retry = attempts < job["max_attempts"]
+        delay = CARDNEWS_JOB_RETRY_DELAY * (2 ** (attempts - 1))
+        logger.error(
+            f"[CARDNEWS-JOB] 단계 실패 | job_id={job_id}, stage={stage}, attempts={attempts}, "
+            f"retry={retry}, error={e}"
+        )
+        async with db_connect() as conn:
+            updated = await conn.execute(
+                text(f"""
+                    UPDATE cardnews_jobs
+                    SET status = :status,
+                        error = :error,
+                        next_run_at = now() + make_interval(secs => :delay),
+                        locked_until = NULL,
+                        updated_at = now()
+                    WHERE {_OWNED_JOB}
+                """),
+                {
+                    "id": job_id,
+                    "status": "queued" if retry else "failed",
+                    "attempts": attempts,
+                    "error": str(e),
+                    "delay": delay
+                }
+            )
+        if updated.rowcount == 0:
+            logger.warning(f"[CARDNEWS-JOB] 작업 lock 만료 - 실패 상태 저장 생략 | job_id={job_id}")
+            return
+        if not retry:
+            await _notify_webhook(job, {"job_id": str(job_id), "status": "failed", "error": str(e)})
+        return
+
+    result = CardNewsResponse(
+        title=state["title"],
+        slides=state["slides"],
+        image_url=state["image_url"],
+        cards=state.get("cards", [])
+    )
+    async with db_connect() as conn:
+        updated = await conn.execute(
+            text(f"""
+                UPDATE cardnews_jobs
+                SET status = 'succeeded',
+                    result = CAST(:result AS jsonb),
+                    error = NULL,
+                    locked_until = NULL,
+                    updated_at = now()
+                WHERE {_OWNED_JOB}
+            """),
+            {"id": job_id, "attempts": job["attempts"], "result": result.model_dump_json()}
+        )
+    if updated.rowcount == 0:
+        logger.warning(f"[CARDNEWS-JOB] 작업 lock 만료 - 결과 저장 생략 | job_id={job_id}")
+        return
+    logger.info(f"[CARDNEWS-JOB] 작업 완료 | job_id={job_id}")
+    await _notify_webhook(job, {"job_id": str(job_id), "status": "succeeded", "result": result.model_dump()})
+
+
+async def _notify_webhook(job, payload: dict):
+    """webhook_url이 있으면 결과 전달 (실패해도 작업 상태에는 영향 없음)"""
+    if not job["webhook_url"]:
+        return
+    try:
+        async with httpx.AsyncClient(timeout=10) as http:
+            response = await http.post(job["webhook_url"], json=payload)
+            response.raise_for_status()
+    except Exception as e:
+        logger.warning(f"[CARDNEWS-JOB] webhook 전송 실패 | job_id={job['id']}, error={e}")
+
+
+async def _worker_loop(worker_no: int):
+    logger.info(f"[CARDNEWS-JOB] 워커 시작 | worker={worker_no}")
+    while True:
+        try:
+            job = await _claim_job()
+        except Exception as e:
+            logger.error(f"[CARDNEWS-JOB] 작업 조회 실패: {e}")
+            job = None
+
+        if job is None:
+            # 새 작업 등록 알림 또는 poll 주기까지 대기
+            try:
+                await asyncio.wait_for(_wakeup.wait(), timeout=CARDNEWS_JOB_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            _wakeup.clear()
+            continue
+
+        if job["status"] == "failed":
+            # lock이 만료된 채 max_attempts를 다 쓴 작업
+            logger.error(f"[CARDNEWS-JOB] 최대 시도 횟수 초과 | job_id={job['id']}, attempts={job['attempts']}")
+            await _notify_webhook(job, {"job_id": str(job["id"]), "status": "failed", "error": job["error"]})
+            continue
+
+        try:
+            await _process_job(job)
+        except Exception as e:
+            # 상태 저장 중 DB 오류 등: 워커는 계속 실행 (작업은 lock 만료 후 다시 실행됨)
+            logger.error(f"[CARDNEWS-JOB] 작업 처리 실패 | job_id={job['id']}, error={e}")
+
+
+def start_cardnews_workers():
+    """앱 시작 시 워커 실행"""
+    for worker_no in range(CARDNEWS_JOB_WORKERS):
+        _workers.append(asyncio.create_task(_worker_loop(worker_no)))
+
+
+async def stop_cardnews_workers():
+    """앱 종료 시 워커 정리 (실행 중이던 작업은 lock 만료 후 다시 실행됨)"""
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
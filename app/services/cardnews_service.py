@@ -1,10 +1,13 @@
-from app.core.openai_client import client
-from app.services.image_service import generate_cardnews_image
+from app.core.openai_client import get_client
+from app.core.openai_scheduler import NORMAL, openai_call
+from app.core.metrics import stage_timer
+from app.services.image_service import generate_cardnews_assets
 from app.models.cardnews_model import CardNewsResponse, CardSlide
+from app.repositories.manual_repository import get_manual
+from app.services.context_service import CARDNEWS_CONTEXT_TOKENS, build_context, count_tokens, log_token_usage
 import json 
 import logging
-from app.core.db import engine
-from sqlalchemy import text
+from app.core.db import release_request_connection
 
 logger = logging.getLogger(__name__)
 
@@ -13,36 +16,59 @@ logger = logging.getLogger(__name__)
 
 
 # 매뉴얼 ID를 받아 카드뉴스를 만들어 주는 함수
-def generate_cardnews(manual_id: int):
+async def generate_cardnews(manual_id: int):
     """
     매뉴얼 기반 카드뉴스 생성
     - DB에서 전체 매뉴얼 조회
     - 매뉴얼에서 중요한 4개 포인트 추출
     - 이미지 생성
     """
+    title, slides = await extract_cardnews_points(manual_id)
 
-    # DB에서 전체 매뉴얼 데이터 가져오기
     try:
-        with engine.connect() as conn:
-            # manual 테이블의 ai_raw_response 필드를 가져옴(JSON 원문)
-            result = conn.execute(
-                text("""
-                    SELECT ai_raw_response
-                    FROM manual 
-                    WHERE id = :manual_id
-                """),
-                {"manual_id": manual_id}
-            ).fetchone() # 하나의 결과만 가져오기
-        
-        if not result:
+        # contents 기반 이미지 생성
+        four_panel_prompt = create_four_panel_prompt_from_contents(slides) # 4컷용 프롬프트 구성을 위한 함수
+        logger.info("CARDNEWS] 이미지 생성 시작")
+        image_url, cards = await generate_cardnews_assets(four_panel_prompt, title, slides)
+        logger.info(f"CARDNEWS] 이미지 생성 완료 | url={image_url}, cards={len(cards)}")
+
+        # 응답 구성
+        return CardNewsResponse(
+            title=title,
+            slides=slides,
+            image_url=image_url,
+            cards=cards
+        )
+
+    except Exception as e:
+        logger.error(f"[CARDNEWS] 카드뉴스 생성 실패: {e}")
+        raise ValueError(f"카드뉴스 생성 실패: {e}")
+
+
+# 매뉴얼에서 카드뉴스 제목과 핵심 4개 포인트를 추출하는 함수 (카드뉴스 생성 1단계)
+async def extract_cardnews_points(manual_id: int):
+    """
+    매뉴얼 조회 후 GPT로 카드뉴스 제목 + 핵심 4개 포인트 추출
+    반환: (title, slides)
+    """
+
+    # DB(또는 캐시)에서 전체 매뉴얼 데이터 가져오기
+    try:
+        with stage_timer("generate_cardnews", "db_lookup"):
+            record = await get_manual(manual_id)
+
+        if not record:
             raise ValueError(f"매뉴얼 ID {manual_id}를 찾을 수 없습니다.")
         
-        manual_data = json.loads(result[0])
+        manual_data = record.data
         
     except Exception as e:
         logger.error(f"[CARDNEWS] DB 조회 실패: {e}")
         raise ValueError(f"매뉴얼 조회 실패: {e}")
 
+    # GPT/DALL-E 호출 동안 커넥션을 잡고 있지 않도록 반납
+    await release_request_connection()
+
     logger.info(f"[CARDNEWS] 카드뉴스 생성 시작 | manual_id={manual_id}")
 
     # 매뉴얼 구조(절차, 목표, 주의사항)
@@ -52,6 +78,12 @@ def generate_cardnews(manual_id: int):
     
     logger.info(f"[CARDNEWS] 매뉴얼 분석 | 절차 수={len(procedure)}")
 
+    # 긴 매뉴얼도 토큰 예산 안에서 (주의사항은 예산의 1/4까지, 나머지는 앞쪽 절차부터)
+    precaution_context = build_context(precaution, CARDNEWS_CONTEXT_TOKENS // 4, tag="CARDNEWS")
+    procedure_context = build_context(
+        procedure, CARDNEWS_CONTEXT_TOKENS - count_tokens(precaution_context), tag="CARDNEWS"
+    )
+
     # 매뉴얼 전체에서 핵심 4개 포인트 추출
     # 프롬프팅 영어로 하여 한글 -> 영어 번역 과정을 없앰
     prompt = f"""
@@ -64,10 +96,10 @@ Focus on what matters most for education.
 **Goal**: {goal}
 
 **Procedures**:
-{json.dumps(procedure, ensure_ascii=False, indent=2)}
+{procedure_context}
 
 **Precautions**:
-{json.dumps(precaution, ensure_ascii=False, indent=2)}
+{precaution_context}
 
 ### Output Format (JSON ONLY)
 CRITICAL: You MUST provide EXACTLY 4 key points.
@@ -94,17 +126,21 @@ Generate the JSON now.
 """
 
     # GPT 모델 호출
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {
-                "role": "system",
-                "content": "You are an expert creating educational card news. You MUST extract EXACTLY 4 key points. Always respond in JSON format only."
-            },
-            {"role": "user", "content": prompt}
-        ],
-        temperature=0.7
-    )
+    with stage_timer("generate_cardnews", "extract"):
+        response = await openai_call(
+            get_client().chat.completions.create,
+            model="gpt-4o-mini",
+            priority=NORMAL,
+            messages=[
+                {
+                    "role": "system",
+                    "content": "You are an expert creating educational card news. You MUST extract EXACTLY 4 key points. Always respond in JSON format only."
+                },
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.7
+        )
+    log_token_usage("CARDNEWS", response.usage)
     content = response.choices[0].message.content.strip()
     content = content.replace("```json", "").replace("```", "").strip()
 
@@ -136,19 +172,7 @@ Generate the JSON now.
         assert len(slides) == 4, f"slides는 4개여야 하는데 {len(slides)}개"
         
         logger.info(f"[CARDNEWS] 핵심 포인트 정리 완료 | slides={len(slides)}")
-
-        # contents 기반 이미지 생성
-        four_panel_prompt = create_four_panel_prompt_from_contents(slides) # 4컷용 프롬프트 구성을 위한 함수
-        logger.info("CARDNEWS] 이미지 생성 시작")
-        image_url = generate_cardnews_image(four_panel_prompt)
-        logger.info(f"CARDNEWS] 이미지 생성 완료 | url={image_url}")
-
-        # 응답 구성
-        return CardNewsResponse(
-            title=title,
-            slides=slides,
-            image_url=image_url
-        )
+        return title, slides
 
     except Exception as e:
         logger.error(f"[CARDNEWS] 카드뉴스 생성 실패: {e}")
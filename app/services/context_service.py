@@ -0,0 +1,72 @@
+"""
+프롬프트에 넣을 교육 내용(context)을 토큰 예산 안에서 구성
+- JSON은 공백 없이 직렬화 (indent=2 들여쓰기만으로도 토큰이 크게 늘어남)
+- 항목은 우선순위 순서로 예산이 허락하는 만큼만 넣고, 원래 순서를 유지해서 출력
+- 토큰 수는 tiktoken이 있으면 정확히, 없으면 글자 수 기반으로 추정
+"""
+import os
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 엔드포인트별 context 토큰 예산
+QUIZ_CONTEXT_TOKENS = int(os.getenv("QUIZ_CONTEXT_TOKENS", "1500"))
+CARDNEWS_CONTEXT_TOKENS = int(os.getenv("CARDNEWS_CONTEXT_TOKENS", "2000"))
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("o200k_base")  # gpt-4o / gpt-4o-mini 토크나이저
+except Exception:  # 미설치 또는 인코딩 파일을 받을 수 없는 환경
+    _encoding = None
+
+
+def count_tokens(text: str) -> int:
+    """텍스트 토큰 수 (tiktoken이 없으면 UTF-8 4바이트당 1토큰으로 추정, 한글은 글자당 약 0.75토큰)"""
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return (len(text.encode("utf-8")) + 3) // 4
+
+
+def compact_json(data) -> str:
+    """프롬프트용 JSON 직렬화 (한글 그대로, 공백 없이)"""
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+def fit_items(items: list, budget: int, priority: list = None):
+    """
+    예산 안에 들어가는 항목만 골라 원래 순서대로 반환
+    - priority: 항목 번호를 중요한 순서대로 나열 (없으면 앞에서부터)
+    - 예산을 넘는 항목은 건너뛰고 다음 항목을 계속 시도
+    반환: (선택된 항목 목록, 사용한 토큰 수)
+    """
+    order = priority if priority is not None else range(len(items))
+    used = 2  # 배열 괄호
+    selected = set()
+    for n in order:
+        cost = count_tokens(compact_json(items[n])) + 1  # 구분자
+        if used + cost > budget:
+            continue
+        selected.add(n)
+        used += cost
+    return [item for n, item in enumerate(items) if n in selected], used
+
+
+def build_context(items: list, budget: int, priority: list = None, tag: str = "CONTEXT") -> str:
+    """항목 목록을 예산 안에서 compact JSON 배열 문자열로 구성"""
+    selected, used = fit_items(items, budget, priority)
+    if len(selected) < len(items):
+        logger.info(f"[{tag}] context 예산 초과로 항목 제외 | kept={len(selected)}/{len(items)}, tokens={used}/{budget}")
+    return compact_json(selected)
+
+
+def log_token_usage(tag: str, usage):
+    """OpenAI 응답의 usage(prompt/completion 토큰 수) 로그"""
+    if usage is None:
+        return
+    logger.info(
+        f"[{tag}] 토큰 사용량 | prompt={usage.prompt_tokens}, "
+        f"completion={usage.completion_tokens}, total={usage.total_tokens}"
+    )
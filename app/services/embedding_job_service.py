@@ -0,0 +1,115 @@
+"""
+매뉴얼 임베딩 작업 + 상태 기록
+- /manual/generate: 생성한 ManualResponse를 응답과 분리된 백그라운드 작업으로 임베딩 (Spring의 /rag/embed 재호출 불필요)
+- /rag/embed: 같은 단계를 요청 안에서 바로 실행
+- 매뉴얼별 최근 작업 상태를 embedding_jobs 테이블에 저장 → GET /rag/embed/{manual_id}/status
+- 임베딩이 끝나면 매뉴얼 캐시 무효화 + 퀴즈 문항 풀 채우기 예약
+"""
+from app.core.db import db_connect, spawn_detached
+from app.models.rag_model import EmbeddingStatusResponse
+from app.repositories.manual_repository import invalidate_manual
+from app.services.quiz_bank_service import schedule_manual_fills
+from app.services.rag_service import embed_manual
+from sqlalchemy import text
+import json
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+async def _set_status(manual_id: int, job_id: str, status: str, summary: dict = None, error: str = None):
+    """해당 작업이 매뉴얼의 최근 작업일 때만 상태 갱신"""
+    async with db_connect() as conn:
+        await conn.execute(
+            text("""
+                UPDATE embedding_jobs
+                SET status = :status, summary = CAST(:summary AS jsonb), error = :error, updated_at = now()
+                WHERE manual_id = :manual_id AND job_id = :job_id
+            """),
+            {
+                "manual_id": manual_id,
+                "job_id": job_id,
+                "status": status,
+                "summary": json.dumps(summary, ensure_ascii=False) if summary is not None else None,
+                "error": error,
+            }
+        )
+
+
+async def _register_job(manual_id: int, source: str, status: str) -> str:
+    """매뉴얼의 최근 작업을 새 job_id로 교체 (이전 작업은 이후 상태 갱신이 무시됨)"""
+    job_id = str(uuid.uuid4())
+    async with db_connect() as conn:
+        await conn.execute(
+            text("""
+                INSERT INTO embedding_jobs (manual_id, job_id, status, source)
+                VALUES (:manual_id, :job_id, :status, :source)
+                ON CONFLICT (manual_id) DO UPDATE
+                SET job_id = EXCLUDED.job_id, status = EXCLUDED.status, source = EXCLUDED.source,
+                    summary = NULL, error = NULL, created_at = now(), updated_at = now()
+            """),
+            {"manual_id": manual_id, "job_id": job_id, "status": status, "source": source}
+        )
+    return job_id
+
+
+async def _run(manual_id: int, manual_json: dict, job_id: str) -> dict:
+    # 새 버전의 매뉴얼이므로 캐시된 매뉴얼 제거
+    invalidate_manual(manual_id)
+    try:
+        summary = await embed_manual(manual_id, manual_json)
+    except Exception as e:
+        await _set_status(manual_id, job_id, "failed", error=str(e))
+        raise
+    await _set_status(manual_id, job_id, "succeeded", summary=summary)
+    # 퀴즈 문항 풀 미리 채우기 (QUIZ_BANK_ENABLED일 때만, 기다리지 않음)
+    schedule_manual_fills(manual_id)
+    return summary
+
+
+async def embed_now(manual_id: int, manual_json: dict) -> dict:
+    """요청 안에서 바로 임베딩하고 요약 반환 (POST /rag/embed)"""
+    job_id = await _register_job(manual_id, "rag_embed", "running")
+    return await _run(manual_id, manual_json, job_id)
+
+
+async def queue_embedding(manual_id: int) -> str:
+    """백그라운드 임베딩 작업 등록 (queued 상태 기록 후 job_id 반환)"""
+    return await _register_job(manual_id, "manual_generate", "queued")
+
+
+async def run_embedding_job(manual_id: int, manual_json: dict, job_id: str):
+    """
+    BackgroundTasks에서 실행 (응답을 보낸 뒤)
+    요청 커넥션과 분리된 task로 실행하고, 실패는 상태로만 남김 (매뉴얼 생성 응답에는 영향 없음)
+    """
+    async def run():
+        await _set_status(manual_id, job_id, "running")
+        return await _run(manual_id, manual_json, job_id)
+
+    try:
+        summary = await spawn_detached(run())
+        logger.info(f"[EMBED-JOB] 백그라운드 임베딩 완료 | manual_id={manual_id}, job_id={job_id}, added={summary['added']}")
+    except Exception as e:
+        logger.error(f"[EMBED-JOB] 백그라운드 임베딩 실패 | manual_id={manual_id}, job_id={job_id}, error={e}")
+
+
+async def get_embedding_status(manual_id: int):
+    """매뉴얼의 최근 임베딩 작업 상태 (기록이 없으면 None)"""
+    async with db_connect() as conn:
+        row = (await conn.execute(
+            text("""
+                SELECT manual_id, job_id, status, source, summary, error, created_at, updated_at
+                FROM embedding_jobs
+                WHERE manual_id = :manual_id
+            """),
+            {"manual_id": manual_id}
+        )).fetchone()
+    if row is None:
+        return None
+
+    job = dict(row._mapping)
+    if isinstance(job["summary"], str):
+        job["summary"] = json.loads(job["summary"])
+    return EmbeddingStatusResponse(**{**job, "job_id": str(job["job_id"])})
@@ -0,0 +1,364 @@
+"""
+임베딩 저장 방식(EMBEDDING_PROFILE) 변환 및 비교
+
+    # 1) 현재(full) 벡터로 프로필별 recall/지연 비교
+    python -m app.services.embedding_profile_service report --k 3 --query "교육 매뉴얼 전체 요약"
+
+    # 2) EMBEDDING_PROFILE을 바꾼 설정으로 기존 chunk_embeddings 변환 후 배포
+    EMBEDDING_PROFILE=halfvec python -m app.services.embedding_profile_service reencode
+
+- reencode는 새 컬럼에 배치로 변환해 채운 뒤 짧은 잠금 안에서 컬럼을 교체하고 인덱스를 다시 만듦
+  (변환 중 추가된 row도 잠금 없이 다시 돌며 채우고, 잠금 안에서는 API 호출 없이 교체만 함)
+- 차원을 줄이는 변환(1536 → 512)은 앞쪽 차원만 남기고 다시 정규화 (text-embedding-3의 dimensions와 같은 방식)
+- 차원을 늘리는 변환(512 → 1536)은 저장된 content로 다시 임베딩 (API 호출)
+"""
+from app.core.db import dispose_engine, get_engine
+from app.core.openai_client import get_client
+from app.core.openai_scheduler import BULK, openai_call
+from app.core.schema import (
+    BINARY_RERANK_CANDIDATES, EMBEDDING_DIMENSIONS, EMBEDDING_PROFILE, VECTOR_COLUMN, VECTOR_TYPE,
+    drop_vector_indexes, embedding_column_type, reindex,
+)
+from app.services.rag_service import EMBEDDING_KEY, EMBEDDING_MODEL, _batch_chunks, _embed_batch
+from app.services.vector_index_service import top_indices
+from sqlalchemy import text
+import numpy as np
+import os
+import re
+import json
+import time
+import asyncio
+import argparse
+import logging
+
+logger = logging.getLogger(__name__)
+
+REENCODE_BATCH_SIZE = int(os.getenv("REENCODE_BATCH_SIZE", "500"))
+REENCODE_SWAP_ATTEMPTS = int(os.getenv("REENCODE_SWAP_ATTEMPTS", "3"))  # 잠금 직전에 row가 추가돼 교체를 미룬 경우 재시도 횟수
+
+# 프로필별 벡터 하나의 인덱스 크기 (바이트, row 헤더 제외)
+PROFILE_INDEX_BYTES = {
+    "full": 1536 * 4,
+    "512": 512 * 4,
+    "halfvec": 1536 * 2,
+    "binary": 1536 // 8,
+}
+
+# 바이트별 1비트 개수 (해밍 거리 계산용)
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _column_dimensions(column_type: str) -> int:
+    match = re.search(r"\((\d+)\)", column_type or "")
+    if not match:
+        raise ValueError(f"차원을 알 수 없는 embedding 컬럼 타입: {column_type}")
+    return int(match.group(1))
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def reduce_dimensions(vectors: np.ndarray, dimensions: int) -> np.ndarray:
+    """앞쪽 dimensions개 차원만 남기고 다시 정규화"""
+    return normalize(np.asarray(vectors, dtype=np.float32)[..., :dimensions])
+
+
+class _SwapDeferred(Exception):
+    """잠금을 잡은 사이 다시 임베딩해야 할 row가 생겨 컬럼 교체를 미룸"""
+
+
+async def _pending_rows(conn, after: str, batch_size: int):
+    """embedding_next가 비어 있는 row를 content_hash 순서로 batch_size개"""
+    return (await conn.execute(
+        text("""
+            SELECT content_hash, content, embedding
+            FROM chunk_embeddings
+            WHERE embedding_next IS NULL AND content_hash > :after
+            ORDER BY content_hash
+            LIMIT :limit
+        """),
+        {"after": after, "limit": batch_size}
+    )).fetchall()
+
+
+def _needs_api(source_dims: int) -> bool:
+    # 줄인 차원에서 원래 차원은 복원할 수 없으므로 content로 다시 임베딩해야 함
+    return EMBEDDING_DIMENSIONS > source_dims
+
+
+async def _convert_rows(rows, source_dims: int):
+    """
+    row들을 EMBEDDING_PROFILE 벡터로 변환 (차원을 늘리는 경우 API 호출이므로 트랜잭션 밖에서 호출)
+    반환: ({content_hash: 벡터}, 다시 임베딩한 row 수, 실패 row 수)
+    """
+    if not _needs_api(source_dims):
+        vectors = reduce_dimensions(np.vstack([r.embedding for r in rows]), EMBEDDING_DIMENSIONS)
+        return {r.content_hash: vectors[n] for n, r in enumerate(rows)}, 0, 0
+
+    converted, failed = {}, 0
+    # 임베딩 요청은 EMBED_BATCH_SIZE / EMBED_BATCH_MAX_CHARS 상한에 맞춰 나눠 보냄
+    for batch in _batch_chunks([(n, r.content) for n, r in enumerate(rows)]):
+        embeddings, failures = await _embed_batch(batch)
+        converted.update({rows[n].content_hash: emb for n, emb in embeddings.items()})
+        failed += len(failures)
+        for n, error in failures.items():
+            logger.warning(f"[PROFILE] 재임베딩 실패 | content_hash={rows[n].content_hash}, error={error}")
+    return converted, len(converted), failed
+
+
+async def _store_rows(conn, converted: dict):
+    if converted:
+        await conn.execute(
+            text(f"""
+                UPDATE chunk_embeddings
+                SET embedding_next = (:embedding)::{VECTOR_TYPE}, model = :model
+                WHERE content_hash = :content_hash
+            """),
+            [
+                {"content_hash": content_hash, "embedding": emb, "model": EMBEDDING_KEY}
+                for content_hash, emb in converted.items()
+            ]
+        )
+
+
+async def _reencode_pending(source_dims: int, batch_size: int, summary: dict) -> int:
+    """
+    embedding_next가 빈 row를 잠금 없이 배치마다 commit하며 변환
+    변환하는 사이 추가된 row도 채우도록, 새로 변환한 row가 없을 때까지 처음부터 다시 돔
+    반환: 마지막 회차의 실패 row 수
+    """
+    while True:
+        after, converted_total, failed_total = "", 0, 0
+        while True:
+            async with get_engine().begin() as conn:
+                rows = await _pending_rows(conn, after, batch_size)
+            if not rows:
+                break
+            after = rows[-1].content_hash
+
+            converted, re_embedded, failed = await _convert_rows(rows, source_dims)
+            async with get_engine().begin() as conn:
+                await _store_rows(conn, converted)
+            converted_total += len(converted)
+            failed_total += failed
+            summary["converted"] += len(converted)
+            summary["re_embedded"] += re_embedded
+            logger.info(f"[PROFILE] 변환 중 | converted={summary['converted']}")
+
+        if failed_total or not converted_total:
+            return failed_total
+
+
+async def reencode(batch_size: int = REENCODE_BATCH_SIZE) -> dict:
+    """chunk_embeddings를 현재 EMBEDDING_PROFILE 형식으로 변환하고 벡터 인덱스 재생성"""
+    async with get_engine().begin() as conn:
+        source_type = await embedding_column_type(conn)
+    if source_type is None:
+        raise ValueError("chunk_embeddings 테이블이 없습니다 (python -m app.core.schema ensure 먼저 실행)")
+
+    summary = {"profile": EMBEDDING_PROFILE, "from": source_type, "to": VECTOR_COLUMN,
+               "converted": 0, "re_embedded": 0, "failed": 0}
+    if source_type == VECTOR_COLUMN:
+        # 같은 컬럼 타입 (예: full ↔ binary)은 인덱스만 바꾸면 됨
+        logger.info(f"[PROFILE] 컬럼 변환 불필요, 인덱스만 재생성 | {VECTOR_COLUMN}")
+        await reindex(concurrently=True)
+        return summary
+
+    source_dims = _column_dimensions(source_type)
+    logger.info(f"[PROFILE] 변환 시작 | {source_type} → {VECTOR_COLUMN}")
+
+    async with get_engine().begin() as conn:
+        await conn.execute(text(
+            f"ALTER TABLE chunk_embeddings ADD COLUMN IF NOT EXISTS embedding_next {VECTOR_COLUMN}"
+        ))
+
+    for attempt in range(1, REENCODE_SWAP_ATTEMPTS + 1):
+        # 1) 서비스 중에도 돌 수 있도록 잠금 없이 변환 (API 호출은 여기서만)
+        failed = await _reencode_pending(source_dims, batch_size, summary)
+        if failed:
+            summary["failed"] = failed
+            raise RuntimeError(f"변환하지 못한 row {failed}개가 있어 컬럼을 교체하지 않았습니다 (다시 실행하면 이어서 변환)")
+
+        # 2) 잠금 안에서는 1) 이후 추가된 row만 변환하고 컬럼 교체
+        #    (다시 임베딩해야 하는 row면 잠금을 풀고 1)부터 다시)
+        try:
+            async with get_engine().begin() as conn:
+                await conn.execute(text("LOCK TABLE chunk_embeddings IN ACCESS EXCLUSIVE MODE"))
+                after = ""
+                while True:
+                    rows = await _pending_rows(conn, after, batch_size)
+                    if not rows:
+                        break
+                    if _needs_api(source_dims):
+                        raise _SwapDeferred()
+                    after = rows[-1].content_hash
+                    converted, _, _ = await _convert_rows(rows, source_dims)
+                    await _store_rows(conn, converted)
+                    summary["converted"] += len(converted)
+
+                await drop_vector_indexes(conn)
+                await conn.execute(text("ALTER TABLE chunk_embeddings DROP COLUMN embedding"))
+                await conn.execute(text("ALTER TABLE chunk_embeddings RENAME COLUMN embedding_next TO embedding"))
+                await conn.execute(text("ALTER TABLE chunk_embeddings ALTER COLUMN embedding SET NOT NULL"))
+            break
+        except _SwapDeferred:
+            logger.info(f"[PROFILE] 잠금 중 새 row가 있어 교체 연기 | attempt={attempt}")
+    else:
+        raise RuntimeError(
+            f"{REENCODE_SWAP_ATTEMPTS}번 시도하는 동안 새 row가 계속 추가돼 컬럼을 교체하지 못했습니다 (다시 실행하면 이어서 변환)"
+        )
+
+    await reindex(concurrently=True)
+    logger.info(f"[PROFILE] 변환 완료 | {summary}")
+    return summary
+
+
+def _profile_scorers(matrix: np.ndarray, rerank_candidates: int):
+    """
+    프로필별 (쿼리, 제외할 행) → 점수 함수 (점수가 클수록 가까움)
+    matrix는 정규화된 1536차원 float32 (full 기준)
+    """
+    reduced = reduce_dimensions(matrix, 512)
+    half = matrix.astype(np.float16).astype(np.float32)
+    bits = np.packbits(matrix > 0, axis=1)
+
+    def full(query, exclude):
+        scores = matrix @ query
+        if exclude is not None:
+            scores[exclude] = -np.inf
+        return scores
+
+    def dims_512(query, exclude):
+        scores = reduced @ reduce_dimensions(query, 512)
+        if exclude is not None:
+            scores[exclude] = -np.inf
+        return scores
+
+    def halfvec(query, exclude):
+        scores = half @ query.astype(np.float16).astype(np.float32)
+        if exclude is not None:
+            scores[exclude] = -np.inf
+        return scores
+
+    def binary(query, exclude):
+        hamming = _POPCOUNT[np.bitwise_xor(bits, np.packbits(query > 0))].sum(axis=1, dtype=np.int32)
+        if exclude is not None:
+            hamming[exclude] = np.iinfo(np.int32).max
+        candidates = np.argsort(hamming, kind="stable")[:rerank_candidates]
+        if exclude is not None:
+            candidates = candidates[candidates != exclude]
+        scores = np.full(len(matrix), -np.inf, dtype=np.float32)
+        scores[candidates] = matrix[candidates] @ query
+        return scores
+
+    return {"full": full, "512": dims_512, "halfvec": halfvec, "binary": binary}
+
+
+async def _load_full_vectors(manual_ids=None):
+    """매뉴얼별 정규화된 1536차원 벡터 행렬"""
+    async with get_engine().begin() as conn:
+        column_type = await embedding_column_type(conn)
+        if column_type is None or _column_dimensions(column_type) != 1536:
+            raise ValueError(f"비교에는 1536차원 벡터가 필요합니다 (현재 {column_type})")
+        rows = (await conn.execute(
+            text(f"""
+                SELECT m.manual_id, c.embedding
+                FROM manual_embeddings m
+                JOIN chunk_embeddings c ON c.content_hash = m.content_hash
+                {"WHERE m.manual_id = ANY(:manual_ids)" if manual_ids else ""}
+                ORDER BY m.manual_id, m.id
+            """),
+            {"manual_ids": list(manual_ids)} if manual_ids else {}
+        )).fetchall()
+
+    grouped = {}
+    for r in rows:
+        grouped.setdefault(r.manual_id, []).append(np.asarray(r.embedding, dtype=np.float32))
+    return {manual_id: normalize(np.vstack(vectors)) for manual_id, vectors in grouped.items()}
+
+
+async def profile_report(k: int = 3, manual_ids=None, queries=None,
+                         rerank_candidates: int = BINARY_RERANK_CANDIDATES) -> dict:
+    """
+    저장된 매뉴얼 벡터로 프로필별 top-k recall(full 대비)과 쿼리당 계산 시간 비교
+    - 쿼리: 각 chunk 자신(자기 자신은 제외하고 이웃 검색) + 주어진 검색 문장
+    - 시간은 프로세스 내 전수 계산 기준이라 DB 인덱스 지연과는 다르며 상대 비교용
+    """
+    manuals = await _load_full_vectors(manual_ids)
+
+    text_queries = []
+    if queries:
+        response = await openai_call(
+            get_client().embeddings.create, model=EMBEDDING_MODEL, priority=BULK, input=list(queries)
+        )
+        text_queries = [normalize(np.asarray(d.embedding, dtype=np.float32)) for d in response.data]
+
+    names = list(PROFILE_INDEX_BYTES)
+    recall = {name: [] for name in names}
+    elapsed = {name: 0.0 for name in names}
+    query_count = 0
+
+    for matrix in manuals.values():
+        scorers = _profile_scorers(matrix, rerank_candidates)
+        cases = [(matrix[n], n) for n in range(len(matrix)) if len(matrix) > 1]
+        cases += [(q, None) for q in text_queries]
+
+        for query, exclude in cases:
+            available = len(matrix) - (exclude is not None)
+            limit = min(k, available)
+            results = {}
+            for name in names:
+                started = time.perf_counter()
+                results[name] = top_indices(scorers[name](query, exclude), limit)
+                elapsed[name] += time.perf_counter() - started
+
+            expected = set(results["full"].tolist())
+            for name in names:
+                recall[name].append(len(expected & set(results[name].tolist())) / limit)
+            query_count += 1
+
+    return {
+        "k": k,
+        "manuals": len(manuals),
+        "chunks": int(sum(len(m) for m in manuals.values())),
+        "queries": query_count,
+        "rerank_candidates": rerank_candidates,
+        "profiles": {
+            name: {
+                "recall_at_k": round(float(np.mean(recall[name])), 4) if recall[name] else None,
+                "avg_query_us": round(elapsed[name] / query_count * 1e6, 2) if query_count else None,
+                "index_bytes_per_vector": PROFILE_INDEX_BYTES[name],
+                "index_reduction": round(PROFILE_INDEX_BYTES["full"] / PROFILE_INDEX_BYTES[name], 1),
+            }
+            for name in names
+        },
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="임베딩 저장 방식 변환/비교")
+    sub = parser.add_subparsers(dest="command", required=True)
+    reencode_parser = sub.add_parser("reencode", help="chunk_embeddings를 EMBEDDING_PROFILE 형식으로 변환")
+    reencode_parser.add_argument("--batch-size", type=int, default=REENCODE_BATCH_SIZE)
+    report_parser = sub.add_parser("report", help="프로필별 recall/지연 비교 (JSON 출력)")
+    report_parser.add_argument("--k", type=int, default=3)
+    report_parser.add_argument("--manual-id", type=int, action="append")
+    report_parser.add_argument("--query", action="append", help="비교에 추가할 검색 문장 (API로 임베딩)")
+    report_parser.add_argument("--rerank-candidates", type=int, default=BINARY_RERANK_CANDIDATES)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s - %(message)s")
+
+    async def main():
+        try:
+            if args.command == "reencode":
+                result = await reencode(args.batch_size)
+            else:
+                result = await profile_report(args.k, args.manual_id, args.query, args.rerank_candidates)
+            print(json.dumps(result, ensure_ascii=False, indent=2))
+        finally:
+            await dispose_engine()
+
+    asyncio.run(main())
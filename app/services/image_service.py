@@ -1,43 +1,89 @@
-from app.core.openai_client import client
-from app.services.s3_service import upload_image_to_s3
+from app.core.openai_client import get_client
+from app.core.openai_scheduler import NORMAL, openai_call
+from app.core.metrics import stage_timer
+from app.services.s3_service import fetch_image_bytes, upload_bytes_to_s3, upload_image_to_s3
+from app.services.panel_service import build_card_slides, panels_enabled
 import os
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
 
 # 카드뉴스용 이미지 만드는 함수
-def generate_cardnews_image(prompt: str) -> str:
-    """DALL·E 3로 4컷 카드뉴스 이미지 생성"""
-
+async def generate_cardnews_assets(prompt: str, title: str, contents: list):
+    """
+    4컷 이미지 생성 + 원본 저장 + 컷별 이미지 후처리
+    - DALL-E 이미지는 한 번만 다운로드해서 원본 S3 업로드와 컷 이미지 후처리에 같이 사용 (병렬 실행)
+    - 반환: (image_url, cards) / 이미지 생성 실패 시 ("", []), 후처리만 실패하면 cards는 []
+    """
     # enhanced_prompt를 사용하지 않고, create_four_panel_prompt_from_contents에서 
     # 생성한 프롬프트를 직접 사용
     # 지시한 내용의 중복을 발생하지 않기위해. AI가 헷갈려할 위험을 줄임
+    try:
+        with stage_timer("generate_cardnews", "dalle"):
+            source_url = await create_cardnews_image(prompt)
+    except Exception as e:
+        logger.error(f"[CARDNEWS] 이미지 생성 실패: {e}")
+        return "", []
+
+    if not panels_enabled():
+        with stage_timer("generate_cardnews", "store_image"):
+            return await store_cardnews_image(source_url), []
 
     try:
-        logger.info("[CARDNEWS] DALL-E 카드뉴스 이미지 생성 요청 시작")
-
-        # 이미지 생성 API 호출
-        response = client.images.generate(
-            model="dall-e-3",
-            prompt=prompt,
-            size="1024x1024",
-            quality="hd",
-            n=1,
+        with stage_timer("generate_cardnews", "download_image"):
+            data, content_type = await asyncio.to_thread(fetch_image_bytes, source_url)
+    except Exception as e:
+        logger.error(f"[CARDNEWS] 이미지 다운로드 실패: {e}")
+        return source_url, []
+
+    with stage_timer("generate_cardnews", "store_image_and_panels"):
+        image_url, cards = await asyncio.gather(
+            asyncio.to_thread(upload_bytes_to_s3, data, "cardnews", content_type),
+            build_card_slides(data, title, contents),
+            return_exceptions=True
         )
+    if isinstance(image_url, BaseException):
+        logger.error(f"[CARDNEWS] 이미지 저장 실패: {image_url}")
+        image_url = source_url
+    if isinstance(cards, BaseException):
+        logger.error(f"[CARDNEWS] 컷 이미지 후처리 실패: {cards}")
+        cards = []
+    return image_url, cards
 
-        # 응답에서 이미지 URL 가져오기
-        image_url = response.data[0].url
-        logger.info(f"[CARDNEWS] 이미지 생성 완료 | url={image_url}")
 
-        # S3 환경변수 값을 읽어 true시 S3에 업로드
-        use_s3 = os.getenv("USE_S3", "false").lower() == "true"
-        if use_s3:
-            logger.info("[CARDNEWS] S3 업로드 시작")
-            return upload_image_to_s3(image_url, folder="cardnews")
-        else:
-            logger.info("[CARDNEWS] S3 비활성화 - DALL-E URL 그대로 사용")
-            return image_url
+async def create_cardnews_image(prompt: str) -> str:
+    """DALL·E 3 이미지 생성 후 임시 URL 반환 (실패 시 예외)"""
+    logger.info("[CARDNEWS] DALL-E 카드뉴스 이미지 생성 요청 시작")
 
-    except Exception as e:
-        logger.error(f"[CARDNEWS] 이미지 생성 실패: {e}")
-        return ""
\ No newline at end of file
+    # 이미지 생성 API 호출
+    response = await openai_call(
+        get_client().images.generate,
+        model="dall-e-3",
+        priority=NORMAL,
+        prompt=prompt,
+        size="1024x1024",
+        quality="hd",
+        n=1,
+    )
+
+    # 응답에서 이미지 URL 가져오기
+    image_url = response.data[0].url
+    logger.info(f"[CARDNEWS] 이미지 생성 완료 | url={image_url}")
+    return image_url
+
+
+async def store_cardnews_image(image_url: str, fallback: bool = True) -> str:
+    """
+    USE_S3=true면 S3에 업로드한 영구 URL, 아니면 DALL-E URL 그대로 반환
+    - fallback=False면 업로드 실패 시 원본 URL 대신 예외 발생 (작업 재시도용)
+    """
+    # S3 환경변수 값을 읽어 true시 S3에 업로드
+    use_s3 = os.getenv("USE_S3", "false").lower() == "true"
+    if use_s3:
+        logger.info("[CARDNEWS] S3 업로드 시작")
+        # boto3/requests는 동기 라이브러리라 스레드에서 실행 (이벤트 루프 블로킹 방지)
+        return await asyncio.to_thread(upload_image_to_s3, image_url, "cardnews", fallback)
+    else:
+        logger.info("[CARDNEWS] S3 비활성화 - DALL-E URL 그대로 사용")
+        return image_url
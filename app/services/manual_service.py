@@ -1,6 +1,10 @@
-from app.core.openai_client import client
-from app.models.manual_model import ManualResponse
+from app.core.openai_client import get_client
+from app.core.openai_scheduler import INTERACTIVE, openai_call, openai_stream
+from app.core.metrics import STAGE_LATENCY, stage_timer
+from app.models.manual_model import ManualResponse, ProcedureItem
+from app.services.context_service import log_token_usage
 import json
+import time
 
 def classify_tone(tone_text: str) -> str:
     """tone 문자열을 기반으로 말투 카테고리 추정"""
@@ -53,9 +57,11 @@ def classify_tone(tone_text: str) -> str:
         return "neutral"
 
 
-def generate_manual(business_type, title, goal, procedure, precaution, tone):
-    """사장님 입력을 기반으로 AI가 교육 매뉴얼을 구조화된 JSON 형식으로 생성"""
-    
+MANUAL_SYSTEM_PROMPT = "너는 한국어로 소상공인 알바 교육 매뉴얼을 작성하는 전문가야. 반드시 JSON으로만 응답해."
+
+
+def build_manual_prompt(business_type, title, goal, procedure, precaution, tone) -> str:
+    """사장님 입력과 tone 분류로 매뉴얼 생성 프롬프트 구성 (일반/스트리밍 생성 공용)"""
     tone_type = classify_tone(tone)
 
     # tone_type별 추가 설명 문구
@@ -135,21 +141,12 @@ def generate_manual(business_type, title, goal, procedure, precaution, tone):
       ]
     }}
     """
+    return prompt
 
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {
-                "role": "system",
-                "content": "너는 한국어로 소상공인 알바 교육 매뉴얼을 작성하는 전문가야. 반드시 JSON으로만 응답해."
-            },
-            {"role": "user", "content": prompt}
-        ],
-        temperature=1.0
-    )
-
-    content = response.choices[0].message.content.strip()
 
+def parse_manual_response(content: str) -> ManualResponse:
+    """GPT 응답 문자열을 ManualResponse로 변환 (goal/precaution 형식 보정 포함)"""
+    content = content.strip()
     try:
         # GPT가 ```json ``` 블록으로 감쌀 수 있으므로 제거
         content = content.replace("```json", "").replace("```", "").strip()
@@ -167,3 +164,136 @@ def generate_manual(business_type, title, goal, procedure, precaution, tone):
 
     except Exception as e:
         raise ValueError(f"AI 응답 파싱 실패: {e}\n응답 내용: {content}")
+
+
+async def generate_manual(business_type, title, goal, procedure, precaution, tone):
+    """사장님 입력을 기반으로 AI가 교육 매뉴얼을 구조화된 JSON 형식으로 생성"""
+    prompt = build_manual_prompt(business_type, title, goal, procedure, precaution, tone)
+
+    with stage_timer("generate_manual", "openai"):
+        response = await openai_call(
+            get_client().chat.completions.create,
+            model="gpt-4o-mini",
+            priority=INTERACTIVE,
+            messages=[
+                {"role": "system", "content": MANUAL_SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=1.0
+        )
+    log_token_usage("MANUAL", response.usage)
+
+    return parse_manual_response(response.choices[0].message.content)
+
+
+class ManualStreamParser:
+    """
+    스트리밍으로 들어오는 매뉴얼 JSON에서 완성된 항목을 바로 꺼내는 파서
+    - feed(delta)마다 이번에 새로 완성된 (이벤트, 값) 목록 반환
+    - title/goal 문자열, procedure 객체 하나, precaution 문자열 하나가 닫히는 시점에 이벤트
+    - 코드블록(```json) 등 JSON 밖의 문자는 무시, 최종 검증은 parse_manual_response가 담당
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0
+        self.stack = []  # 열린 '{' / '[' (stack[0]이 최상위 객체)
+        self.in_string = False
+        self.escape = False
+        self.string_start = 0
+        self.item_start = None
+        self.key = None  # 최상위 객체에서 현재 값의 key
+        self.expect_key = False
+
+    def feed(self, delta: str):
+        self.buffer += delta
+        events = []
+        while self.pos < len(self.buffer):
+            ch = self.buffer[self.pos]
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+                    self._on_string(self.buffer[self.string_start:self.pos + 1], events)
+            elif ch == '"':
+                self.in_string = True
+                self.string_start = self.pos
+            elif ch in "{[":
+                self.stack.append(ch)
+                if len(self.stack) == 1:
+                    self.expect_key = True
+                elif ch == "{" and self._in_array("procedure", depth=3):
+                    self.item_start = self.pos
+            elif ch in "}]":
+                if self.stack:
+                    self.stack.pop()
+                if ch == "}" and self.item_start is not None and self._in_array("procedure", depth=2):
+                    self._on_procedure(self.buffer[self.item_start:self.pos + 1], events)
+                    self.item_start = None
+            elif ch == "," and len(self.stack) == 1:
+                self.expect_key = True
+            self.pos += 1
+        return events
+
+    def _in_array(self, key: str, depth: int) -> bool:
+        return len(self.stack) == depth and self.stack[1] == "[" and self.key == key
+
+    def _on_string(self, raw: str, events):
+        value = json.loads(raw)
+        if len(self.stack) == 1:
+            if self.expect_key:
+                self.key = value
+                self.expect_key = False
+            elif self.key in ("title", "goal"):
+                events.append((self.key, value))
+        elif self._in_array("precaution", depth=2):
+            events.append(("precaution", value))
+
+    def _on_procedure(self, raw: str, events):
+        try:
+            item = ProcedureItem(**json.loads(raw))
+        except Exception:
+            return  # 형식이 어긋난 항목은 건너뛰고 최종 검증에서 처리
+        events.append(("procedure", item.model_dump()))
+
+
+async def stream_manual(business_type, title, goal, procedure, precaution, tone):
+    """
+    매뉴얼 스트리밍 생성 (stream=True)
+    - 절차 항목/주의사항이 완성될 때마다 (이벤트, 값)을 yield
+    - 마지막에 전체 응답을 검증한 ("manual", ManualResponse dict)를 yield
+    """
+    prompt = build_manual_prompt(business_type, title, goal, procedure, precaution, tone)
+
+    parser = ManualStreamParser()
+    first_event = True
+    started = time.perf_counter()
+    async with openai_stream(
+        get_client().chat.completions.create,
+        model="gpt-4o-mini",
+        priority=INTERACTIVE,
+        messages=[
+            {"role": "system", "content": MANUAL_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+        temperature=1.0,
+        stream_options={"include_usage": True}
+    ) as stream:
+        async for chunk in stream:
+            if chunk.usage is not None:
+                # 토큰 지표 / TPM 정산은 openai_stream이 처리
+                log_token_usage("MANUAL", chunk.usage)
+            if not chunk.choices:
+                continue
+            for event in parser.feed(chunk.choices[0].delta.content or ""):
+                if first_event:
+                    # 첫 항목까지 걸린 시간 (스트리밍의 체감 대기 시간)
+                    STAGE_LATENCY.labels("generate_manual", "stream_first_item", "ok").observe(time.perf_counter() - started)
+                    first_event = False
+                yield event
+    STAGE_LATENCY.labels("generate_manual", "stream_total", "ok").observe(time.perf_counter() - started)
+
+    yield "manual", parse_manual_response(parser.buffer).model_dump()
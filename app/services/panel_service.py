@@ -0,0 +1,105 @@
+"""
+카드뉴스 4컷 이미지 후처리
+- 2x2 그리드를 NumPy 배열 view로 4컷으로 자르고
+- 컷별 WebP(+ 지원 시 AVIF) 이미지와 썸네일을 만들어 S3에 병렬 업로드
+- 모바일은 1024x1024 HD PNG 대신 필요한 컷/썸네일만 받음
+"""
+from app.models.cardnews_model import CardSlide
+from app.services.s3_service import upload_bytes_to_s3
+from PIL import Image, features
+import numpy as np
+import io
+import os
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+CARDNEWS_SPLIT_PANELS = os.getenv("CARDNEWS_SPLIT_PANELS", "true").lower() == "true"
+PANEL_WEBP_QUALITY = int(os.getenv("PANEL_WEBP_QUALITY", "80"))
+PANEL_AVIF_QUALITY = int(os.getenv("PANEL_AVIF_QUALITY", "60"))
+PANEL_THUMBNAIL_SIZE = int(os.getenv("PANEL_THUMBNAIL_SIZE", "256"))  # 긴 변 기준 px
+
+AVIF_SUPPORTED = features.check("avif")
+
+
+def panels_enabled() -> bool:
+    """컷 이미지는 S3에 올려야 URL을 줄 수 있으므로 USE_S3일 때만 동작"""
+    return CARDNEWS_SPLIT_PANELS and os.getenv("USE_S3", "false").lower() == "true"
+
+
+def split_four_panels(image: np.ndarray):
+    """
+    2x2 그리드 이미지를 좌상 → 우상 → 좌하 → 우하 순서의 4개 배열로 자름
+    (복사 없이 원본 배열의 view 반환)
+    """
+    height, width = image.shape[:2]
+    mid_y, mid_x = height // 2, width // 2
+    return [
+        image[:mid_y, :mid_x],
+        image[:mid_y, mid_x:],
+        image[mid_y:, :mid_x],
+        image[mid_y:, mid_x:],
+    ]
+
+
+def _encode(image: Image.Image, fmt: str, quality: int) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt, quality=quality)
+    return buffer.getvalue()
+
+
+def render_panel_variants(data: bytes):
+    """
+    원본 이미지 bytes → 컷별 인코딩 결과 목록
+    반환: [{"image/webp": bytes, "thumbnail": bytes, "image/avif": bytes(선택)}, ...]
+    """
+    with Image.open(io.BytesIO(data)) as original:
+        pixels = np.asarray(original.convert("RGB"))
+
+    variants = []
+    for panel in split_four_panels(pixels):
+        image = Image.fromarray(panel)
+        encoded = {"image/webp": _encode(image, "WEBP", PANEL_WEBP_QUALITY)}
+        if AVIF_SUPPORTED:
+            encoded["image/avif"] = _encode(image, "AVIF", PANEL_AVIF_QUALITY)
+
+        thumbnail = image.copy()
+        thumbnail.thumbnail((PANEL_THUMBNAIL_SIZE, PANEL_THUMBNAIL_SIZE))
+        encoded["thumbnail"] = _encode(thumbnail, "WEBP", PANEL_WEBP_QUALITY)
+        variants.append(encoded)
+    return variants
+
+
+async def build_card_slides(data: bytes, title: str, contents: list):
+    """
+    4컷 이미지(원본 bytes)를 잘라 컷별 이미지/썸네일을 S3에 올리고 CardSlide 목록 반환
+    - 원본 다운로드는 호출한 쪽에서 한 번만 (원본 업로드와 같은 bytes 사용)
+    """
+    # 이미지 디코딩/인코딩은 CPU 작업이라 스레드에서 실행
+    variants = await asyncio.to_thread(render_panel_variants, data)
+
+    uploads = []
+    for encoded in variants:
+        for kind, payload in encoded.items():
+            folder = "cardnews/thumbnails" if kind == "thumbnail" else "cardnews/panels"
+            content_type = "image/webp" if kind == "thumbnail" else kind
+            uploads.append(asyncio.to_thread(upload_bytes_to_s3, payload, folder, content_type))
+
+    # 모든 컷/썸네일 업로드를 병렬 실행
+    urls = iter(await asyncio.gather(*uploads))
+
+    slides = []
+    for i, encoded in enumerate(variants):
+        panel_urls = {kind: next(urls) for kind in encoded}
+        slides.append(CardSlide(
+            slide_id=i + 1,
+            title=title,
+            content=contents[i],
+            image_url=panel_urls["image/webp"],
+            thumbnail_url=panel_urls["thumbnail"],
+            avif_url=panel_urls.get("image/avif"),
+        ))
+
+    logger.info(f"[CARDNEWS] 컷 이미지 후처리 완료 | uploads={sum(len(e) for e in variants)}")
+    return slides
@@ -0,0 +1,315 @@
+"""
+퀴즈 문항 풀 (QUIZ_BANK_ENABLED=true)
+- 매뉴얼 임베딩이 끝나면 (manual_id, 말투 분류, focus)별로 검증된 QuizItem을 QUIZ_BANK_SIZE개까지 미리 생성해 quiz_bank 테이블에 저장
+- 요청 tone은 자유 문구("친절한 존댓말" 등)라 그대로 키로 쓰지 않고 bank_tone()으로 말투 분류에 맞춰 풀을 공유
+- /quiz/generate는 풀에서 OX 1개 + MULTIPLE 2개를 뽑아 바로 반환 (GPT 호출 없음)
+- 덜 낸 문항 → 오래전에 낸 문항 순으로 뽑아 최근에 낸 문항이 반복되지 않게 하고,
+  QUIZ_BANK_MAX_SERVES번 낸 문항은 빼고 남은 문항이 QUIZ_BANK_REFILL_BELOW개 미만이면 백그라운드로 다시 채움
+- 매뉴얼이 바뀌면(manual version) 이전 문항은 쓰지 않고 새로 채움
+"""
+from app.core.db import db_connect, spawn_detached
+from app.core.metrics import record_cache, stage_timer
+from app.core.openai_scheduler import BULK
+from app.models.quiz_model import QuizItem, QuizResponse
+from app.repositories.manual_repository import get_manual_version
+from app.services.manual_service import classify_tone
+from app.services.quiz_service import build_quiz_context, request_quiz
+from sqlalchemy import text
+import os
+import re
+import json
+import math
+import time
+import asyncio
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+QUIZ_BANK_ENABLED = os.getenv("QUIZ_BANK_ENABLED", "false").lower() == "true"
+QUIZ_BANK_SIZE = int(os.getenv("QUIZ_BANK_SIZE", "24"))  # (manual_id, 말투 분류, focus)별 목표 문항 수
+QUIZ_BANK_REFILL_BELOW = int(os.getenv("QUIZ_BANK_REFILL_BELOW", "9"))  # 남은 문항이 이보다 적으면 다시 채움
+QUIZ_BANK_MAX_SERVES = int(os.getenv("QUIZ_BANK_MAX_SERVES", "3"))  # 문항 하나를 낼 수 있는 최대 횟수
+QUIZ_BANK_FILL_CONCURRENCY = int(os.getenv("QUIZ_BANK_FILL_CONCURRENCY", "2"))  # 채울 때 동시 GPT 호출 수
+# 채웠는데 새 문항이 하나도 없으면(중복만 생성) 이 시간 동안은 다시 채우지 않음 (초)
+QUIZ_BANK_RETRY_SECONDS = float(os.getenv("QUIZ_BANK_RETRY_SECONDS", "600"))
+# 임베딩 완료 시 미리 채울 말투 분류 / focus 조합 (그 밖의 조합은 처음 요청이 들어왔을 때 채움)
+# QUIZ_BANK_TONES는 분류 이름이나 실제 tone 문구 모두 가능 (bank_tone으로 분류)
+QUIZ_BANK_TONES = [t.strip() for t in os.getenv("QUIZ_BANK_TONES", "formal").split(",") if t.strip()]
+QUIZ_BANK_FOCUSES = [f.strip() for f in os.getenv("QUIZ_BANK_FOCUSES", "procedure").split(",") if f.strip()]
+
+# 말투 분류 (manual_service.classify_tone과 같은 이름, 퀴즈 프롬프트의 tone 예시와도 같음)
+TONE_CATEGORIES = ("formal", "casual", "dialect", "friendly", "expressive", "neutral")
+
+# 말투를 설명하는 단어 → 분류 (classify_tone은 "~하세요" 같은 어미로 분류하므로 "친절한 존댓말"이 neutral이 됨)
+# 위에서부터 먼저 맞는 분류 사용 ("친절한 존댓말" → formal)
+_TONE_WORDS = {
+    "formal": ("존댓말", "존대", "높임", "격식", "정중"),
+    "casual": ("반말",),
+    "dialect": ("사투리", "방언"),
+    "friendly": ("친근", "친절", "다정"),
+    "expressive": ("유쾌", "활기", "신나"),
+}
+
+# 한 번에 내는 문항 구성 (generate_quiz 프롬프트와 같음)
+QUIZ_LAYOUT = {"OX": 1, "MULTIPLE": 2}
+
+_fills = {}  # (manual_id, tone, focus) -> 채우는 중인 task
+_fill_again = set()  # 채우는 도중 다시 요청된 키 (매뉴얼이 바뀐 경우 등)
+_stalled = {}  # 새 문항을 못 채운 키 -> 시각 (time.monotonic)
+_bank_stats = {"hits": 0, "misses": 0, "fills": 0, "items_added": 0, "items_rejected": 0}
+
+
+def validate_quiz_item(item: QuizItem) -> bool:
+    """풀에 넣을 수 있는 문항인지 (형식이 어긋나 화면에서 깨질 문항 제외)"""
+    if not item.question.strip() or not item.explanation.strip():
+        return False
+    answer = item.answer.strip().rstrip(")")
+    if item.type == "OX":
+        return [o.strip() for o in item.options] == ["O", "X"] and answer in ("O", "X")
+    if item.type == "MULTIPLE":
+        labels = [o.strip().split(")", 1)[0] for o in item.options]
+        return len(labels) >= 2 and len(set(labels)) == len(labels) and answer in labels
+    return False
+
+
+def bank_tone(tone: str) -> str:
+    """
+    요청 tone → 문항 풀 키로 쓰는 말투 분류
+    - 분류 이름이면 그대로, 말투를 설명하는 단어(_TONE_WORDS)가 있으면 그 분류
+    - 둘 다 아니면 classify_tone (어미 기준, 못 찾으면 neutral)
+    """
+    tone_text = (tone or "").strip().lower()
+    if tone_text in TONE_CATEGORIES:
+        return tone_text
+    for category, words in _TONE_WORDS.items():
+        if any(word in tone_text for word in words):
+            return category
+    return classify_tone(tone_text)
+
+
+def _item_hash(item: QuizItem) -> str:
+    """같은 질문이 여러 번 생성되면 하나만 저장 (공백 차이 무시)"""
+    question = re.sub(r"\s+", " ", item.question).strip()
+    return hashlib.sha256(question.encode("utf-8")).hexdigest()
+
+
+async def _available_counts(conn, params: dict) -> dict:
+    """아직 낼 수 있는 문항 수 (현재 매뉴얼 버전, QUIZ_BANK_MAX_SERVES 미만)"""
+    row = (await conn.execute(
+        text("""
+            SELECT count(*) FILTER (WHERE type = 'OX') AS ox,
+                   count(*) FILTER (WHERE type = 'MULTIPLE') AS multiple
+            FROM quiz_bank
+            WHERE manual_id = :manual_id AND tone = :tone AND focus = :focus
+              AND manual_version = :version AND served_count < :max_serves
+        """),
+        params
+    )).fetchone()
+    return {"OX": row._mapping["ox"], "MULTIPLE": row._mapping["multiple"]}
+
+
+def _needs_refill(counts: dict) -> bool:
+    return sum(counts.values()) < QUIZ_BANK_REFILL_BELOW or any(
+        counts[quiz_type] < n for quiz_type, n in QUIZ_LAYOUT.items()
+    )
+
+
+async def sample_quiz(manual_id: int, tone: str, focus: str = "procedure"):
+    """
+    풀에서 OX 1개 + MULTIPLE 2개를 뽑아 QuizResponse 반환
+    - 문항이 모자라면 None (호출한 쪽에서 바로 생성) 후 백그라운드로 채움
+    - 남은 문항이 적어지면 이번 응답은 그대로 주고 백그라운드로 채움
+    - tone은 bank_tone으로 분류한 풀에서 뽑음
+    """
+    tone = bank_tone(tone)
+    version = await get_manual_version(manual_id)
+    if version is None:
+        return None
+    params = {
+        "manual_id": manual_id, "tone": tone, "focus": focus,
+        "version": version, "max_serves": QUIZ_BANK_MAX_SERVES,
+    }
+
+    with stage_timer("quiz_bank", "sample"):
+        async with db_connect() as conn:
+            # 고르기 + served_count 증가를 한 문장으로: 동시에 들어온 요청은 잠긴 문항을 건너뛰고 다른 문항을 고름
+            # 종류별로 필요한 수를 다 채우지 못하면 아무것도 갱신하지 않음 (문항 부족)
+            rows = (await conn.execute(
+                text("""
+                    WITH ox AS (
+                        SELECT id FROM quiz_bank
+                        WHERE manual_id = :manual_id AND tone = :tone AND focus = :focus
+                          AND manual_version = :version AND served_count < :max_serves AND type = 'OX'
+                        ORDER BY served_count, last_served_at NULLS FIRST, random()
+                        LIMIT :ox
+                        FOR UPDATE SKIP LOCKED
+                    ),
+                    multiple AS (
+                        SELECT id FROM quiz_bank
+                        WHERE manual_id = :manual_id AND tone = :tone AND focus = :focus
+                          AND manual_version = :version AND served_count < :max_serves AND type = 'MULTIPLE'
+                        ORDER BY served_count, last_served_at NULLS FIRST, random()
+                        LIMIT :multiple
+                        FOR UPDATE SKIP LOCKED
+                    )
+                    UPDATE quiz_bank
+                    SET served_count = served_count + 1, last_served_at = now()
+                    WHERE id IN (SELECT id FROM ox UNION ALL SELECT id FROM multiple)
+                      AND (SELECT count(*) FROM ox) = :ox
+                      AND (SELECT count(*) FROM multiple) = :multiple
+                    RETURNING id, type, item
+                """),
+                {**params, "ox": QUIZ_LAYOUT["OX"], "multiple": QUIZ_LAYOUT["MULTIPLE"]}
+            )).fetchall()
+            complete = len(rows) == sum(QUIZ_LAYOUT.values())
+            counts = await _available_counts(conn, params)
+
+    record_cache("quiz_bank", complete)
+    if _needs_refill(counts):
+        schedule_fill(manual_id, tone, focus)
+    if not complete:
+        _bank_stats["misses"] += 1
+        logger.info(f"[QUIZ-BANK] 문항 부족 | manual_id={manual_id}, tone={tone}, focus={focus}, 남은 문항={counts}")
+        return None
+
+    _bank_stats["hits"] += 1
+    items = []
+    # RETURNING 순서는 보장되지 않으므로 OX → MULTIPLE 순으로 정렬
+    for r in sorted(rows, key=lambda r: list(QUIZ_LAYOUT).index(r._mapping["type"])):
+        item = r._mapping["item"]
+        items.append(QuizItem(**(json.loads(item) if isinstance(item, str) else item)))
+    return QuizResponse(quizzes=items)
+
+
+async def fill_quiz_bank(manual_id: int, tone: str, focus: str = "procedure"):
+    """
+    (manual_id, tone, focus) 풀을 QUIZ_BANK_SIZE개까지 채우고 추가된 문항 수 반환 (이미 차 있으면 None)
+    - 이전 버전 문항 / 다 쓴 문항은 먼저 삭제
+    - 프롬프트 컨텍스트는 한 번만 만들고, GPT 호출은 BULK 우선순위로 (사용자 요청이 먼저 처리됨)
+    - 문항은 말투 분류 이름(bank_tone)을 tone으로 넣어 생성 (같은 분류의 요청이 모두 이 풀을 씀)
+    """
+    tone = bank_tone(tone)
+    version = await get_manual_version(manual_id)
+    if version is None:
+        logger.warning(f"[QUIZ-BANK] 매뉴얼이 없어 채우지 않음 | manual_id={manual_id}")
+        return 0
+    params = {
+        "manual_id": manual_id, "tone": tone, "focus": focus,
+        "version": version, "max_serves": QUIZ_BANK_MAX_SERVES,
+    }
+
+    async with db_connect() as conn:
+        await conn.execute(
+            text("""
+                DELETE FROM quiz_bank
+                WHERE manual_id = :manual_id AND tone = :tone AND focus = :focus
+                  AND (manual_version <> :version OR served_count >= :max_serves)
+            """),
+            params
+        )
+        counts = await _available_counts(conn, params)
+
+    missing = QUIZ_BANK_SIZE - sum(counts.values())
+    if missing <= 0 and not _needs_refill(counts):
+        return None
+    rounds = max(1, math.ceil(missing / sum(QUIZ_LAYOUT.values())))
+
+    context = await build_quiz_context(manual_id, focus)
+    semaphore = asyncio.Semaphore(max(1, QUIZ_BANK_FILL_CONCURRENCY))
+
+    async def generate_round():
+        async with semaphore:
+            try:
+                return (await request_quiz(tone, context, BULK)).quizzes
+            except Exception as e:
+                logger.warning(f"[QUIZ-BANK] 문항 생성 실패 | manual_id={manual_id}, error={e}")
+                return []
+
+    with stage_timer("quiz_bank", "fill"):
+        generated = [item for batch in await asyncio.gather(*(generate_round() for _ in range(rounds))) for item in batch]
+    items = [item for item in generated if validate_quiz_item(item)]
+    _bank_stats["items_rejected"] += len(generated) - len(items)
+    if not items:
+        return 0
+
+    async with db_connect() as conn:
+        inserted = (await conn.execute(
+            text("""
+                INSERT INTO quiz_bank (manual_id, tone, focus, manual_version, type, item, item_hash)
+                SELECT :manual_id, :tone, :focus, :version, t.type, CAST(t.item AS jsonb), t.item_hash
+                FROM unnest(CAST(:types AS text[]), CAST(:items AS text[]), CAST(:hashes AS text[]))
+                     AS t(type, item, item_hash)
+                ON CONFLICT (manual_id, tone, focus, item_hash) DO NOTHING
+                RETURNING id
+            """),
+            {
+                "manual_id": manual_id, "tone": tone, "focus": focus, "version": version,
+                "types": [item.type for item in items],
+                "items": [item.model_dump_json() for item in items],
+                "hashes": [_item_hash(item) for item in items],
+            }
+        )).fetchall()
+
+    _bank_stats["fills"] += 1
+    _bank_stats["items_added"] += len(inserted)
+    logger.info(
+        f"[QUIZ-BANK] 문항 채움 | manual_id={manual_id}, tone={tone}, focus={focus}, "
+        f"generated={len(generated)}, valid={len(items)}, added={len(inserted)}"
+    )
+    return len(inserted)
+
+
+def schedule_fill(manual_id: int, tone: str, focus: str = "procedure"):
+    """백그라운드로 풀 채우기 (같은 키가 채우는 중이면 끝난 뒤 한 번 더 확인)"""
+    if not QUIZ_BANK_ENABLED:
+        return
+    tone = bank_tone(tone)
+    key = (manual_id, tone, focus)
+    if key in _fills:
+        _fill_again.add(key)
+        return
+    if time.monotonic() - _stalled.get(key, float("-inf")) < QUIZ_BANK_RETRY_SECONDS:
+        return
+
+    async def run():
+        try:
+            if await fill_quiz_bank(manual_id, tone, focus) == 0:
+                _stalled[key] = time.monotonic()
+            else:
+                _stalled.pop(key, None)
+        except Exception as e:
+            logger.error(f"[QUIZ-BANK] 채우기 실패 | manual_id={manual_id}, tone={tone}, focus={focus}, error={e}")
+
+    def done(task):
+        _fills.pop(key, None)
+        if key in _fill_again and not task.cancelled():
+            _fill_again.discard(key)
+            schedule_fill(*key)
+
+    task = spawn_detached(run())
+    _fills[key] = task
+    task.add_done_callback(done)
+
+
+def schedule_manual_fills(manual_id: int):
+    """매뉴얼 임베딩 완료 후 QUIZ_BANK_TONES x QUIZ_BANK_FOCUSES 조합을 미리 채움"""
+    # 매뉴얼이 바뀌었을 수 있으므로 이 매뉴얼의 재시도 대기는 해제
+    for key in [key for key in _stalled if key[0] == manual_id]:
+        del _stalled[key]
+    for tone in dict.fromkeys(bank_tone(t) for t in QUIZ_BANK_TONES):
+        for focus in QUIZ_BANK_FOCUSES:
+            schedule_fill(manual_id, tone, focus)
+
+
+async def stop_quiz_bank_fills():
+    """앱 종료 시 채우는 중인 작업 정리 (다음 요청에서 모자라면 다시 채움)"""
+    tasks = list(_fills.values())
+    _fill_again.clear()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def quiz_bank_stats() -> dict:
+    return {"enabled": QUIZ_BANK_ENABLED, "filling": len(_fills), **_bank_stats}
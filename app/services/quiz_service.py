@@ -1,48 +1,95 @@
-from app.core.openai_client import client
-from app.core.db import engine
-from sqlalchemy import text
-from app.services.rag_service import retrieve_similar
+from app.core.openai_client import get_client
+from app.core.openai_scheduler import INTERACTIVE, NORMAL, openai_call
+from app.core.db import release_request_connection
+from app.core.metrics import stage_timer
+from app.services.rag_service import retrieve_similar, retrieve_similar_batch
+from app.services.result_cache_service import cached_generation
+from app.repositories.manual_repository import get_manual, get_manual_version
 from app.models.quiz_model import QuizResponse, QuizItem
+from app.services.context_service import QUIZ_CONTEXT_TOKENS, build_context, log_token_usage
+import os
 import json
+import asyncio
+import logging
 
-def generate_quiz(manual_id: int, tone: str, focus: str = "procedure"):
+logger = logging.getLogger(__name__)
+
+# focus별 RAG 검색 쿼리 (고정 문자열이라 쿼리 임베딩 캐시로 재사용됨)
+QUIZ_QUERY_TEXTS = {
+    "procedure": "교육 절차 단계별 세부 내용과 순서를 중심으로 요약",
+    "summary": "교육 매뉴얼 전체 요약",
+}
+
+# hybrid 검색(RAG_RETRIEVAL_MODE=hybrid)에서 키워드로 함께 찾을 패턴 (Postgres 정규식, 대소문자 무시)
+# 프롬프트가 꼭 다루라고 하는 수치(°C, g, 초 등)와 도구 이름이 들어간 chunk를 놓치지 않도록
+QUIZ_LEXICAL_TERMS = [
+    r"[0-9]+(\.[0-9]+)?\s*(°C|℃|도)",
+    r"[0-9]+(\.[0-9]+)?\s*(kg|g|ml|l|cc|oz)([^a-z]|$)",
+    r"[0-9]+\s*(초|분|시간)",
+    r"[0-9]+\s*(개|번|회|잔|샷|스푼|펌프)",
+    r"그라인더|스팀\s*피처|포터필터|탬퍼|저울|온도계|타이머|블렌더|쉐이커|계량컵|스쿱",
+]
+# 검색할 chunk 수 (hybrid로 정확도가 오르면 줄여서 프롬프트 크기 절감)
+QUIZ_RETRIEVAL_LIMIT = int(os.getenv("QUIZ_RETRIEVAL_LIMIT", "5"))
+# 배치 생성(POST /quiz/generate/batch)에서 동시에 진행할 GPT 호출 수
+QUIZ_BATCH_CONCURRENCY = int(os.getenv("QUIZ_BATCH_CONCURRENCY", "4"))
+
+
+def _quiz_query_text(focus: str) -> str:
+    return QUIZ_QUERY_TEXTS["procedure"] if focus == "procedure" else QUIZ_QUERY_TEXTS["summary"]
+
+
+async def generate_quiz(manual_id: int, tone: str, focus: str = "procedure"):
     """
     절차 중심 퀴즈 생성 — step/detail 구조 기반으로 퀴즈를 만듦.
     """
+    context = await build_quiz_context(manual_id, focus)
+
+    # GPT 호출 동안 커넥션을 잡고 있지 않도록 반납
+    await release_request_connection()
+
+    return await request_quiz(tone, context, INTERACTIVE)
+
+
+async def build_quiz_context(manual_id: int, focus: str = "procedure") -> str:
+    """RAG 검색 결과(없으면 manual 테이블)로 퀴즈 프롬프트에 넣을 교육 내용 구성"""
     # 1️. 검색 쿼리 설정
-    query_text = (
-        "교육 절차 단계별 세부 내용과 순서를 중심으로 요약"
-        if focus == "procedure"
-        else "교육 매뉴얼 전체 요약"
-    )
+    query_text = _quiz_query_text(focus)
 
     # 2️. RAG 검색 수행
-    context_chunks = retrieve_similar(manual_id, query_text, limit=5)
+    with stage_timer("generate_quiz", "retrieve"):
+        context_chunks = await retrieve_similar(
+            manual_id, query_text, limit=QUIZ_RETRIEVAL_LIMIT, lexical_terms=QUIZ_LEXICAL_TERMS
+        )
+
+    # 3️. 컨텍스트 구성 (검색 결과가 없으면 manual 테이블 fallback)
+    return await _context_from_chunks(manual_id, context_chunks)
+
 
-    # 3️. fallback (manual 테이블 직접 조회)
+async def _context_from_chunks(manual_id: int, context_chunks: list) -> str:
+    # fallback (manual 테이블 직접 조회, 캐시 우선)
     if not context_chunks:
-        with engine.connect() as conn:
-            row = conn.execute(
-                text("SELECT ai_raw_response FROM manual WHERE id = :id"),
-                {"id": manual_id}
-            ).fetchone()
-
-        if row:
-            try:
-                manual_data = json.loads(row._mapping["ai_raw_response"])
-                procedure = manual_data.get("procedure", [])
-                context = json.dumps(procedure, ensure_ascii=False, indent=2)
-            except Exception:
-                context = "절차 데이터를 파싱할 수 없습니다."
-        else:
-            context = "교육 매뉴얼 내용이 없습니다."
+        try:
+            with stage_timer("generate_quiz", "fallback_lookup"):
+                record = await get_manual(manual_id)
+            if record:
+                procedure = record.data.get("procedure", [])
+                context = build_context(procedure, QUIZ_CONTEXT_TOKENS, tag="QUIZ")
+            else:
+                context = "교육 매뉴얼 내용이 없습니다."
+        except Exception:
+            context = "절차 데이터를 파싱할 수 없습니다."
     else:
         # 기존: 평문 문자열로 합침
         # context = "\n".join(context_chunks)
 
-        # 수정: 구조 유지(JSON 형태 그대로)
-        context = json.dumps(context_chunks, ensure_ascii=False, indent=2)
+        # 수정: 구조 유지(JSON 형태 그대로), 유사도 순으로 토큰 예산만큼
+        context = build_context(context_chunks, QUIZ_CONTEXT_TOKENS, tag="QUIZ")
+    return context
 
+
+async def request_quiz(tone: str, context: str, priority: int):
+    """컨텍스트로 퀴즈 프롬프트를 만들어 GPT 호출 후 QuizResponse로 파싱"""
     # 프롬프트 구성
     prompt = f"""
     너는 소상공인 알바생 교육용 퀴즈를 만드는 전문가야.
@@ -110,14 +157,18 @@ def generate_quiz(manual_id: int, tone: str, focus: str = "procedure"):
     """
 
     # GPT 호출
-    res = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": "너는 JSON만 반환하는 한국어 퀴즈 생성기야."},
-            {"role": "user", "content": prompt}
-        ],
-        temperature=0.9
-    )
+    with stage_timer("generate_quiz", "openai"):
+        res = await openai_call(
+            get_client().chat.completions.create,
+            model="gpt-4o-mini",
+            priority=priority,
+            messages=[
+                {"role": "system", "content": "너는 JSON만 반환하는 한국어 퀴즈 생성기야."},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.9
+        )
+    log_token_usage("QUIZ", res.usage)
 
     content = res.choices[0].message.content.strip()
     content = content.replace("```json", "").replace("```", "")
@@ -126,4 +177,61 @@ def generate_quiz(manual_id: int, tone: str, focus: str = "procedure"):
         quizzes = [QuizItem(**q) for q in data]
         return QuizResponse(quizzes=quizzes)
     except Exception as e:
-        raise ValueError(f"퀴즈 파싱 실패: {e}\n응답: {content}")
\ No newline at end of file
+        raise ValueError(f"퀴즈 파싱 실패: {e}\n응답: {content}")
+
+
+async def generate_quiz_batch(manual_ids, tone: str, focus: str = "procedure", force: bool = False):
+    """
+    여러 매뉴얼의 퀴즈를 한 번에 생성하고, 끝나는 순서대로 (event, data) 반환 (async generator)
+    - 검색 쿼리 임베딩 1번 + 매뉴얼별 top-k 검색 1쿼리 (retrieve_similar_batch)
+    - GPT 호출은 QUIZ_BATCH_CONCURRENCY개씩 NORMAL 우선순위로 (단건 생성 요청이 먼저 처리됨)
+    - 매뉴얼별 결과는 단건 생성과 같은 결과 캐시를 공유 (force=True면 새로 생성)
+    - quiz: {manual_id, quizzes} / error: {manual_id, detail} / done: {total, succeeded, failed}
+    """
+    manual_ids = list(dict.fromkeys(manual_ids))
+    with stage_timer("generate_quiz_batch", "retrieve"):
+        chunks_by_manual = await retrieve_similar_batch(
+            manual_ids, _quiz_query_text(focus), limit=QUIZ_RETRIEVAL_LIMIT, lexical_terms=QUIZ_LEXICAL_TERMS
+        )
+
+    # 컨텍스트(fallback 조회 포함)와 캐시 키용 매뉴얼 버전을 먼저 다 구한 뒤, GPT 호출 동안은 커넥션 반납
+    contexts = {}
+    versions = {}
+    for manual_id in manual_ids:
+        contexts[manual_id] = await _context_from_chunks(manual_id, chunks_by_manual.get(manual_id, []))
+        versions[manual_id] = await get_manual_version(manual_id)
+    await release_request_connection()
+
+    semaphore = asyncio.Semaphore(max(1, QUIZ_BATCH_CONCURRENCY))
+
+    async def generate(manual_id: int):
+        async def factory():
+            async with semaphore:
+                return await request_quiz(tone, contexts[manual_id], NORMAL)
+
+        try:
+            result = await cached_generation(
+                "quiz", manual_id, (tone, focus), factory, force=force, version=versions[manual_id]
+            )
+            return manual_id, result, None
+        except Exception as e:
+            logger.warning(f"[QUIZ] 배치 생성 실패 | manual_id={manual_id}, error={e}")
+            return manual_id, None, str(e)
+
+    tasks = [asyncio.create_task(generate(manual_id)) for manual_id in manual_ids]
+    succeeded = 0
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            manual_id, result, error = await next_done
+            if error is None:
+                succeeded += 1
+                yield "quiz", {"manual_id": manual_id, **result.model_dump()}
+            else:
+                yield "error", {"manual_id": manual_id, "detail": error}
+    finally:
+        # 클라이언트가 끊기면 남은 작업 취소 (이미 시작한 생성은 결과 캐시 쪽에서 계속 진행)
+        for task in tasks:
+            task.cancel()
+
+    logger.info(f"[QUIZ] 배치 생성 완료 | {succeeded}/{len(manual_ids)}개 성공")
+    yield "done", {"total": len(manual_ids), "succeeded": succeeded, "failed": len(manual_ids) - succeeded}
@@ -1,12 +1,38 @@
-from app.core.openai_client import client
-from app.core.db import engine
+from app.core.openai_client import get_client
+from app.core.openai_scheduler import BULK, INTERACTIVE, openai_call
+from app.core.db import db_connect, release_request_connection
+from app.core.cache import LRUCache
+from app.core.metrics import stage_timer
+from app.core.schema import (
+    EMBEDDING_DIMENSIONS, RAG_RETRIEVAL_MODE, VECTOR_TYPE, batch_search_sql, hybrid_search_sql, manual_search_sql,
+)
+from app.services.vector_index_service import RAG_MEMORY_INDEX, search_manual, invalidate_manual_vectors
 from sqlalchemy import text
+from collections import Counter
+import numpy as np
+import time
 import re
+import os
 import json
+import hashlib
 import logging
 
 logger = logging.getLogger(__name__)
 
+EMBEDDING_MODEL = "text-embedding-3-small"
+# 차원을 줄인 프로필(EMBEDDING_PROFILE=512)은 API에 dimensions를 넘기고, 저장/캐시 키도 모델과 구분
+EMBEDDING_OPTIONS = {"dimensions": EMBEDDING_DIMENSIONS} if EMBEDDING_DIMENSIONS != 1536 else {}
+EMBEDDING_KEY = EMBEDDING_MODEL if not EMBEDDING_OPTIONS else f"{EMBEDDING_MODEL}:{EMBEDDING_DIMENSIONS}"
+
+# 쿼리 임베딩 캐시 설정
+# - QUERY_EMBED_CACHE_SIZE: 프로세스 내 LRU 최대 항목 수
+# - QUERY_EMBED_CACHE_PERSIST: true면 query_embedding_cache 테이블에도 저장/조회
+QUERY_EMBED_CACHE_SIZE = int(os.getenv("QUERY_EMBED_CACHE_SIZE", "256"))
+QUERY_EMBED_CACHE_PERSIST = os.getenv("QUERY_EMBED_CACHE_PERSIST", "false").lower() == "true"
+
+_query_cache = LRUCache(maxsize=QUERY_EMBED_CACHE_SIZE, name="query_embedding")
+_query_cache_counters = {"db_hits": 0, "api_calls": 0}
+
 def chunk_text(manual_json):
     """
     매뉴얼 JSON에서 step-detail 구조를 보존한 채로 chunk를 구성.
@@ -38,82 +64,539 @@ def chunk_text(manual_json):
     logger.info(f"[RAG] chunk_text() 완료 | 총 {len(chunks)}개 chunk 생성")
     return chunks
 
-def embed_manual(manual_id: int, manual_json: dict):
+# 임베딩 요청 1회에 담을 최대 chunk 수 / 문자 수 (API 입력 제한 대비)
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "100"))
+EMBED_BATCH_MAX_CHARS = int(os.getenv("EMBED_BATCH_MAX_CHARS", "200000"))
+
+
+def _batch_chunks(chunk_strs):
+    """(index, chunk_str) 목록을 개수/문자 수 상한에 맞춰 여러 배치로 나눔"""
+    batch, batch_chars = [], 0
+    for item in chunk_strs:
+        size = len(item[1])
+        if batch and (len(batch) >= EMBED_BATCH_SIZE or batch_chars + size > EMBED_BATCH_MAX_CHARS):
+            yield batch
+            batch, batch_chars = [], 0
+        batch.append(item)
+        batch_chars += size
+    if batch:
+        yield batch
+
+
+async def _embed_batch(batch):
+    """
+    배치 단위로 임베딩 요청.
+    배치 요청이 실패하면 어떤 chunk가 문제인지 알 수 있도록 chunk별로 다시 요청.
+    반환: ({index: embedding}, {index: 에러 메시지})
+    """
+    try:
+        response = await openai_call(
+            get_client().embeddings.create,
+            model=EMBEDDING_MODEL,
+            priority=BULK,
+            input=[chunk_str for _, chunk_str in batch],
+            **EMBEDDING_OPTIONS
+        )
+        # 응답의 index는 input 순서 기준
+        return {batch[d.index][0]: np.asarray(d.embedding, dtype=np.float32) for d in response.data}, {}
+    except Exception as e:
+        if len(batch) == 1:
+            return {}, {batch[0][0]: str(e)}
+        logger.warning(f"[RAG] 배치 임베딩 실패, chunk별 재시도 | size={len(batch)}, error={e}")
+
+    embeddings, failures = {}, {}
+    for item in batch:
+        ok, failed = await _embed_batch([item])
+        embeddings.update(ok)
+        failures.update(failed)
+    return embeddings, failures
+
+
+def chunk_hash(chunk_str: str) -> str:
+    """직렬화된 chunk의 content hash (chunk_embeddings 테이블의 키)"""
+    return hashlib.sha256(chunk_str.encode("utf-8")).hexdigest()
+
+
+def _insert_chunk_embeddings_sql(rows):
+    """(content_hash, content, embedding) 목록을 chunk_embeddings upsert 한 문장으로 구성"""
+    values = []
+    params = {"model": EMBEDDING_KEY}
+    for n, (content_hash, content, emb) in enumerate(rows):
+        values.append(f"(:hash_{n}, :model, :content_{n}, (:embedding_{n})::{VECTOR_TYPE})")
+        params[f"hash_{n}"] = content_hash
+        params[f"content_{n}"] = content
+        params[f"embedding_{n}"] = emb
+
+    sql = text(
+        "INSERT INTO chunk_embeddings (content_hash, model, content, embedding) VALUES "
+        + ", ".join(values)
+        + " ON CONFLICT (content_hash) DO UPDATE"
+        " SET model = EXCLUDED.model, embedding = EXCLUDED.embedding"
+    )
+    return sql, params
+
+
+def _insert_manual_rows_sql(manual_id: int, rows):
+    """(content_hash, content) 목록을 manual_embeddings INSERT 한 문장(multi-row VALUES)으로 구성"""
+    values = []
+    params = {"manual_id": manual_id}
+    for n, (content_hash, content) in enumerate(rows):
+        values.append(f"(:manual_id, :content_{n}, :hash_{n})")
+        params[f"hash_{n}"] = content_hash
+        params[f"content_{n}"] = content
+
+    sql = text(
+        "INSERT INTO manual_embeddings (manual_id, content, content_hash) VALUES "
+        + ", ".join(values)
+    )
+    return sql, params
+
+
+# 같은 매뉴얼을 동시에 임베딩할 때 diff가 겹치지 않도록 잡는 advisory lock (class, manual_id)
+EMBED_LOCK_CLASS = 7413002
+
+
+def _diff_manual_rows(existing, rows):
+    """
+    저장된 row와 새 chunk 목록을 content_hash 기준 multiset으로 비교
+    - existing: 저장된 (id, content_hash) 목록 / rows: 새 (content_hash, content) 목록
+    - 같은 hash는 개수만큼 기존 row를 유지하고, 남는 기존 row는 삭제, 모자란 만큼 추가
+    반환: (유지할 id 목록, 삭제할 id 목록, 추가할 (content_hash, content) 목록)
+    """
+    remaining = Counter(content_hash for content_hash, _ in rows)
+    keep_ids, remove_ids = [], []
+    for row_id, content_hash in existing:
+        if remaining[content_hash] > 0:
+            remaining[content_hash] -= 1
+            keep_ids.append(row_id)
+        else:
+            remove_ids.append(row_id)
+
+    added = []
+    for content_hash, content in rows:
+        if remaining[content_hash] > 0:
+            remaining[content_hash] -= 1
+            added.append((content_hash, content))
+    return keep_ids, remove_ids, added
+
+
+async def _find_stored_hashes(hashes):
+    """chunk_embeddings에 이미 (같은 모델로) 저장된 content hash 조회"""
+    if not hashes:
+        return set()
+    async with db_connect() as conn:
+        rows = (await conn.execute(
+            text("""
+                SELECT content_hash
+                FROM chunk_embeddings
+                WHERE content_hash = ANY(:hashes) AND model = :model
+            """),
+            {"hashes": list(hashes), "model": EMBEDDING_KEY}
+        )).fetchall()
+    return {r[0] for r in rows}
+
+
+async def embed_manual(manual_id: int, manual_json: dict):
     """
     매뉴얼의 각 절차(step, details)를 구조화된 JSON으로 embedding 저장.
+    - 임베딩은 직렬화된 chunk의 hash 기준으로 chunk_embeddings에 한 번만 저장 (매뉴얼 간 공유)
+    - 처음 보는 chunk만 배치 임베딩 요청으로 한 번에(또는 몇 번에 나눠) 처리
+    - manual_id에 저장된 row와 chunk hash를 비교해 바뀐 부분만 반영 (유지 / 삭제 / 추가를 한 트랜잭션에서)
+      → 한 단계만 고친 매뉴얼은 임베딩 1건 + row 몇 개만 변경, 재임베딩해도 중복 없음
+    - kept / added / removed 및 chunk별 실패 내역을 요약으로 반환
     """
     chunks = chunk_text(manual_json)
     logger.info(f"[RAG] 임베딩 시작 | manual_id={manual_id}, chunk_count={len(chunks)}")
 
+    failures = {}
+    chunk_strs = []
     for i, chunk in enumerate(chunks):
         try:
             # JSON 직렬화
-            chunk_str = json.dumps(chunk, ensure_ascii=False)
-            # OpenAI 임베딩 요청
-            emb = client.embeddings.create(
-                model="text-embedding-3-small",
-                input=chunk_str
-            ).data[0].embedding
-
-            # PostgreSQL vector 캐스팅 위해 문자열 변환
-            emb_vector_str = "[" + ",".join(str(x) for x in emb) + "]"
-
-            # DB 저장
-            with engine.connect() as conn:
-                conn.execute(
-                    text("""
-                        INSERT INTO manual_embeddings (manual_id, content, embedding)
-                        VALUES (:manual_id, :content, (:embedding)::vector)
-                    """),
-                    {
-                        "manual_id": manual_id,
-                        "content": chunk_str,
-                        "embedding": emb_vector_str
-                    }
+            chunk_strs.append((i, json.dumps(chunk, ensure_ascii=False)))
+        except (TypeError, ValueError) as e:
+            failures[i] = f"직렬화 실패: {e}"
+
+    hashes = {i: chunk_hash(chunk_str) for i, chunk_str in chunk_strs}
+    with stage_timer("embed_manual", "lookup"):
+        stored = await _find_stored_hashes(set(hashes.values()))
+    # 임베딩 API 호출 동안 커넥션을 잡고 있지 않도록 반납
+    await release_request_connection()
+
+    # 처음 보는 content만 임베딩 (같은 매뉴얼 안의 중복 chunk도 한 번만)
+    to_embed = {}
+    for i, chunk_str in chunk_strs:
+        if hashes[i] not in stored:
+            to_embed.setdefault(hashes[i], (i, chunk_str))
+
+    embeddings = {}
+    with stage_timer("embed_manual", "embed"):
+        for batch in _batch_chunks(list(to_embed.values())):
+            ok, failed = await _embed_batch(batch)
+            embeddings.update(ok)
+            failures.update(failed)
+
+    new_vectors = [(hashes[i], chunk_str, embeddings[i]) for i, chunk_str in to_embed.values() if i in embeddings]
+    new_hashes = {content_hash for content_hash, _, _ in new_vectors}
+    available = stored | new_hashes
+
+    rows = []
+    for i, chunk_str in chunk_strs:
+        if hashes[i] in available:
+            rows.append((hashes[i], chunk_str))
+        elif i not in failures:
+            # 같은 content의 다른 chunk 임베딩이 실패한 경우
+            failures[i] = failures[to_embed[hashes[i]][0]]
+
+    # 성공한 chunk가 하나도 없으면 기존 임베딩을 그대로 둠
+    kept, added, removed = 0, 0, 0
+    if rows:
+        # DB 저장 (새 벡터 저장 + 기존 row와 diff 반영을 하나의 트랜잭션으로)
+        with stage_timer("embed_manual", "store"):
+            async with db_connect() as conn:
+                if new_vectors:
+                    await conn.execute(*_insert_chunk_embeddings_sql(new_vectors))
+                await conn.execute(
+                    text("SELECT pg_advisory_xact_lock(:lock_class, (:manual_id % 2147483647)::int)"),
+                    {"lock_class": EMBED_LOCK_CLASS, "manual_id": manual_id}
                 )
-                conn.commit()
+                existing = (await conn.execute(
+                    text("SELECT id, content_hash FROM manual_embeddings WHERE manual_id = :manual_id ORDER BY id"),
+                    {"manual_id": manual_id}
+                )).fetchall()
+                keep_ids, remove_ids, added_rows = _diff_manual_rows([tuple(r) for r in existing], rows)
+                if remove_ids:
+                    await conn.execute(
+                        text("DELETE FROM manual_embeddings WHERE id = ANY(:ids)"),
+                        {"ids": remove_ids}
+                    )
+                if added_rows:
+                    await conn.execute(*_insert_manual_rows_sql(manual_id, added_rows))
+        kept, added, removed = len(keep_ids), len(added_rows), len(remove_ids)
+        if added or removed:
+            invalidate_manual_vectors(manual_id)
+
+    for i, error in sorted(failures.items()):
+        logger.error(f"[RAG] {i+1}번 chunk 저장 실패: {error}")
+
+    logger.info(
+        f"[RAG] 임베딩 완료 | manual_id={manual_id}, kept={kept}, added={added}, removed={removed}, "
+        f"embedded={len(new_vectors)}, failed={len(failures)}"
+    )
+    return {
+        "manual_id": manual_id,
+        "total": len(chunks),
+        "saved": len(rows),
+        "kept": kept,
+        "added": added,
+        "removed": removed,
+        "embedded": len(new_vectors),
+        "reused": sum(1 for content_hash, _ in rows if content_hash not in new_hashes),
+        "failed": [
+            {"index": i, "error": error} for i, error in sorted(failures.items())
+        ],
+    }
 
-            logger.info(f"[RAG] {i+1}/{len(chunks)}번 chunk 저장 성공")
+def _query_cache_key(query: str):
+    """(모델, sha256(text)) 형태의 캐시 키"""
+    return EMBEDDING_KEY, hashlib.sha256(query.encode("utf-8")).hexdigest()
 
+
+async def _load_persisted_query_embedding(key):
+    model, text_hash = key
+    async with db_connect() as conn:
+        row = (await conn.execute(
+            text("""
+                SELECT embedding
+                FROM query_embedding_cache
+                WHERE model = :model AND text_hash = :text_hash
+            """),
+            {"model": model, "text_hash": text_hash}
+        )).fetchone()
+    return row[0] if row else None
+
+
+async def _persist_query_embedding(key, emb):
+    model, text_hash = key
+    async with db_connect() as conn:
+        await conn.execute(
+            text("""
+                INSERT INTO query_embedding_cache (model, text_hash, embedding)
+                VALUES (:model, :text_hash, (:embedding)::vector)
+                ON CONFLICT (model, text_hash) DO NOTHING
+            """),
+            {
+                "model": model,
+                "text_hash": text_hash,
+                "embedding": emb
+            }
+        )
+
+
+async def embed_query(query: str):
+    """
+    검색 쿼리 임베딩 (캐시 우선)
+    - 프로세스 내 LRU → (설정 시) DB 캐시 테이블 → OpenAI API 순서로 조회
+    """
+    key = _query_cache_key(query)
+    emb = _query_cache.get(key)
+    if emb is not None:
+        return emb
+
+    if QUERY_EMBED_CACHE_PERSIST:
+        try:
+            emb = await _load_persisted_query_embedding(key)
+        except Exception as e:
+            logger.warning(f"[RAG] 쿼리 임베딩 캐시 조회 실패 (무시): {e}")
+        if emb is not None:
+            _query_cache_counters["db_hits"] += 1
+            _query_cache.set(key, emb)
+            return emb
+
+    emb = np.asarray((await openai_call(
+        get_client().embeddings.create,
+        model=EMBEDDING_MODEL,
+        priority=INTERACTIVE,
+        input=query,
+        **EMBEDDING_OPTIONS
+    )).data[0].embedding, dtype=np.float32)
+    _query_cache_counters["api_calls"] += 1
+    _query_cache.set(key, emb)
+
+    if QUERY_EMBED_CACHE_PERSIST:
+        try:
+            await _persist_query_embedding(key, emb)
         except Exception as e:
-            logger.error(f"[RAG] {i+1}번 chunk 저장 실패: {e}")
+            logger.warning(f"[RAG] 쿼리 임베딩 캐시 저장 실패 (무시): {e}")
 
-def retrieve_similar(manual_id: int, query: str, limit: int = 3):
+    return emb
+
+
+async def warm_query_cache(queries):
+    """자주 쓰는 쿼리 임베딩을 미리 캐시에 올림 (앱 시작 시 호출)"""
+    for query in queries:
+        try:
+            await embed_query(query)
+        except Exception as e:
+            logger.warning(f"[RAG] 쿼리 임베딩 워밍업 실패: {e}")
+    logger.info(f"[RAG] 쿼리 임베딩 캐시 워밍업 완료 | size={len(_query_cache)}")
+
+
+def query_cache_stats() -> dict:
+    """쿼리 임베딩 캐시 hit/miss 통계"""
+    return {**_query_cache.stats(), **_query_cache_counters}
+
+
+# 검색 방식별 통계 (vector: DB 벡터 검색, memory: 인메모리 벡터 검색, hybrid: 벡터 + 키워드, batch: 여러 매뉴얼 한 번에)
+_retrieval_stats = {}
+
+
+def _record_retrieval(mode: str, elapsed_ms: float, results: int, lexical_results: int = 0):
+    stats = _retrieval_stats.setdefault(
+        mode, {"calls": 0, "total_ms": 0.0, "max_ms": 0.0, "results": 0, "lexical_results": 0}
+    )
+    stats["calls"] += 1
+    stats["total_ms"] += elapsed_ms
+    stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+    stats["results"] += results
+    stats["lexical_results"] += lexical_results
+
+
+def retrieval_stats() -> dict:
+    """검색 방식별 호출 수 / 평균·최대 지연 / 평균 결과 수 (hybrid는 키워드가 맞은 결과 비율 포함)"""
+    report = {"mode": RAG_RETRIEVAL_MODE}
+    for mode, stats in _retrieval_stats.items():
+        calls = stats["calls"]
+        report[mode] = {
+            "calls": calls,
+            "avg_ms": round(stats["total_ms"] / calls, 3),
+            "max_ms": round(stats["max_ms"], 3),
+            "avg_results": round(stats["results"] / calls, 2),
+        }
+        if mode == "hybrid":
+            report[mode]["lexical_result_ratio"] = (
+                round(stats["lexical_results"] / stats["results"], 3) if stats["results"] else 0.0
+            )
+    return report
+
+
+def lexical_patterns(query: str = None, terms=None) -> list:
+    """
+    hybrid 검색용 키워드 패턴 (Postgres 정규식, 대소문자 무시)
+    - terms를 주면 그대로 사용 (예: 수치+단위 정규식, 도구 이름)
+    - 없으면 query의 두 글자 이상 단어를 문자 그대로 매칭
+    """
+    if terms:
+        return list(terms)
+    words = re.findall(r"[\w°℃%]{2,}", query or "")
+    return [re.escape(word) for word in dict.fromkeys(words)]
+
+
+async def retrieve_similar(
+    manual_id: int, query: str, limit: int = 3, lexical_terms=None, mode: str = None,
+):
     """
     주어진 manual_id와 query를 기반으로 유사한 절차(chunk)를 반환.
+    - 거리 함수는 VECTOR_DISTANCE 설정(인덱스 operator class와 동일)을 따름
+    - 매뉴얼 chunk만 꺼내 정확히 정렬 (전체 ANN 인덱스를 쓰지 않으므로 ef_search/probes 불필요)
+    - mode: vector / hybrid (없으면 RAG_RETRIEVAL_MODE), hybrid는 lexical_terms(없으면 query 단어)로
+      키워드 후보를 함께 뽑아 RRF로 합침 (인메모리 인덱스는 벡터 전용이라 hybrid는 DB에서 검색)
     """
+    mode = mode or RAG_RETRIEVAL_MODE
     try:
-        # 쿼리 임베딩 생성
-        q_emb = client.embeddings.create(
-            model="text-embedding-3-small",
-            input=query
-        ).data[0].embedding
-        q_emb_str = "[" + ",".join(str(x) for x in q_emb) + "]"
-
-        # DB 검색
-        with engine.connect() as conn:
-            rows = conn.execute(
-                text("""
-                    SELECT content
-                    FROM manual_embeddings
-                    WHERE manual_id = :manual_id
-                    ORDER BY embedding <-> (:q_emb)::vector
-                    LIMIT :limit
-                """),
-                {"manual_id": manual_id, "q_emb": q_emb_str, "limit": limit}
-            ).fetchall()
+        # 쿼리 임베딩 생성 (캐시 우선)
+        with stage_timer("retrieve_similar", "embed_query"):
+            q_emb = await embed_query(query)
 
-        result = []
-        for r in rows:
-            text_content = r._mapping["content"]
+        started = time.perf_counter()
+        contents = None
+        lexical_results = 0
+        patterns = lexical_patterns(query, lexical_terms) if mode == "hybrid" else []
+        if patterns:
+            with stage_timer("retrieve_similar", "hybrid_search"):
+                rows = await _search_db_hybrid(manual_id, q_emb, patterns, limit)
+            contents = [content for content, _ in rows]
+            lexical_results = sum(1 for _, hits in rows if hits)
+            search_mode = "hybrid"
+        elif RAG_MEMORY_INDEX:
             try:
-                result.append(json.loads(text_content))
-            except json.JSONDecodeError:
-                result.append({"text": text_content})
+                with stage_timer("retrieve_similar", "memory_search"):
+                    contents = await search_manual(manual_id, q_emb, limit)
+                search_mode = "memory"
+            except Exception as e:
+                logger.warning(f"[RAG] 인메모리 검색 실패, DB 검색으로 대체: {e}")
+
+        if contents is None:
+            with stage_timer("retrieve_similar", "db_search"):
+                contents = await _search_db(manual_id, q_emb, limit)
+            search_mode = "vector"
+        _record_retrieval(search_mode, (time.perf_counter() - started) * 1000, len(contents), lexical_results)
 
-        logger.info(f"[RAG] retrieve_similar() 완료 | {len(result)}개 결과 반환")
+        result = _parse_chunks(contents)
+        logger.info(f"[RAG] retrieve_similar() 완료 | mode={search_mode}, {len(result)}개 결과 반환")
         return result
 
     except Exception as e:
         logger.error(f"[RAG] retrieve_similar() 실패: {e}")
-        return []
\ No newline at end of file
+        return []
+
+
+def _parse_chunks(contents) -> list:
+    """저장된 chunk 원문(JSON 문자열)을 dict로, JSON이 아니면 {"text": 원문}"""
+    result = []
+    for text_content in contents:
+        try:
+            result.append(json.loads(text_content))
+        except json.JSONDecodeError:
+            result.append({"text": text_content})
+    return result
+
+
+async def _search_db(manual_id: int, q_emb, limit: int):
+    """pgvector로 매뉴얼 안에서 가까운 chunk 원문 목록 조회"""
+    async with db_connect() as conn:
+        rows = (await conn.execute(
+            text(manual_search_sql()),
+            {"manual_id": manual_id, "q_emb": q_emb, "limit": limit}
+        )).fetchall()
+
+    return [r._mapping["content"] for r in rows]
+
+
+async def _search_db_hybrid(manual_id: int, q_emb, patterns: list, limit: int):
+    """벡터 + 키워드 후보를 한 쿼리에서 RRF로 합친 (chunk 원문, 맞은 키워드 수) 목록"""
+    async with db_connect() as conn:
+        rows = (await conn.execute(
+            text(hybrid_search_sql()),
+            {"manual_id": manual_id, "q_emb": q_emb, "patterns": patterns, "limit": limit}
+        )).fetchall()
+
+    return [(r._mapping["content"], r._mapping["lexical_hits"]) for r in rows]
+
+
+async def retrieve_similar_batch(
+    manual_ids, query: str, limit: int = 3, lexical_terms=None, mode: str = None,
+) -> dict:
+    """
+    여러 매뉴얼에서 같은 query로 유사한 chunk를 한 번에 검색 (POST /quiz/generate/batch)
+    - 쿼리 임베딩은 한 번만 생성하고, 매뉴얼별 top-k는 LATERAL 조인 한 쿼리로 조회
+    - 반환: {manual_id: chunk 목록}, 임베딩이 없는 매뉴얼은 빈 목록
+    - mode / lexical_terms는 retrieve_similar와 같음 (인메모리 인덱스는 쓰지 않음)
+    """
+    manual_ids = list(dict.fromkeys(manual_ids))
+    results = {manual_id: [] for manual_id in manual_ids}
+    if not manual_ids:
+        return results
+    mode = mode or RAG_RETRIEVAL_MODE
+    try:
+        with stage_timer("retrieve_similar_batch", "embed_query"):
+            q_emb = await embed_query(query)
+
+        patterns = lexical_patterns(query, lexical_terms) if mode == "hybrid" else []
+        params = {"manual_ids": manual_ids, "q_emb": q_emb, "limit": limit}
+        if patterns:
+            params["patterns"] = patterns
+
+        started = time.perf_counter()
+        with stage_timer("retrieve_similar_batch", "db_search"):
+            async with db_connect() as conn:
+                rows = (await conn.execute(text(batch_search_sql(hybrid=bool(patterns))), params)).fetchall()
+
+        contents = {manual_id: [] for manual_id in manual_ids}
+        for r in rows:
+            contents[r._mapping["manual_id"]].append(r._mapping["content"])
+        for manual_id, chunks in contents.items():
+            results[manual_id] = _parse_chunks(chunks)
+        _record_retrieval("batch", (time.perf_counter() - started) * 1000, len(rows))
+
+        logger.info(f"[RAG] retrieve_similar_batch() 완료 | 매뉴얼 {len(manual_ids)}개, {len(rows)}개 결과 반환")
+        return results
+
+    except Exception as e:
+        logger.error(f"[RAG] retrieve_similar_batch() 실패: {e}")
+        return results
+
+
+async def compare_retrieval(manual_id: int, query: str, lexical_terms=None, k: int = 5) -> dict:
+    """
+    같은 쿼리로 vector / hybrid 검색 결과 비교 (GET /rag/retrieval/compare)
+    - latency_ms: DB 검색 시간 (쿼리 임베딩 제외)
+    - lexical_recall: 키워드가 맞는 chunk 중 top-k에 들어간 비율 (분모는 min(k, 키워드 매칭 수))
+    - overlap: 두 방식 top-k에 같이 들어간 chunk 수
+    """
+    q_emb = await embed_query(query)
+    patterns = lexical_patterns(query, lexical_terms)
+    async with db_connect() as conn:
+        matched = {
+            r[0] for r in (await conn.execute(
+                text("""
+                    SELECT content FROM manual_embeddings
+                    WHERE manual_id = :manual_id AND content ~* ANY(CAST(:patterns AS text[]))
+                """),
+                {"manual_id": manual_id, "patterns": patterns}
+            )).fetchall()
+        }
+
+    results = {}
+    for mode in ("vector", "hybrid"):
+        started = time.perf_counter()
+        if mode == "vector":
+            contents = await _search_db(manual_id, q_emb, k)
+        else:
+            contents = [content for content, _ in await _search_db_hybrid(manual_id, q_emb, patterns, k)]
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        found = sum(1 for content in contents if content in matched)
+        results[mode] = {
+            "latency_ms": round(elapsed_ms, 3),
+            "lexical_recall": round(found / min(k, len(matched)), 3) if matched else None,
+            "results": contents,
+        }
+
+    return {
+        "manual_id": manual_id,
+        "k": k,
+        "patterns": patterns,
+        "lexical_matches": len(matched),
+        "overlap": len(set(results["vector"]["results"]) & set(results["hybrid"]["results"])),
+        **results,
+    }
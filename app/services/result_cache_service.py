@@ -0,0 +1,67 @@
+"""
+퀴즈/카드뉴스 생성 결과 캐시 + 동일 요청 중복 실행 방지(single-flight)
+- 키: (endpoint, manual_id, 파라미터..., 매뉴얼 버전)
+- 매뉴얼이 바뀌면 버전이 달라져 자연스럽게 새로 생성
+- 게이트웨이 타임아웃 후 재시도가 같은 생성 작업을 공유하거나 완료된 결과를 받음
+"""
+from app.core.cache import LRUCache, SingleFlight
+from app.core.db import release_request_connection, spawn_detached
+from app.repositories.manual_repository import get_manual_version
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "256"))
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "86400"))  # 초
+
+_result_cache = LRUCache(maxsize=RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL, name="results")
+_inflight = SingleFlight()
+_LOOKUP = object()  # version 인자를 주지 않았을 때 (None은 "매뉴얼 없음" 버전이라 따로 구분)
+
+
+def should_force_regenerate(cache_control: str = None) -> bool:
+    """Cache-Control: no-cache / no-store 헤더면 캐시를 무시하고 새로 생성"""
+    if not cache_control:
+        return False
+    directives = {d.strip().lower() for d in cache_control.split(",")}
+    return bool(directives & {"no-cache", "no-store"})
+
+
+async def cached_generation(endpoint: str, manual_id: int, params: tuple, factory, force: bool = False, cacheable=None, version=_LOOKUP):
+    """
+    생성 결과를 캐시에서 꺼내거나, 없으면 factory()로 생성
+    - 같은 키로 진행 중인 생성이 있으면 그 결과를 같이 기다림
+    - force=True면 캐시/진행 중 작업을 무시하고 새로 생성한 뒤 캐시 갱신
+    - cacheable(result)가 False면 결과를 캐시하지 않음 (예: 이미지 생성 실패)
+    - 생성은 요청과 분리된 task에서 실행되므로, 기다리는 동안 요청 커넥션은 미리 반납
+    - version을 미리 조회해 넘기면 DB 조회 없이 키를 만듦 (배치처럼 커넥션을 먼저 반납하는 경우)
+    """
+    if version is _LOOKUP:
+        version = await get_manual_version(manual_id)
+    key = (endpoint, manual_id, *params, version)
+
+    if not force:
+        result = _result_cache.get(key)
+        if result is not None:
+            logger.info(f"[CACHE] 생성 결과 캐시 사용 | endpoint={endpoint}, manual_id={manual_id}")
+            return result
+
+    # 버전 조회에 쓴 요청 커넥션을 GPT/DALL-E 생성이 끝날 때까지 잡고 있지 않도록 반납
+    await release_request_connection()
+
+    async def generate():
+        result = await factory()
+        if cacheable is None or cacheable(result):
+            _result_cache.set(key, result)
+        return result
+
+    if force:
+        logger.info(f"[CACHE] 강제 재생성 | endpoint={endpoint}, manual_id={manual_id}")
+        return await _inflight.run(key + ("force",), generate, spawn=spawn_detached)
+
+    return await _inflight.run(key, generate, spawn=spawn_detached)
+
+
+def result_cache_stats() -> dict:
+    return {**_result_cache.stats(), "inflight": len(_inflight), "shared": _inflight.shared}
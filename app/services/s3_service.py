@@ -1,72 +1,211 @@
 """
 S3 업로드 서비스
+- boto3는 import와 클라이언트 생성에 수백 ms / 수십 MB가 들어 USE_S3=true일 때만 처음 사용할 때 로드
+  (서버는 lifespan에서 init_s3()로 미리 생성)
 """
-import boto3
 import requests
+from requests.adapters import HTTPAdapter
+import io
 import os
-from datetime import datetime
-from dotenv import load_dotenv
-from io import BytesIO
+import hashlib
+import logging
+import tempfile
+import threading
+from app.core import config  # noqa: F401  (.env 로드)
+from app.core.metrics import stage_timer
 
-load_dotenv()
+logger = logging.getLogger(__name__)
 
-# S3 클라이언트 생성
-s3_client = boto3.client(
-    's3',
-    aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'), # 액세스 키  
-    aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'), # 시크릿 키
-    region_name=os.getenv('AWS_REGION', 'ap-northeast-2')
-)
+USE_S3 = os.getenv('USE_S3', 'false').lower() == 'true'
+
+# S3_ENDPOINT_URL을 지정하면 moto/localstack 같은 로컬 S3로 테스트 가능
+S3_ENDPOINT_URL = os.getenv('S3_ENDPOINT_URL') or None
 
 BUCKET_NAME = os.getenv('S3_BUCKET_NAME') # 버킷이름
 
+# 전송 설정
+# - 다운로드는 CHUNK 단위로 읽어 SPOOL 크기까지만 메모리에 두고 넘으면 임시 파일로 넘김
+# - 업로드는 MULTIPART_THRESHOLD 이상이면 멀티파트로, 파트를 MAX_CONCURRENCY개씩 병렬 전송
+S3_DOWNLOAD_CHUNK_BYTES = int(os.getenv('S3_DOWNLOAD_CHUNK_BYTES', str(256 * 1024)))
+S3_SPOOL_MAX_BYTES = int(os.getenv('S3_SPOOL_MAX_BYTES', str(8 * 1024 * 1024)))
+S3_MULTIPART_THRESHOLD = int(os.getenv('S3_MULTIPART_THRESHOLD', str(8 * 1024 * 1024)))
+S3_MULTIPART_CHUNK_BYTES = int(os.getenv('S3_MULTIPART_CHUNK_BYTES', str(8 * 1024 * 1024)))
+S3_MAX_CONCURRENCY = int(os.getenv('S3_MAX_CONCURRENCY', '4'))
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', '10'))
+
+_s3_client = None
+_transfer_config = None
+_s3_lock = threading.Lock()  # 업로드는 to_thread로 실행되므로 동시 첫 호출에도 클라이언트는 하나만 생성
+
+# 이미지 다운로드용 공용 HTTP 세션 (커넥션 재사용)
+http_session = requests.Session()
+http_session.mount('https://', HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE))
+http_session.mount('http://', HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE))
+
+CONTENT_TYPE_EXTENSIONS = {
+    'image/png': 'png',
+    'image/jpeg': 'jpg',
+    'image/webp': 'webp',
+    'image/avif': 'avif',
+}
+
+
+def get_s3_client():
+    """S3 클라이언트 (처음 호출할 때 boto3 import 후 생성)"""
+    global _s3_client, _transfer_config
+    if _s3_client is None:
+        with _s3_lock:
+            if _s3_client is None:
+                import boto3
+                from boto3.s3.transfer import TransferConfig
+
+                _transfer_config = TransferConfig(
+                    multipart_threshold=S3_MULTIPART_THRESHOLD,
+                    multipart_chunksize=S3_MULTIPART_CHUNK_BYTES,
+                    max_concurrency=S3_MAX_CONCURRENCY,
+                )
+                _s3_client = boto3.client(
+                    's3',
+                    aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'), # 액세스 키
+                    aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'), # 시크릿 키
+                    region_name=os.getenv('AWS_REGION', 'ap-northeast-2'),
+                    endpoint_url=S3_ENDPOINT_URL
+                )
+    return _s3_client
+
+
+def init_s3() -> bool:
+    """USE_S3=true면 S3 클라이언트를 미리 생성 (첫 카드뉴스 요청이 boto3 로드를 기다리지 않도록)"""
+    if not USE_S3:
+        return False
+    get_s3_client()
+    return True
+
+
+def s3_loaded() -> bool:
+    return _s3_client is not None
+
+
+def _public_url(key: str) -> str:
+    if S3_ENDPOINT_URL:
+        return f"{S3_ENDPOINT_URL.rstrip('/')}/{BUCKET_NAME}/{key}"
+    return f"https://{BUCKET_NAME}.s3.{os.getenv('AWS_REGION', 'ap-northeast-2')}.amazonaws.com/{key}"
+
+
+def _key_from_url(s3_url: str) -> str:
+    """
+    URL에서 파일명(key) 추출
+    https://bucket-name.s3.region.amazonaws.com/cardnews/3f2a...9c.png → cardnews/3f2a...9c.png
+    """
+    if S3_ENDPOINT_URL and s3_url.startswith(S3_ENDPOINT_URL):
+        return s3_url.split(f"/{BUCKET_NAME}/", 1)[-1]
+    return s3_url.split(f"{BUCKET_NAME}.s3.")[-1].split('/', 1)[-1]
+
+
+def _object_exists(key: str) -> bool:
+    from botocore.exceptions import ClientError
 
-def upload_image_to_s3(image_url: str, folder: str = "cardnews") -> str:
+    try:
+        get_s3_client().head_object(Bucket=BUCKET_NAME, Key=key)
+        return True
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+            return False
+        raise
+
+
+def _upload_fileobj(fileobj, key: str, content_type: str) -> str:
+    """파일 객체를 S3에 업로드 (같은 내용이 이미 있으면 생략) 후 URL 반환"""
+    if _object_exists(key):
+        logger.info(f"[S3] 같은 이미지가 이미 있음 | key={key}")
+        return _public_url(key)
+
+    get_s3_client().upload_fileobj(
+        fileobj,
+        BUCKET_NAME,
+        key,
+        ExtraArgs={
+            'ContentType': content_type,
+            'ACL': 'public-read'  # 공개 읽기 권한
+        },
+        Config=_transfer_config
+    )
+    return _public_url(key)
+
+
+def fetch_image_bytes(image_url: str):
+    """이미지를 공용 세션으로 다운로드해서 (bytes, content_type) 반환 (후처리용)"""
+    response = http_session.get(image_url, timeout=30)
+    response.raise_for_status()
+    content_type = response.headers.get('Content-Type', 'image/png').split(';')[0].strip()
+    return response.content, content_type
+
+
+def read_image_from_s3(s3_url: str) -> bytes:
+    """이 서비스가 올린 S3 URL의 이미지 bytes (임시 DALL-E URL이 만료된 뒤 후처리를 다시 할 때)"""
+    response = get_s3_client().get_object(Bucket=BUCKET_NAME, Key=_key_from_url(s3_url))
+    return response["Body"].read()
+
+
+def upload_bytes_to_s3(data: bytes, folder: str, content_type: str) -> str:
+    """메모리에 있는 이미지(후처리 결과 등)를 내용 hash 파일명으로 S3에 업로드 후 URL 반환"""
+    extension = CONTENT_TYPE_EXTENSIONS.get(content_type, 'bin')
+    filename = f"{folder}/{hashlib.sha256(data).hexdigest()}.{extension}"
+    return _upload_fileobj(io.BytesIO(data), filename, content_type)
+
+
+def upload_image_to_s3(image_url: str, folder: str = "cardnews", fallback: bool = True) -> str:
     """
-    DALL-E 임시 URL의 이미지를 다운로드해서 S3에 업로드
+    DALL-E 임시 URL의 이미지를 스트리밍으로 다운로드해서 S3에 업로드
+    - chunk 단위로 읽으며 sha256 계산, 메모리는 S3_SPOOL_MAX_BYTES까지만 사용
+    - 파일명은 내용 hash 기반 (동시 요청에도 충돌 없음, 같은 이미지는 한 번만 저장)
     
     Args:
         image_url: DALL-E가 생성한 임시 이미지 URL
         folder: S3 버킷 내 폴더 (기본: "cardnews")
+        fallback: True면 실패 시 원본 URL 반환, False면 예외를 그대로 던짐
     
     Returns:
         S3 영구 URL
     """
     try:
-        # 이미지 다운로드
-        print(f"이미지 다운로드 중: {image_url[:50]}...")
-        response = requests.get(image_url, timeout=30)
-        response.raise_for_status() # 에러 발생 시 예외 던지기
-        
-        # S3 업로드용 파일명 생성 (timestamp 기반)
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S") # 20251110_053030 
-        filename = f"{folder}/{timestamp}.png" # cardnews/20251110_053030.png 이렇게 파일명 생김
-        
-        # S3에 업로드
-        print(f"S3 업로드 중: {filename}")
-        s3_client.upload_fileobj(
-            BytesIO(response.content), # 메모리 -> S3로 직접 업로드
-            BUCKET_NAME,
-            filename,
-            ExtraArgs={
-                'ContentType': 'image/png',
-                'ACL': 'public-read'  # 공개 읽기 권한
-            }
-        )
-        
-        # S3 URL 생성
-        s3_url = f"https://{BUCKET_NAME}.s3.{os.getenv('AWS_REGION', 'ap-northeast-2')}.amazonaws.com/{filename}"
+        # 이미지 다운로드 (스트리밍)
+        logger.info(f"[S3] 이미지 다운로드 중 | url={image_url[:50]}...")
+        with http_session.get(image_url, stream=True, timeout=30) as response, \
+                tempfile.SpooledTemporaryFile(max_size=S3_SPOOL_MAX_BYTES) as buffer:
+            with stage_timer("upload_image_to_s3", "download"):
+                response.raise_for_status() # 에러 발생 시 예외 던지기
+                content_type = response.headers.get('Content-Type', 'image/png').split(';')[0].strip()
+
+                digest = hashlib.sha256()
+                for chunk in response.iter_content(chunk_size=S3_DOWNLOAD_CHUNK_BYTES):
+                    digest.update(chunk)
+                    buffer.write(chunk)
+                buffer.seek(0)
+
+            # S3 업로드용 파일명 생성 (내용 hash 기반)
+            extension = CONTENT_TYPE_EXTENSIONS.get(content_type, 'png')
+            filename = f"{folder}/{digest.hexdigest()}.{extension}" # cardnews/3f2a...9c.png
+
+            # S3에 업로드
+            logger.info(f"[S3] 업로드 중 | key={filename}")
+            with stage_timer("upload_image_to_s3", "upload"):
+                s3_url = _upload_fileobj(buffer, filename, content_type)
         
-        print(f"S3 업로드 완료: {s3_url}")
+        logger.info(f"[S3] 업로드 완료 | url={s3_url}")
         return s3_url
         
     except requests.exceptions.RequestException as e:
-        print(f"이미지 다운로드 실패: {e}")
+        logger.error(f"[S3] 이미지 다운로드 실패: {e}")
+        if not fallback:
+            raise
         # 실패 시 원본 URL 반환 (fallback)
         return image_url
         
     except Exception as e:
-        print(f"S3 업로드 실패: {e}")
+        logger.error(f"[S3] 업로드 실패: {e}")
+        if not fallback:
+            raise
         # 실패 시 원본 URL 반환 (fallback)
         return image_url
 
@@ -82,15 +221,11 @@ def delete_image_from_s3(s3_url: str) -> bool:
         삭제 성공 여부
     """
     try:
-        # URL에서 파일명 추출
-        # https://bucket-name.s3.region.amazonaws.com/cardnews/20231109_123456.png
-        # → cardnews/20231109_123456.png
-        filename = s3_url.split(f"{BUCKET_NAME}.s3.")[-1].split('/', 1)[-1]
-        
-        s3_client.delete_object(Bucket=BUCKET_NAME, Key=filename)
-        print(f"S3 삭제 완료: {filename}")
+        filename = _key_from_url(s3_url)
+        get_s3_client().delete_object(Bucket=BUCKET_NAME, Key=filename)
+        logger.info(f"[S3] 삭제 완료 | key={filename}")
         return True
         
     except Exception as e:
-        print(f"S3 삭제 실패: {e}")
+        logger.error(f"[S3] 삭제 실패: {e}")
         return False
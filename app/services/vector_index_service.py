@@ -0,0 +1,137 @@
+"""
+매뉴얼별 인메모리 벡터 인덱스 (RAG_MEMORY_INDEX=true일 때 사용)
+- 매뉴얼 하나의 chunk는 수십 개 수준이라 DB 왕복 대신 NumPy 행렬 곱으로 top-k 계산
+- manual_embeddings에서 처음 조회할 때 float32 행렬로 올리고, 메모리 상한을 넘으면 LRU로 제거
+- embed_manual이 새 row를 쓰면 무효화(진행 중인 로드 결과도 버림), 다른 인스턴스의 갱신은 TTL로 반영
+- 임베딩이 없는 매뉴얼(빈 결과)은 캐시하지 않음
+- 검색 실패 시 호출부에서 pgvector 쿼리로 fallback
+"""
+from app.core.cache import SingleFlight
+from app.core.db import db_connect
+from app.core.metrics import record_cache
+from sqlalchemy import text
+from collections import OrderedDict
+from typing import NamedTuple
+import numpy as np
+import os
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+RAG_MEMORY_INDEX = os.getenv("RAG_MEMORY_INDEX", "false").lower() == "true"
+RAG_MEMORY_INDEX_MAX_BYTES = int(os.getenv("RAG_MEMORY_INDEX_MAX_BYTES", str(256 * 1024 * 1024)))
+RAG_MEMORY_INDEX_TTL = float(os.getenv("RAG_MEMORY_INDEX_TTL", "300"))  # 초
+
+
+class ManualVectors(NamedTuple):
+    contents: list  # chunk 원문(JSON 문자열)
+    matrix: np.ndarray  # (chunk 수, 차원) float32, 행마다 L2 정규화
+    loaded_at: float
+
+    @property
+    def nbytes(self) -> int:
+        return self.matrix.nbytes + sum(len(c) for c in self.contents)
+
+
+_entries = OrderedDict()  # manual_id -> ManualVectors
+_generations = {}  # manual_id -> 무효화 횟수 (무효화 전에 시작한 로드 결과는 저장하지 않음)
+_loading = SingleFlight()
+_stats = {"hits": 0, "misses": 0, "evictions": 0, "bytes": 0, "stale_loads": 0}
+
+
+async def _load(manual_id: int, generation: int) -> ManualVectors:
+    async with db_connect() as conn:
+        rows = (await conn.execute(
+            text("""
+                SELECT m.content, c.embedding
+                FROM manual_embeddings m
+                JOIN chunk_embeddings c ON c.content_hash = m.content_hash
+                WHERE m.manual_id = :manual_id
+                ORDER BY m.id
+            """),
+            {"manual_id": manual_id}
+        )).fetchall()
+
+    contents = [r._mapping["content"] for r in rows]
+    if rows:
+        matrix = np.vstack([r._mapping["embedding"] for r in rows]).astype(np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.where(norms == 0, 1, norms)
+    else:
+        matrix = np.empty((0, 0), dtype=np.float32)
+
+    entry = ManualVectors(contents=contents, matrix=matrix, loaded_at=time.monotonic())
+    if _generations.get(manual_id, 0) != generation:
+        # 조회 도중 embed_manual이 새 row를 커밋한 경우: 이번 결과만 쓰고 캐시하지 않음
+        _stats["stale_loads"] += 1
+    elif contents:
+        # 빈 결과는 캐시하지 않음 (백그라운드 임베딩이 끝나기 전에 들어온 요청이 TTL 동안 빈 결과를 보지 않도록)
+        _put(manual_id, entry)
+    logger.info(f"[RAG] 인메모리 인덱스 로드 | manual_id={manual_id}, chunks={len(contents)}")
+    return entry
+
+
+def _drop(manual_id: int):
+    entry = _entries.pop(manual_id, None)
+    if entry is not None:
+        _stats["bytes"] -= entry.nbytes
+
+
+def _put(manual_id: int, entry: ManualVectors):
+    _drop(manual_id)
+    _entries[manual_id] = entry
+    _stats["bytes"] += entry.nbytes
+    # 메모리 상한을 넘으면 가장 오래 안 쓴 매뉴얼부터 제거
+    while _stats["bytes"] > RAG_MEMORY_INDEX_MAX_BYTES and len(_entries) > 1:
+        _, evicted = _entries.popitem(last=False)
+        _stats["bytes"] -= evicted.nbytes
+        _stats["evictions"] += 1
+
+
+def invalidate_manual_vectors(manual_id: int):
+    """매뉴얼 임베딩이 바뀌었을 때 메모리에서 제거 (진행 중인 로드 결과도 버려지도록 generation 증가)"""
+    _generations[manual_id] = _generations.get(manual_id, 0) + 1
+    _drop(manual_id)
+
+
+async def _get_entry(manual_id: int) -> ManualVectors:
+    entry = _entries.get(manual_id)
+    if entry is not None and time.monotonic() - entry.loaded_at < RAG_MEMORY_INDEX_TTL:
+        _entries.move_to_end(manual_id)
+        _stats["hits"] += 1
+        record_cache("memory_index", True)
+        return entry
+
+    _stats["misses"] += 1
+    record_cache("memory_index", False)
+    # 무효화 이후에 들어온 요청은 그 전에 시작한 로드에 합류하지 않음
+    generation = _generations.get(manual_id, 0)
+    return await _loading.run((manual_id, generation), lambda: _load(manual_id, generation))
+
+
+def top_k(matrix: np.ndarray, query: np.ndarray, limit: int) -> np.ndarray:
+    """정규화된 행렬에서 코사인 유사도 상위 limit개 행 번호 (유사도 내림차순)"""
+    return top_indices(matrix @ (query / (np.linalg.norm(query) or 1.0)), limit)
+
+
+def top_indices(scores: np.ndarray, limit: int) -> np.ndarray:
+    """점수 상위 limit개 번호 (점수 내림차순)"""
+    if limit >= len(scores):
+        return np.argsort(-scores)
+    candidates = np.argpartition(-scores, limit)[:limit]
+    return candidates[np.argsort(-scores[candidates])]
+
+
+async def search_manual(manual_id: int, q_emb, limit: int):
+    """매뉴얼 안에서 쿼리와 가장 가까운 chunk 원문 목록 (코사인 유사도 순)"""
+    entry = await _get_entry(manual_id)
+    if not entry.contents:
+        return []
+    query = np.asarray(q_emb, dtype=np.float32)
+    return [entry.contents[i] for i in top_k(entry.matrix, query, limit)]
+
+
+def memory_index_stats() -> dict:
+    """인메모리 인덱스 hit/miss, 적재된 매뉴얼 수 / 메모리 사용량"""
+    return {"enabled": RAG_MEMORY_INDEX, "manuals": len(_entries), "max_bytes": RAG_MEMORY_INDEX_MAX_BYTES, **_stats}
@@ -0,0 +1,10 @@
+"""
+오프라인 부하 테스트 (실제 OpenAI/AWS 비용 없이 처리량/지연/메모리 측정)
+- stub_openai: chat / embeddings / images API를 흉내 내는 로컬 서버 (지연 시간 설정 가능)
+- environment: stub 서버, moto S3, Postgres(+pgvector) 준비 및 벤치용 매뉴얼 시드
+- run: 앱을 별도 프로세스로 띄우고 라우터별 시나리오 부하 → JSON 결과
+
+실행 예:
+    python -m bench.run --database-url postgresql://postgres@localhost/altong_bench --output bench.json
+    python -m bench.run --baseline bench.json   # 이전 결과 대비 회귀 확인
+"""
@@ -0,0 +1,180 @@
+"""
+벤치마크 실행 환경 준비
+- 프로세스 실행/종료, HTTP 준비 대기, RSS 측정
+- OpenAI stub 서버, moto S3 서버(선택), Postgres(+pgvector) 준비
+- manual 테이블에 벤치용 매뉴얼 시드 (실 데이터와 겹치지 않는 ID 대역 사용)
+- moto[server] / pgserver / psutil은 bench/requirements.txt로 설치 (pip install -r bench/requirements.txt)
+"""
+from bench.stub_openai import manual_document
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import logging
+import tempfile
+import subprocess
+import httpx
+
+logger = logging.getLogger(__name__)
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+S3_BUCKET = "altong-bench"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_process(args: list, env: dict = None, log_path: str = None) -> subprocess.Popen:
+    """REPO_ROOT에서 파이썬 모듈 실행 (출력은 log_path로, 없으면 버림)"""
+    output = open(log_path, "ab") if log_path else subprocess.DEVNULL
+    return subprocess.Popen(
+        [sys.executable, *args],
+        cwd=REPO_ROOT,
+        env={**os.environ, **(env or {})},
+        stdout=output,
+        stderr=subprocess.STDOUT,
+    )
+
+
+def stop_process(proc: subprocess.Popen, timeout: float = 10):
+    if proc is None or proc.poll() is not None:
+        return
+    proc.terminate()
+    try:
+        proc.wait(timeout)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+
+def wait_http(url: str, proc: subprocess.Popen = None, timeout: float = 60):
+    """url이 응답할 때까지 대기 (프로세스가 먼저 죽으면 RuntimeError)"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc is not None and proc.poll() is not None:
+            raise RuntimeError(f"프로세스가 종료됨 (exit={proc.returncode}): {url}")
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"응답 대기 시간 초과: {url}")
+
+
+def rss_bytes(pid: int) -> int:
+    """프로세스 RSS (psutil이 없으면 /proc 사용, 둘 다 안 되면 0)"""
+    try:
+        import psutil
+        return psutil.Process(pid).memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def start_stub(stub_args: list, log_path: str = None):
+    """(프로세스, base_url)"""
+    port = free_port()
+    proc = start_process(["-m", "bench.stub_openai", "--port", str(port), *stub_args], log_path=log_path)
+    base_url = f"http://127.0.0.1:{port}"
+    wait_http(f"{base_url}/health", proc)
+    return proc, base_url
+
+
+def start_s3(log_path: str = None):
+    """
+    moto S3 서버 실행 + 버킷 생성
+    반환: (프로세스, 앱에 넘길 환경변수), moto가 없으면 (None, None)
+    """
+    try:
+        import moto  # noqa: F401
+    except ImportError:
+        logger.warning("[BENCH] moto 미설치 → S3 업로드 없이 실행 (USE_S3=false, pip install -r bench/requirements.txt)")
+        return None, None
+
+    import boto3
+
+    port = free_port()
+    proc = start_process(["-m", "moto.server", "-p", str(port)], log_path=log_path)
+    endpoint = f"http://127.0.0.1:{port}"
+    wait_http(endpoint, proc)
+
+    env = {
+        "USE_S3": "true",
+        "S3_ENDPOINT_URL": endpoint,
+        "S3_BUCKET_NAME": S3_BUCKET,
+        "AWS_ACCESS_KEY_ID": "bench",
+        "AWS_SECRET_ACCESS_KEY": "bench",
+        "AWS_REGION": "ap-northeast-2",
+    }
+    boto3.client(
+        "s3", endpoint_url=endpoint, region_name=env["AWS_REGION"],
+        aws_access_key_id="bench", aws_secret_access_key="bench",
+    ).create_bucket(Bucket=S3_BUCKET, CreateBucketConfiguration={"LocationConstraint": env["AWS_REGION"]})
+    return proc, env
+
+
+def start_postgres(database_url: str = None):
+    """
+    벤치용 Postgres URL 준비
+    - database_url(또는 BENCH_DATABASE_URL)이 있으면 그대로 사용
+    - 없으면 pgserver(pip 패키지, pgvector 포함)로 임시 인스턴스 실행
+    반환: (URL, 정리 함수)
+    """
+    database_url = database_url or os.getenv("BENCH_DATABASE_URL")
+    if database_url:
+        return database_url, lambda: None
+
+    try:
+        import pgserver
+    except ImportError:
+        raise RuntimeError(
+            "--database-url(BENCH_DATABASE_URL)을 지정하거나 pgserver를 설치하세요 (pip install -r bench/requirements.txt)."
+        )
+
+    data_dir = tempfile.mkdtemp(prefix="altong-bench-pg-")
+    server = pgserver.get_server(data_dir, cleanup_mode="stop")
+    logger.info(f"[BENCH] 임시 Postgres 실행 | data_dir={data_dir}")
+    return server.get_uri(), server.cleanup
+
+
+def manual_for(manual_id: int) -> dict:
+    """manual_id별로 절차 수가 다른 매뉴얼 (4~8단계)"""
+    return manual_document(n_steps=4 + manual_id % 5)
+
+
+async def _seed_manuals(database_url: str, manual_ids: list):
+    import asyncpg
+
+    conn = await asyncpg.connect(database_url.replace("postgresql+asyncpg://", "postgresql://"))
+    try:
+        await conn.execute("CREATE EXTENSION IF NOT EXISTS vector")
+        # manual 테이블은 Spring 서버 소유라 앱 스키마에 없음 → 벤치 DB에만 최소 형태로 생성
+        await conn.execute("CREATE TABLE IF NOT EXISTS manual (id BIGINT PRIMARY KEY, ai_raw_response TEXT)")
+        await conn.executemany(
+            """
+            INSERT INTO manual (id, ai_raw_response) VALUES ($1, $2)
+            ON CONFLICT (id) DO UPDATE SET ai_raw_response = EXCLUDED.ai_raw_response
+            """,
+            [(manual_id, json.dumps(manual_for(manual_id), ensure_ascii=False)) for manual_id in manual_ids],
+        )
+        # 이전 실행의 임베딩이 남아 있으면 embed 시나리오가 매번 다르게 측정되므로 제거
+        if await conn.fetchval("SELECT to_regclass('manual_embeddings')") is not None:
+            await conn.execute("DELETE FROM manual_embeddings WHERE manual_id = ANY($1::bigint[])", manual_ids)
+    finally:
+        await conn.close()
+
+
+def seed_manuals(database_url: str, manual_ids: list):
+    asyncio.run(_seed_manuals(database_url, manual_ids))
@@ -0,0 +1,338 @@
+"""
+오프라인 부하 테스트 실행
+- OpenAI stub / moto S3 / Postgres를 띄우고 앱(uvicorn)을 별도 프로세스로 실행
+- 시나리오(라우터별 엔드포인트)마다 고정 동시성으로 요청을 보내고
+  p50/p95/p99 지연, 초당 요청 수, 상태 코드, 앱 프로세스 RSS(시작/최대/종료)를 JSON으로 출력
+- --baseline 으로 이전 결과를 주면 p95 / RPS 회귀를 비교하고, 허용치를 넘으면 종료 코드 1
+
+기본적으로 생성 API는 Cache-Control: no-cache로 호출해 결과 캐시 없이 생성 경로를 측정 (--use-cache로 끔)
+앱에 넘길 설정은 현재 환경변수를 그대로 쓰고, --app-env KEY=VALUE로 덮어쓸 수 있음
+(OpenAI RPM/TPM quota는 기본으로 끔 → 앱 자체의 처리량을 측정)
+    pip install -r bench/requirements.txt   # moto[server], pgserver, psutil (앱 의존성 포함)
+    python -m bench.run --requests 200 --concurrency 16 --app-env OPENAI_CONCURRENCY=gpt-4o-mini=32
+"""
+from bench.environment import (
+    free_port, manual_for, rss_bytes, seed_manuals, start_postgres, start_process, start_s3,
+    start_stub, stop_process, wait_http,
+)
+from bench.stub_openai import StubConfig
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+import platform
+import subprocess
+import tempfile
+import httpx
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+
+@dataclass
+class Scenario:
+    name: str
+    build: object  # (n, manual_id, use_cache) -> (method, path, 요청 kwargs)
+    stream: bool = False  # SSE 응답: 첫 이벤트까지의 시간도 기록
+
+
+def _no_cache(use_cache: bool) -> dict:
+    return {} if use_cache else {"Cache-Control": "no-cache"}
+
+
+def _manual_request(n: int) -> dict:
+    return {
+        "businessType": "카페",
+        "title": f"오픈 준비 {n}",
+        "goal": ["오픈 전 준비를 빠짐없이 마친다"],
+        "procedure": ["매장 조명 켜기", "커피 머신 예열", "재료 유통기한 확인", "포스기 시재 확인"],
+        "precaution": ["위생 장갑 착용", "결제 금액 확인"],
+        "tone": "친절한 존댓말",
+    }
+
+
+SCENARIOS = {
+    s.name: s for s in [
+        Scenario("rag_embed", lambda n, manual_id, use_cache: (
+            "POST", "/rag/embed", {"json": {"manual_id": manual_id, "manual_json": manual_for(manual_id)}}
+        )),
+        Scenario("quiz_generate", lambda n, manual_id, use_cache: (
+            "POST", "/quiz/generate",
+            {"json": {"manual_id": manual_id, "tone": "친절한 존댓말"}, "headers": _no_cache(use_cache)}
+        )),
+        Scenario("cardnews_generate", lambda n, manual_id, use_cache: (
+            "POST", "/cardnews/generate", {"params": {"manual_id": manual_id}, "headers": _no_cache(use_cache)}
+        )),
+        Scenario("manual_generate", lambda n, manual_id, use_cache: (
+            "POST", "/manual/generate", {"json": _manual_request(n)}
+        )),
+        Scenario("manual_stream", lambda n, manual_id, use_cache: (
+            "POST", "/manual/generate/stream", {"json": _manual_request(n)}
+        ), stream=True),
+    ]
+}
+
+
+@dataclass
+class ScenarioResult:
+    latencies: list = field(default_factory=list)  # 초
+    first_event: list = field(default_factory=list)  # 초 (스트리밍만)
+    statuses: dict = field(default_factory=dict)
+    errors: list = field(default_factory=list)
+    rss: list = field(default_factory=list)  # 바이트 샘플
+
+
+def _percentiles(values: list) -> dict:
+    if not values:
+        return {}
+    ms = np.asarray(values) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {
+        "p50": round(float(p50), 2), "p95": round(float(p95), 2), "p99": round(float(p99), 2),
+        "mean": round(float(ms.mean()), 2), "max": round(float(ms.max()), 2),
+    }
+
+
+async def _send(client: httpx.AsyncClient, scenario: Scenario, n: int, manual_id: int, use_cache: bool, result: ScenarioResult):
+    method, path, kwargs = scenario.build(n, manual_id, use_cache)
+    started = time.perf_counter()
+    try:
+        if scenario.stream:
+            async with client.stream(method, path, **kwargs) as response:
+                first = None
+                async for _ in response.aiter_bytes():
+                    if first is None:
+                        first = time.perf_counter() - started
+                if first is not None:
+                    result.first_event.append(first)
+        else:
+            response = await client.request(method, path, **kwargs)
+        status = response.status_code
+    except httpx.HTTPError as e:
+        status = type(e).__name__
+        if len(result.errors) < 5:
+            result.errors.append(str(e) or status)
+    result.latencies.append(time.perf_counter() - started)
+    result.statuses[str(status)] = result.statuses.get(str(status), 0) + 1
+
+
+async def _sample_rss(pid: int, result: ScenarioResult, interval: float = 0.2):
+    while True:
+        result.rss.append(rss_bytes(pid))
+        await asyncio.sleep(interval)
+
+
+async def run_scenario(base_url: str, app_pid: int, scenario: Scenario, args) -> dict:
+    """고정 동시성(worker 수)으로 requests개를 보내거나 duration초 동안 반복"""
+    result = ScenarioResult()
+    manual_ids = [args.manual_id_base + i for i in range(args.manuals)]
+    counter = iter(range(sys.maxsize))
+    deadline = time.monotonic() + args.duration if args.duration else None
+
+    async def worker(client):
+        for n in counter:
+            if deadline is not None:
+                if time.monotonic() >= deadline:
+                    return
+            elif n >= args.requests:
+                return
+            await _send(client, scenario, n, manual_ids[n % len(manual_ids)], args.use_cache, result)
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    sampler = asyncio.create_task(_sample_rss(app_pid, result))
+    started = time.perf_counter()
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        await asyncio.gather(*(worker(client) for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+    sampler.cancel()
+    result.rss.append(rss_bytes(app_pid))
+
+    ok = sum(count for status, count in result.statuses.items() if status.startswith("2"))
+    report = {
+        "requests": len(result.latencies),
+        "ok": ok,
+        "statuses": result.statuses,
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(len(result.latencies) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": _percentiles(result.latencies),
+        "rss_mb": {
+            "start": round(result.rss[0] / MB, 1),
+            "peak": round(max(result.rss) / MB, 1),
+            "end": round(result.rss[-1] / MB, 1),
+        },
+    }
+    if scenario.stream:
+        report["first_event_ms"] = _percentiles(result.first_event)
+    if result.errors:
+        report["errors"] = result.errors
+    return report
+
+
+def compare(current: dict, baseline: dict, max_regression: float) -> list:
+    """p95 지연 증가 / RPS 감소가 허용 비율을 넘는 시나리오 목록"""
+    regressions = []
+    for name, now in current["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before or not before.get("latency_ms") or not now.get("latency_ms"):
+            continue
+        p95_ratio = now["latency_ms"]["p95"] / before["latency_ms"]["p95"] if before["latency_ms"]["p95"] else 1.0
+        rps_ratio = now["rps"] / before["rps"] if before["rps"] else 1.0
+        logger.info(f"[BENCH] {name}: p95 x{p95_ratio:.2f}, rps x{rps_ratio:.2f}")
+        if p95_ratio > 1 + max_regression or rps_ratio < 1 - max_regression:
+            regressions.append({"scenario": name, "p95_ratio": round(p95_ratio, 3), "rps_ratio": round(rps_ratio, 3)})
+    return regressions
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _app_env(args, stub_url: str, database_url: str, s3_env: dict) -> dict:
+    env = {
+        "OPENAI_API_KEY": "bench",
+        "OPENAI_BASE_URL": f"{stub_url}/v1",
+        "DATABASE_URL": database_url,
+        "USE_S3": "false",
+        "CARDNEWS_JOB_WORKERS": "0",
+        # 계정 quota(RPM/TPM)는 stub에 없으므로 끄고 동시 실행 수 제한만 유지 (운영 quota로 재려면 --app-env로 지정)
+        "OPENAI_RPM_LIMITS": "",
+        "OPENAI_TPM_LIMITS": "",
+    }
+    env.update(s3_env or {})
+    for item in args.app_env:
+        key, _, value = item.partition("=")
+        env[key] = value
+    return env
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Altong AI 오프라인 부하 테스트")
+    parser.add_argument("--database-url", help="벤치용 DB (기본: BENCH_DATABASE_URL, 없으면 pgserver 임시 인스턴스)")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="쉼표로 구분 (기본: 전체)")
+    parser.add_argument("--requests", type=int, default=100, help="시나리오별 요청 수")
+    parser.add_argument("--duration", type=float, default=None, help="시나리오별 실행 시간(초), 주면 --requests 무시")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--manuals", type=int, default=20, help="시드할 매뉴얼 수 (요청마다 돌아가며 사용)")
+    parser.add_argument("--manual-id-base", type=int, default=900_000_000)
+    parser.add_argument("--use-cache", action="store_true", help="생성 결과 캐시 사용 (no-cache 헤더 안 보냄)")
+    parser.add_argument("--no-s3", action="store_true", help="moto S3 없이 실행 (이미지 업로드/컷 분할 생략)")
+    parser.add_argument("--app-env", action="append", default=[], metavar="KEY=VALUE")
+    parser.add_argument("--chat-latency", type=float, default=StubConfig.chat_latency)
+    parser.add_argument("--embed-latency", type=float, default=StubConfig.embed_latency)
+    parser.add_argument("--image-latency", type=float, default=StubConfig.image_latency)
+    parser.add_argument("--stream-chunk-delay", type=float, default=StubConfig.stream_chunk_delay)
+    parser.add_argument("--error-rate", type=float, default=StubConfig.error_rate)
+    parser.add_argument("--output", help="결과 JSON 파일 (기본: 표준 출력)")
+    parser.add_argument("--baseline", help="비교할 이전 결과 JSON")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="허용 회귀 비율 (p95 증가 / RPS 감소)")
+    parser.add_argument("--log-dir", default=None, help="stub/S3/앱 로그 디렉터리 (기본: 임시 디렉터리)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s - %(message)s")
+    logging.getLogger("httpx").setLevel(logging.WARNING)  # 요청마다 남는 로그 제외
+    args = parse_args(argv)
+    names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        raise SystemExit(f"알 수 없는 시나리오: {unknown} (가능: {list(SCENARIOS)})")
+
+    log_dir = args.log_dir or tempfile.mkdtemp(prefix="altong-bench-")
+    os.makedirs(log_dir, exist_ok=True)
+    stub_args = [
+        "--chat-latency", str(args.chat_latency), "--embed-latency", str(args.embed_latency),
+        "--image-latency", str(args.image_latency), "--stream-chunk-delay", str(args.stream_chunk_delay),
+        "--error-rate", str(args.error_rate),
+    ]
+
+    stub = s3 = app = None
+    database_url, stop_postgres = start_postgres(args.database_url)
+    try:
+        stub, stub_url = start_stub(stub_args, log_path=os.path.join(log_dir, "stub.log"))
+        s3, s3_env = (None, None) if args.no_s3 else start_s3(log_path=os.path.join(log_dir, "s3.log"))
+        seed_manuals(database_url, [args.manual_id_base + i for i in range(args.manuals)])
+
+        port = free_port()
+        launched = time.perf_counter()
+        app = start_process(
+            ["-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+            env=_app_env(args, stub_url, database_url, s3_env),
+            log_path=os.path.join(log_dir, "app.log"),
+        )
+        base_url = f"http://127.0.0.1:{port}"
+        wait_http(f"{base_url}/", app)
+        startup_s = time.perf_counter() - launched
+        app_startup = httpx.get(f"{base_url}/system/startup").json()
+        logger.info(f"[BENCH] 앱 실행 완료 | startup={startup_s:.2f}s, logs={log_dir}")
+
+        scenarios = {}
+        for name in names:
+            logger.info(f"[BENCH] 시나리오 시작 | {name}")
+            scenarios[name] = asyncio.run(run_scenario(base_url, app.pid, SCENARIOS[name], args))
+            report = scenarios[name]
+            logger.info(
+                f"[BENCH] {name} | ok={report['ok']}/{report['requests']}, rps={report['rps']}, "
+                f"p50={report['latency_ms'].get('p50')}ms, p95={report['latency_ms'].get('p95')}ms, "
+                f"rss_peak={report['rss_mb']['peak']}MB"
+            )
+        stub_stats = httpx.get(f"{stub_url}/stats").json()
+    finally:
+        stop_process(app)
+        stop_process(s3)
+        stop_process(stub)
+        stop_postgres()
+
+    output = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "concurrency": args.concurrency,
+            "requests": None if args.duration else args.requests,
+            "duration_s": args.duration,
+            "use_cache": args.use_cache,
+            "s3": s3_env is not None,
+            "app_startup_s": round(startup_s, 3),
+            "app_startup": app_startup,
+            "stub": {
+                "chat_latency": args.chat_latency, "embed_latency": args.embed_latency,
+                "image_latency": args.image_latency, "stream_chunk_delay": args.stream_chunk_delay,
+                "error_rate": args.error_rate,
+            },
+            "stub_calls": stub_stats,
+        },
+        "scenarios": scenarios,
+    }
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(output, json.load(f), args.max_regression)
+        output["regressions"] = regressions
+        if regressions:
+            logger.warning(f"[BENCH] 회귀 감지: {regressions}")
+            exit_code = 1
+
+    text = json.dumps(output, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
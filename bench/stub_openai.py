@@ -0,0 +1,251 @@
+"""
+OpenAI API stub 서버 (벤치마크용)
+- POST /v1/chat/completions: 시스템 프롬프트로 퀴즈/카드뉴스/매뉴얼을 구분해 고정 JSON 응답 (stream 지원)
+- POST /v1/embeddings: 텍스트 hash 기반의 결정적 단위 벡터 (dimensions, base64 인코딩 지원)
+- POST /v1/images/generations: 이 서버의 PNG URL 반환, GET /v1/files/image.png 로 실제 이미지 다운로드
+- 응답마다 설정한 지연(+jitter)을 두고, error_rate 비율로 429(Retry-After) 응답
+
+단독 실행:
+    python -m bench.stub_openai --port 8900 --chat-latency 0.8 --image-latency 6
+"""
+from dataclasses import dataclass
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+import io
+import time
+import json
+import uuid
+import base64
+import random
+import asyncio
+import hashlib
+import argparse
+import numpy as np
+
+QUIZ_RESPONSE = [
+    {"type": "OX", "question": "손님이 들어오면 먼저 인사한다.", "options": ["O", "X"], "answer": "O",
+     "explanation": "밝은 인사가 첫인상을 결정해요! 😊"},
+    {"type": "MULTIPLE", "question": "주문을 받은 뒤 가장 먼저 할 일은?", "options": ["A) 주문 내용 확인", "B) 바로 결제"],
+     "answer": "A", "explanation": "주문을 다시 확인하면 실수가 줄어요 👍"},
+    {"type": "MULTIPLE", "question": "결제 금액이 다를 때는?", "options": ["A) 그냥 넘어간다", "B) 손님께 다시 확인한다"],
+     "answer": "B", "explanation": "금액 확인은 필수! 💳"},
+]
+
+CARDNEWS_RESPONSE = {
+    "title": "신입 알바 필수 체크",
+    "contents": ["밝게 인사하기", "주문 내용 다시 확인하기", "결제 금액 확인하기", "마무리 인사하기"],
+}
+
+
+def manual_document(n_steps: int = 4, n_details: int = 3) -> dict:
+    """벤치용 매뉴얼 JSON (ai_raw_response / manual 생성 응답 / 임베딩 요청 공용)"""
+    return {
+        "title": "카페 오픈 준비 매뉴얼",
+        "goal": "매장 오픈 전 준비를 빠짐없이 마친다",
+        "procedure": [
+            {
+                "step": f"{i + 1}. 준비 단계 {i + 1}",
+                "details": [f"단계 {i + 1}의 세부 작업 {j + 1}: 도구와 재료를 확인하고 정리해요" for j in range(n_details)],
+            }
+            for i in range(n_steps)
+        ],
+        "precaution": ["손님 말을 끊지 않기", "결제 금액 다시 확인하기", "위생 장갑 착용하기"],
+    }
+
+
+@dataclass
+class StubConfig:
+    chat_latency: float = 0.5  # 초
+    embed_latency: float = 0.05
+    image_latency: float = 3.0
+    stream_chunk_delay: float = 0.02  # 스트리밍 조각 사이 간격
+    stream_chunk_chars: int = 8
+    jitter: float = 0.2  # 지연 시간 대비 ±비율
+    error_rate: float = 0.0  # 429 응답 비율
+    image_size: int = 1024
+
+
+def _pick_chat_response(messages: list) -> str:
+    system = messages[0].get("content", "") if messages else ""
+    if "퀴즈" in system:
+        return json.dumps(QUIZ_RESPONSE, ensure_ascii=False)
+    if "card news" in system:
+        return json.dumps(CARDNEWS_RESPONSE, ensure_ascii=False)
+    return "```json\n" + json.dumps(manual_document(), ensure_ascii=False) + "\n```"
+
+
+def _embedding(text: str, dims: int) -> np.ndarray:
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vec = np.random.default_rng(seed).standard_normal(dims).astype(np.float32)
+    return vec / np.linalg.norm(vec)
+
+
+def _usage(messages_or_input, completion: str = "") -> dict:
+    prompt_chars = len(json.dumps(messages_or_input, ensure_ascii=False))
+    prompt_tokens = prompt_chars // 2
+    completion_tokens = len(completion) // 2
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+
+
+def _sample_png(size: int) -> bytes:
+    """
+    그라데이션 + 약한 노이즈 이미지 (PNG 약 2MB로 실제 DALL-E 결과와 비슷한 크기)
+    - 순수 노이즈는 WebP/AVIF 인코딩이 비정상적으로 느려 컷 분할 단계가 과대 측정됨
+    """
+    from PIL import Image
+
+    y, x = np.mgrid[0:size, 0:size] / size
+    base = np.stack([
+        128 + 100 * np.sin(6 * x + 2 * y),
+        128 + 100 * np.cos(5 * y - 3 * x),
+        128 + 90 * np.sin(4 * (x + y)),
+    ], axis=-1)
+    noise = np.random.default_rng(0).normal(0, 6, base.shape)
+    pixels = np.clip(base + noise, 0, 255).astype(np.uint8)
+    buf = io.BytesIO()
+    Image.fromarray(pixels).save(buf, "PNG")
+    return buf.getvalue()
+
+
+def create_stub_app(config: StubConfig = None) -> FastAPI:
+    config = config or StubConfig()
+    app = FastAPI(title="OpenAI stub")
+    image_bytes = _sample_png(config.image_size)
+    stats = {"chat": 0, "chat_stream": 0, "embeddings": 0, "embedding_inputs": 0, "images": 0, "rate_limited": 0}
+
+    async def delay(seconds: float):
+        if seconds > 0:
+            await asyncio.sleep(seconds * random.uniform(1 - config.jitter, 1 + config.jitter))
+
+    def rate_limited():
+        if config.error_rate and random.random() < config.error_rate:
+            stats["rate_limited"] += 1
+            return JSONResponse(
+                status_code=429,
+                headers={"Retry-After": "0.1"},
+                content={"error": {"message": "Rate limit reached (stub)", "type": "requests", "code": "rate_limit_exceeded"}},
+            )
+        return None
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        if (error := rate_limited()) is not None:
+            return error
+        content = _pick_chat_response(body.get("messages", []))
+        usage = _usage(body.get("messages", []), content)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+        model = body.get("model", "gpt-4o-mini")
+
+        if not body.get("stream"):
+            stats["chat"] += 1
+            await delay(config.chat_latency)
+            return {
+                "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": usage,
+            }
+
+        stats["chat_stream"] += 1
+        include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+
+        def chunk(choices, usage=None):
+            data = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model, "choices": choices}
+            if usage is not None:
+                data["usage"] = usage
+            return f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+        async def events():
+            # 첫 토큰까지의 지연 = chat_latency 의 절반, 이후 조각마다 stream_chunk_delay
+            await delay(config.chat_latency / 2)
+            step = config.stream_chunk_chars
+            for i in range(0, len(content), step):
+                yield chunk([{"index": 0, "delta": {"content": content[i:i + step]}, "finish_reason": None}])
+                await delay(config.stream_chunk_delay)
+            yield chunk([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+            if include_usage:
+                yield chunk([], usage)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        if (error := rate_limited()) is not None:
+            return error
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        dims = body.get("dimensions") or 1536
+        stats["embeddings"] += 1
+        stats["embedding_inputs"] += len(inputs)
+        await delay(config.embed_latency)
+
+        data = []
+        for n, text in enumerate(inputs):
+            vec = _embedding(text, dims)
+            if body.get("encoding_format") == "base64":
+                embedding = base64.b64encode(vec.astype("<f4").tobytes()).decode("ascii")
+            else:
+                embedding = vec.tolist()
+            data.append({"object": "embedding", "index": n, "embedding": embedding})
+        prompt_tokens = _usage(inputs)["prompt_tokens"]
+        return {
+            "object": "list", "model": body.get("model", "text-embedding-3-small"), "data": data,
+            "usage": {"prompt_tokens": prompt_tokens, "total_tokens": prompt_tokens},
+        }
+
+    @app.post("/v1/images/generations")
+    async def images(request: Request):
+        await request.json()
+        if (error := rate_limited()) is not None:
+            return error
+        stats["images"] += 1
+        await delay(config.image_latency)
+        url = str(request.base_url).rstrip("/") + "/v1/files/image.png"
+        return {"created": int(time.time()), "data": [{"url": url, "revised_prompt": None}]}
+
+    @app.get("/v1/files/image.png")
+    def image_file():
+        return Response(content=image_bytes, media_type="image/png")
+
+    @app.get("/stats")
+    def get_stats():
+        return stats
+
+    @app.get("/health")
+    def health():
+        return {"status": "ok"}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI API stub 서버")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--chat-latency", type=float, default=StubConfig.chat_latency)
+    parser.add_argument("--embed-latency", type=float, default=StubConfig.embed_latency)
+    parser.add_argument("--image-latency", type=float, default=StubConfig.image_latency)
+    parser.add_argument("--stream-chunk-delay", type=float, default=StubConfig.stream_chunk_delay)
+    parser.add_argument("--jitter", type=float, default=StubConfig.jitter)
+    parser.add_argument("--error-rate", type=float, default=StubConfig.error_rate)
+    parser.add_argument("--image-size", type=int, default=StubConfig.image_size)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    config = StubConfig(
+        chat_latency=args.chat_latency,
+        embed_latency=args.embed_latency,
+        image_latency=args.image_latency,
+        stream_chunk_delay=args.stream_chunk_delay,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        image_size=args.image_size,
+    )
+    uvicorn.run(create_stub_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()